@@ -16,20 +16,32 @@ struct PpmImage {
 };
 
 PpmImage readPpm(std::string const & filename) {
-  std::ifstream file(filename);
+  std::ifstream file(filename, std::ios::binary);
   if (!file) { throw std::runtime_error("Cannot open file: " + filename); }
 
   std::string magic;
   file >> magic;
-  if (magic != "P3") {
-    std::cerr << "Unsupported PPM format (only P3 supported): " << magic << "\n";
-    throw std::runtime_error("Unsupported PPM format (only P3 supported): " + magic);
+  if (magic != "P3" && magic != "P6") {
+    std::cerr << "Unsupported PPM format (only P3 and P6 supported): " << magic << "\n";
+    throw std::runtime_error("Unsupported PPM format (only P3 and P6 supported): " + magic);
   }
 
   PpmImage image;
   file >> image.width >> image.height >> image.maxVal;
 
   image.pixels.resize(image.width * image.height);
+  if (magic == "P6") {
+    // A single whitespace character separates the header from the binary data
+    file.get();
+    std::vector<unsigned char> bytes(3 * image.pixels.size());
+    file.read(reinterpret_cast<char *>(bytes.data()), static_cast<std::streamsize>(bytes.size()));
+    if (!file) { throw std::runtime_error("Truncated P6 data in: " + filename); }
+    for (std::size_t i = 0; i < image.pixels.size(); i++) {
+      image.pixels[i] = {bytes[3 * i], bytes[3 * i + 1], bytes[3 * i + 2]};
+    }
+    return image;
+  }
+
   for (int i = 0; i < image.width * image.height; i++) {
     file >> image.pixels[i].r >> image.pixels[i].g >> image.pixels[i].b;
   }
@@ -0,0 +1,18 @@
+from utils import INFINITY
+
+
+class AABB:
+    """Axis-aligned bounding box stored as min and max corners"""
+
+    def __init__(self, min_x=INFINITY, min_y=INFINITY, min_z=INFINITY,
+                 max_x=-INFINITY, max_y=-INFINITY, max_z=-INFINITY):
+        self.min = [min_x, min_y, min_z]
+        self.max = [max_x, max_y, max_z]
+
+    def expand(self, other):
+        """Grow this box to also enclose other"""
+        for a in range(3):
+            if other.min[a] < self.min[a]:
+                self.min[a] = other.min[a]
+            if other.max[a] > self.max[a]:
+                self.max[a] = other.max[a]
@@ -0,0 +1,4 @@
+"""Benchmarks for the Python ray tracer. Run from python-Raytracer, e.g.
+``python3 -m benchmarks.wavefront``. ``python3 -m benchmarks.suite`` runs
+the micro, mid-level and end-to-end suite with JSON output, and
+``python3 -m benchmarks.compare`` checks two suite runs for regressions."""
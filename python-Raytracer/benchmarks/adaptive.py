@@ -0,0 +1,93 @@
+"""Error and ray count of adaptive against fixed per-pixel sampling.
+
+Renders a high-spp reference, then fixed-spp renders and adaptive renders
+at a few thresholds, and reports camera rays per pixel next to the RMS
+error of the displayed (gamma 2) image against the reference. An adaptive
+render wins when it reaches the error of a fixed render with fewer rays.
+
+Usage: python3 -m benchmarks.adaptive [scene_path] [width] [reference_spp]
+"""
+import math
+import sys
+import time
+
+from bvh import BVH
+from main import create_world_from_file
+
+
+def render(cam, world, adaptive):
+    """Mean colors of the whole image and the total number of camera samples"""
+    pixels = []
+    total = 0
+    for tile in cam.row_tiles():
+        if adaptive:
+            sums, counts = cam.render_tile_adaptive(*tile, world)
+        else:
+            sums = cam.render_tile(*tile, world)
+            counts = [cam.samples_per_pixel] * (len(sums) // 3)
+        for k, n in enumerate(counts):
+            pixels.extend(v / n for v in sums[3 * k:3 * k + 3])
+            total += n
+    return pixels, total
+
+
+def display_errors(pixels, reference):
+    """RMS and 95th percentile of the per-pixel error of the gamma 2 encoded
+    values, clamped like the writers"""
+    def encode(v):
+        return min(math.sqrt(v), 0.999) if v > 0.0 else 0.0
+
+    errors = sorted(
+        math.sqrt(sum(
+            (encode(pixels[k + c]) - encode(reference[k + c])) ** 2 for c in range(3)
+        ) / 3.0)
+        for k in range(0, len(reference), 3)
+    )
+    rms = math.sqrt(sum(e * e for e in errors) / len(errors))
+    return rms, errors[int(0.95 * (len(errors) - 1))]
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else "../sphere_data.txt"
+    width = int(sys.argv[2]) if len(sys.argv) > 2 else 48
+    reference_spp = int(sys.argv[3]) if len(sys.argv) > 3 else 512
+
+    world, cam = create_world_from_file(path)
+    world = BVH(world)
+    cam.image_width = width
+    cam.initialize()
+    pixel_count = cam.image_width * cam.image_height
+
+    cam.samples_per_pixel = reference_spp
+    # The reference gets its own seed so it shares no samples with the renders
+    cam.seed = 1
+    cam.initialize()
+    start = time.perf_counter()
+    reference, _ = render(cam, world, False)
+    print(f"Reference: {reference_spp} spp in {time.perf_counter() - start:.1f}s")
+    cam.seed = 0
+    cam.initialize()
+
+    print(f"{'mode':<24} {'spp':>7} {'time (s)':>9} {'rms error':>10} {'p95 error':>10}")
+    for spp in (8, 16, 32, 64):
+        cam.samples_per_pixel = spp
+        start = time.perf_counter()
+        pixels, total = render(cam, world, False)
+        elapsed = time.perf_counter() - start
+        rms, p95 = display_errors(pixels, reference)
+        print(f"{'fixed':<24} {total / pixel_count:>7.1f} {elapsed:>9.2f} {rms:>10.4f} {p95:>10.4f}")
+
+    cam.samples_per_pixel = 32
+    cam.min_samples = 8
+    for threshold in (0.08, 0.05, 0.03, 0.02):
+        cam.adaptive_threshold = threshold
+        start = time.perf_counter()
+        pixels, total = render(cam, world, True)
+        elapsed = time.perf_counter() - start
+        label = f"adaptive {threshold} (max {cam.sample_cap()})"
+        rms, p95 = display_errors(pixels, reference)
+        print(f"{label:<24} {total / pixel_count:>7.1f} {elapsed:>9.2f} {rms:>10.4f} {p95:>10.4f}")
+
+
+if __name__ == "__main__":
+    main()
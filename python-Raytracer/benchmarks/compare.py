@@ -0,0 +1,43 @@
+"""Compare two benchmark suite runs and flag regressions.
+
+Matches the benchmarks of two JSON files written by benchmarks.suite by
+name and prints the change of their median times. Exits with status 1 when
+any benchmark got slower by more than the threshold (default 5%), so it
+can gate a change in a script or CI job.
+
+Usage: python3 -m benchmarks.compare <baseline.json> <current.json> [threshold]
+"""
+import sys
+
+from benchmarks.harness import compare, format_seconds, load
+
+
+def main():
+    if len(sys.argv) < 3:
+        print(__doc__)
+        sys.exit(2)
+    baseline = load(sys.argv[1])
+    current = load(sys.argv[2])
+    threshold = float(sys.argv[3]) if len(sys.argv) > 3 else 0.05
+
+    for label, run in (("baseline", baseline), ("current", current)):
+        env = run["environment"]
+        print(f"{label:<9} {env['implementation']} {env['python']} on {env['machine']}, "
+              f"{env['cpu_count']} CPUs, commit {env['commit']}, {env['time']}")
+
+    rows = compare(baseline, current, threshold)
+    print(f"{'benchmark':<34} {'baseline':>11} {'current':>11} {'change':>8}")
+    regressions = 0
+    for name, old, new, ratio, verdict in rows:
+        marker = {"regression": "  SLOWER", "improvement": "  faster"}.get(verdict, "")
+        print(f"{name:<34} {format_seconds(old):>11} {format_seconds(new):>11} "
+              f"{100.0 * (ratio - 1.0):>+7.1f}%{marker}")
+        regressions += verdict == "regression"
+
+    print(f"{len(rows)} benchmarks compared, {regressions} regression(s) "
+          f"above {100.0 * threshold:.0f}%")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
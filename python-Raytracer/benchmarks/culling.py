@@ -0,0 +1,80 @@
+"""First-hit cost with and without per-tile frustum culling (frustum.py).
+
+Renders the scene with max_depth 1, so only camera rays are traced, once
+against the whole world and once against the candidates of every tile,
+for a few image widths and tile sizes on one core. The culled time
+includes finding the candidates and building the tile structures. The
+tests per ray (BVH nodes visited plus primitives tested) come from a
+separate pass with the intersection counters on, and do not depend on the
+machine's load.
+
+Usage: python3 -m benchmarks.culling [scene] [widths] [tile_sizes] [accel] [samples_per_pixel]
+       e.g. python3 -m benchmarks.culling ../sphere_data.txt 100,200,400 8,16,32 bvh 4
+"""
+import sys
+import time
+
+from bvh import BVH
+from frustum import TileCuller
+from main import create_world_from_file
+from stats import RenderStats
+
+
+def tests_per_ray(cam, world, tiles, culler):
+    stats = RenderStats()
+    world.collect_stats = True
+    for tile in tiles:
+        cam.render_tile(*tile, world, stats=stats, culler=culler)
+        stats.collect_world(world)
+    world.collect_stats = False
+    return (stats.nodes_visited + stats.primitive_tests) / stats.rays
+
+
+def main():
+    scene = sys.argv[1] if len(sys.argv) > 1 else "../sphere_data.txt"
+    widths = [int(w) for w in (sys.argv[2] if len(sys.argv) > 2 else "100,200,400").split(",")]
+    sizes = [int(s) for s in (sys.argv[3] if len(sys.argv) > 3 else "8,16,32").split(",")]
+    accel = sys.argv[4] if len(sys.argv) > 4 else "bvh"
+    spp = int(sys.argv[5]) if len(sys.argv) > 5 else 4
+
+    world, cam = create_world_from_file(scene)
+    if world is None:
+        sys.exit(1)
+    if accel == "bvh":
+        world = BVH(world)
+    cam.samples_per_pixel = spp
+    cam.max_depth = 1
+
+    print(f"{len(world.objects)} objects, {accel}, {spp} spp, camera rays only, 1 core")
+    print(f"{'width':>6} {'tile':>5} {'candidates':>11} {'full tests':>11} {'culled tests':>13} "
+          f"{'full us/ray':>12} {'culled us/ray':>14} {'speedup':>8}")
+    for width in widths:
+        cam.image_width = width
+        cam.initialize()
+        rays = cam.image_width * cam.image_height * spp
+        for size in sizes:
+            tiles = [
+                (x, y, min(x + size, cam.image_width), min(y + size, cam.image_height))
+                for y in range(0, cam.image_height, size)
+                for x in range(0, cam.image_width, size)
+            ]
+            start = time.perf_counter()
+            for tile in tiles:
+                cam.render_tile(*tile, world)
+            full = time.perf_counter() - start
+
+            start = time.perf_counter()
+            culler = TileCuller(cam, world)
+            for tile in tiles:
+                cam.render_tile(*tile, world, culler=culler)
+            culled = time.perf_counter() - start
+
+            candidates = sum(len(culler.candidates(*tile)) for tile in tiles) / len(tiles)
+            full_tests = tests_per_ray(cam, world, tiles, None)
+            culled_tests = tests_per_ray(cam, world, tiles, culler)
+            print(f"{width:>6} {size:>5} {candidates:>11.1f} {full_tests:>11.1f} {culled_tests:>13.1f} "
+                  f"{full / rays * 1e6:>12.1f} {culled / rays * 1e6:>14.1f} {full / culled:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Cold main.py renders against renders through the warm render daemon.
+
+Runs the same small render repeatedly as a fresh `python3 main.py` process
+and as `python3 client.py` against a daemon.py started for the benchmark
+(its first, scene-loading request is a warmup). For both it reports the
+median wall time of the whole command and the startup-to-first-pixel
+latency each of them prints: the time from the start of the process to the
+first finished tile.
+
+Usage: python3 -m benchmarks.daemon [scene_path] [width] [samples_per_pixel] [cores] [runs]
+"""
+import os
+import re
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+PORT = 8791
+FIRST_PIXEL = re.compile(r"Startup to first pixel: ([0-9.]+)s")
+
+
+def scaled_scene(path, width):
+    """Copy of the scene file with the image width replaced"""
+    with open(path, "r", encoding="utf-8") as f:
+        lines = [line for line in f if not line.startswith("c width")]
+    fd, scene = tempfile.mkstemp(suffix=".txt")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(f"c width {width}\n")
+        f.writelines(lines)
+    return scene
+
+
+def timed(command):
+    """(wall seconds, startup-to-first-pixel seconds) of a command"""
+    start = time.perf_counter()
+    result = subprocess.run(command, capture_output=True, text=True, check=True)
+    elapsed = time.perf_counter() - start
+    match = FIRST_PIXEL.search(result.stdout)
+    return elapsed, float(match.group(1)) if match else float("nan")
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else "../sphere_data.txt"
+    width = int(sys.argv[2]) if len(sys.argv) > 2 else 80
+    spp = sys.argv[3] if len(sys.argv) > 3 else "4"
+    cores = sys.argv[4] if len(sys.argv) > 4 else "2"
+    runs = int(sys.argv[5]) if len(sys.argv) > 5 else 5
+
+    scene = scaled_scene(path, width)
+    output = scene + ".ppm"
+    daemon = subprocess.Popen(
+        [sys.executable, "daemon.py", "--port", str(PORT), "--cores", cores],
+        stdout=subprocess.PIPE, text=True,
+    )
+    try:
+        daemon.stdout.readline()  # up and listening
+        cold = [
+            timed([sys.executable, "main.py", "--path", scene, "--output", output,
+                   "--cores", cores, "--spp", spp])
+            for _ in range(runs)
+        ]
+        client = [sys.executable, "client.py", "--server", f"127.0.0.1:{PORT}",
+                  "--path", scene, "--output", output, "--spp", spp]
+        timed(client)  # loads the scene into the cache
+        warm = [timed(client) for _ in range(runs)]
+    finally:
+        # Through the endpoint, so the daemon shuts its warm workers down
+        try:
+            urllib.request.urlopen(
+                urllib.request.Request(f"http://127.0.0.1:{PORT}/shutdown", method="POST"),
+                timeout=10,
+            ).close()
+        except OSError:
+            daemon.send_signal(signal.SIGINT)
+        daemon.communicate()
+        for name in (scene, output):
+            if os.path.exists(name):
+                os.remove(name)
+
+    print(f"Scene: {path}, width {width} @ {spp} spp, {cores} cores, median of {runs} runs")
+    print(f"{'mode':<8} {'total s':>9} {'first pixel s':>14}")
+    for label, results in (("cold", cold), ("daemon", warm)):
+        total = statistics.median(r[0] for r in results)
+        first = statistics.median(r[1] for r in results)
+        print(f"{label:<8} {total:>9.3f} {first:>14.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""Encode time and file size of the output formats.
+
+Fills an image of the default benchmark size with random linear colors and
+times each writer into memory.
+
+Usage: python3 -m benchmarks.encode [width] [height]
+"""
+import io
+import random
+import sys
+import time
+
+from image import Image
+
+
+def main():
+    width = int(sys.argv[1]) if len(sys.argv) > 1 else 800
+    height = int(sys.argv[2]) if len(sys.argv) > 2 else 450
+
+    img = Image(width, height)
+    rng = random.Random(1)
+    for k in range(len(img.pixels)):
+        img.pixels[k] = rng.random() * 1.2
+
+    print(f"{width}x{height}")
+    print(f"{'format':<7} {'time (s)':>9} {'size KiB':>9}")
+    for image_format in ("P3", "P6", "PFM", "PNG"):
+        out = io.StringIO() if image_format == "P3" else io.BytesIO()
+        start = time.perf_counter()
+        img.write_to(out, image_format)
+        elapsed = time.perf_counter() - start
+        size = len(out.getvalue())
+        print(f"{image_format:<7} {elapsed:>9.3f} {size / 1024:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""Timing harness for the benchmark suite.
+
+A benchmark is a function taking no arguments. The harness calibrates how
+many calls make up one repetition (so that a repetition lasts at least
+min_time and timer resolution does not matter), runs warmup repetitions
+that are thrown away, then times the requested repetitions and summarizes
+the per-call times. Results are plain dicts so they can be written as
+JSON and compared between runs.
+"""
+import gc
+import json
+import math
+import multiprocessing
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+
+def calibrate(fn, min_time):
+    """Calls per repetition so that one repetition takes at least min_time"""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or number >= 1 << 24:
+            return number
+        # Aim a bit past min_time so the next try usually succeeds
+        number = max(number * 2, int(number * 1.2 * min_time / max(elapsed, 1e-9)))
+
+
+def measure(fn, repeat=5, warmup=1, min_time=0.05, number=None):
+    """Per-call seconds of every timed repetition of fn.
+
+    The garbage collector is off while timing, as in timeit, so collections
+    triggered by earlier benchmarks do not land in a random repetition.
+    """
+    if number is None:
+        number = calibrate(fn, min_time)
+    for _ in range(warmup):
+        for _ in range(number):
+            fn()
+
+    times = []
+    gc_was_enabled = gc.isenabled()
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(number):
+                fn()
+            times.append((time.perf_counter() - start) / number)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return number, times
+
+
+def summarize(times):
+    """Statistics of a list of per-call times, in seconds"""
+    ordered = sorted(times)
+    n = len(ordered)
+    q1 = ordered[(n - 1) // 4]
+    q3 = ordered[(3 * (n - 1) + 3) // 4]
+    return {
+        "min": ordered[0],
+        "max": ordered[-1],
+        "median": statistics.median(ordered),
+        "mean": statistics.fmean(ordered),
+        "stdev": statistics.stdev(ordered) if n > 1 else 0.0,
+        "iqr": q3 - q1,
+    }
+
+
+def run_benchmark(name, group, fn, repeat=5, warmup=1, min_time=0.05, number=None, work=None):
+    """Time fn and return its result record.
+
+    work is the number of items (rays, pixels, ...) one call processes; the
+    record then also carries the throughput at the median time.
+    """
+    number, times = measure(fn, repeat, warmup, min_time, number)
+    record = {"name": name, "group": group, "number": number, "times": times}
+    record.update(summarize(times))
+    if work:
+        record["work"] = work
+        record["throughput"] = work / record["median"]
+    return record
+
+
+def environment():
+    """Interpreter, machine and source revision the results were taken on"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "implementation": platform.python_implementation(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": multiprocessing.cpu_count(),
+        "commit": commit,
+        "argv": sys.argv,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def format_seconds(seconds):
+    """Human readable duration with a unit suited to its size"""
+    if seconds < 1e-6:
+        return f"{seconds * 1e9:.1f} ns"
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:.2f} us"
+    if seconds < 1.0:
+        return f"{seconds * 1e3:.2f} ms"
+    return f"{seconds:.3f} s"
+
+
+def print_record(record):
+    spread = 100.0 * record["stdev"] / record["mean"] if record["mean"] > 0.0 else 0.0
+    line = (
+        f"{record['group']:<6} {record['name']:<34} {format_seconds(record['median']):>11} "
+        f"{format_seconds(record['min']):>11} {spread:>6.1f}%"
+    )
+    if "throughput" in record:
+        line += f" {record['throughput']:>14,.0f}/s"
+    print(line)
+
+
+def print_header():
+    print(f"{'group':<6} {'benchmark':<34} {'median':>11} {'min':>11} {'stdev':>7} {'throughput':>16}")
+
+
+def save(path, results):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"environment": environment(), "results": results}, f, indent=2)
+
+
+def load(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare(baseline, current, threshold=0.05):
+    """Match benchmarks by name and classify the change of their medians.
+
+    Returns (name, base median, current median, ratio, verdict) rows where
+    verdict is "regression" when the current median is more than threshold
+    slower, "improvement" when it is more than threshold faster, and "same"
+    otherwise. A regression also needs the current minimum to be slower
+    than the baseline median, so one noisy repetition does not fail a run.
+    """
+    base = {r["name"]: r for r in baseline["results"]}
+    rows = []
+    for record in current["results"]:
+        old = base.get(record["name"])
+        if old is None:
+            continue
+        ratio = record["median"] / old["median"] if old["median"] > 0.0 else math.inf
+        if ratio > 1.0 + threshold and record["min"] > old["median"]:
+            verdict = "regression"
+        elif ratio < 1.0 - threshold:
+            verdict = "improvement"
+        else:
+            verdict = "same"
+        rows.append((record["name"], old["median"], record["median"], ratio, verdict))
+    return rows
@@ -0,0 +1,63 @@
+"""Per-ray cost of the world intersection structures.
+
+Traces the same random rays, started from points inside the sphere field,
+through HittableList, SphereSet and BVH and reports microseconds per ray.
+
+Usage: python3 -m benchmarks.intersection [scene_path] [ray_count]
+"""
+import random
+import sys
+import time
+
+from bvh import BVH
+from hittable import HitRecord
+from main import create_world_from_file
+from ray import Ray
+from utils import Interval, INFINITY
+from vec3 import Point3, sphere_from_square
+
+
+def time_hits(world, rays):
+    start = time.perf_counter()
+    hits = 0
+    for r in rays:
+        if world.hit(r, Interval(0.001, INFINITY), HitRecord()):
+            hits += 1
+    return time.perf_counter() - start, hits
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else "../sphere_data.txt"
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+
+    world, _ = create_world_from_file(path)
+    rng = random.Random(1)
+    rays = [
+        Ray(
+            Point3(rng.uniform(-11.0, 11.0), rng.uniform(0.0, 2.0), rng.uniform(-11.0, 11.0)),
+            sphere_from_square(rng.random(), rng.random()),
+        )
+        for _ in range(count)
+    ]
+
+    structures = [("list", world)]
+    try:
+        from sphere_set import SphereSet
+
+        structures.append(("spheres", SphereSet(world)))
+    except ImportError:
+        print("NumPy not available, skipping SphereSet")
+    structures.append(("bvh", BVH(world)))
+
+    print(f"Scene: {path} ({len(world.objects)} objects), {count} rays")
+    print(f"{'structure':<10} {'us/ray':>10} {'speedup':>10} {'hits':>8}")
+    baseline = None
+    for name, structure in structures:
+        elapsed, hits = time_hits(structure, rays)
+        per_ray = elapsed / count * 1e6
+        baseline = baseline or per_ray
+        print(f"{name:<10} {per_ray:>10.1f} {baseline / per_ray:>9.1f}x {hits:>8}")
+
+
+if __name__ == "__main__":
+    main()
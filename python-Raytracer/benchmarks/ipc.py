@@ -0,0 +1,95 @@
+"""IPC volume and wall time of the multi-process render.
+
+Compares the previous scheme, where every scanline task pickled the whole
+Camera and world and returned a list of Color objects, with the
+initializer-based pool, where the scene reaches each worker once and tasks
+and results are tile coordinates and packed float arrays. Bytes are the
+sizes of the pickles ProcessPoolExecutor sends for the same work.
+
+Usage: python3 -m benchmarks.ipc [scene_path] [width] [samples_per_pixel] [cores,...]
+"""
+import multiprocessing
+import pickle
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from bvh import BVH
+from camera import _init_worker, _render_tile
+from framebuffer import Framebuffer
+from main import create_world_from_file
+from vec3 import Color
+
+# Core counts from todo.md
+CORE_COUNTS = (1, 2, 4, 14, 16, 28, 32, 48, 60)
+
+
+def legacy_process_row(cam, j, world):
+    """What a task used to do: render one row and return it as Color objects"""
+    colors = cam.render_tile(0, j, cam.image_width, j + 1, world)
+    return j, [Color(colors[k], colors[k + 1], colors[k + 2]) for k in range(0, len(colors), 3)]
+
+
+def run_legacy(cam, world, cores):
+    sent = received = 0
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=cores) as executor:
+        futures = []
+        for j in range(cam.image_height):
+            sent += len(pickle.dumps((legacy_process_row, (cam, j, world))))
+            futures.append(executor.submit(legacy_process_row, cam, j, world))
+        for future in futures:
+            received += len(pickle.dumps(future.result()))
+    return time.perf_counter() - start, sent + received
+
+
+def run_initializer(cam, world, cores):
+    # Under fork the scene is inherited; under spawn it is pickled once per worker
+    fb = Framebuffer(cam.image_width, cam.image_height, shared=True)
+    forked = multiprocessing.get_start_method() == "fork"
+    sent = 0 if forked else cores * len(pickle.dumps((cam, world, "scalar", fb)))
+    received = 0
+    spp = cam.samples_per_pixel
+    start = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(
+            max_workers=cores, initializer=_init_worker, initargs=(cam, world, "scalar", fb)
+        ) as executor:
+            futures = []
+            for tile in cam.row_tiles():
+                sent += len(pickle.dumps((_render_tile, (tile, spp))))
+                futures.append(executor.submit(_render_tile, tile, spp))
+            for future in futures:
+                received += len(pickle.dumps(future.result()))
+    finally:
+        fb.close()
+        fb.unlink()
+    return time.perf_counter() - start, sent + received
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else "../sphere_data.txt"
+    width = int(sys.argv[2]) if len(sys.argv) > 2 else 80
+    spp = int(sys.argv[3]) if len(sys.argv) > 3 else 2
+    cores = CORE_COUNTS
+    if len(sys.argv) > 4:
+        cores = [int(c) for c in sys.argv[4].split(",")]
+
+    world, cam = create_world_from_file(path)
+    world = BVH(world)
+    cam.image_width = width
+    cam.samples_per_pixel = spp
+    cam.initialize()
+
+    print(f"Scene: {path}, {width}x{cam.image_height} @ {spp} spp, "
+          f"start method {multiprocessing.get_start_method()}")
+    print(f"{'cores':>5} {'legacy s':>9} {'legacy KiB':>11} {'init s':>9} {'init KiB':>9}")
+    for n in cores:
+        legacy_time, legacy_bytes = run_legacy(cam, world, n)
+        init_time, init_bytes = run_initializer(cam, world, n)
+        print(f"{n:>5} {legacy_time:>9.2f} {legacy_bytes / 1024:>11.0f} "
+              f"{init_time:>9.2f} {init_bytes / 1024:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Path length and render time with and without Russian roulette.
+
+Counts world intersections per camera sample (the path length) for the
+fixed max_depth integrator and for Russian roulette starting at a few
+different depths, together with the mean pixel value so the estimates can
+be checked for bias.
+
+Usage: python3 -m benchmarks.roulette [scene_path] [width] [samples_per_pixel]
+"""
+import sys
+import time
+
+from benchmarks.wavefront import CountingWorld
+from bvh import BVH
+from main import create_world_from_file
+
+
+def run(cam, world, roulette_depth):
+    cam.roulette_depth = roulette_depth
+    cam.initialize()
+    counting = CountingWorld(world)
+    total = 0.0
+    start = time.perf_counter()
+    for tile in cam.row_tiles():
+        total += sum(cam.render_tile(*tile, counting))
+    elapsed = time.perf_counter() - start
+    samples = cam.image_width * cam.image_height * cam.samples_per_pixel
+    mean = total / (3 * samples)
+    return elapsed, counting.rays / samples, mean
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else "../sphere_data.txt"
+    width = int(sys.argv[2]) if len(sys.argv) > 2 else 60
+    spp = int(sys.argv[3]) if len(sys.argv) > 3 else 8
+
+    world, cam = create_world_from_file(path)
+    world = BVH(world)
+    cam.image_width = width
+    cam.samples_per_pixel = spp
+
+    print(f"{'rouletteDepth':<14} {'time (s)':>9} {'rays/path':>10} {'mean':>8}")
+    for depth in (0, 5, 3, 1):
+        elapsed, path_length, mean = run(cam, world, depth)
+        label = "off" if depth == 0 else str(depth)
+        print(f"{label:<14} {elapsed:>9.2f} {path_length:>10.2f} {mean:>8.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Error against samples per pixel for every sampler.
+
+Renders a high-spp reference with the independent sampler, then renders
+the scene at increasing sample counts with each sampler and reports the
+RMS error of the displayed (gamma 2) image against the reference. The
+spp needed by each sampler to reach a given error is what can be cut.
+
+Usage: python3 -m benchmarks.samplers [scene_path] [width] [reference_spp]
+"""
+import sys
+import time
+
+from benchmarks.adaptive import display_errors, render
+from bvh import BVH
+from main import create_world_from_file
+from sampler import SAMPLERS
+
+SPP_STEPS = (1, 4, 16, 64)
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else "../sphere_data.txt"
+    width = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+    reference_spp = int(sys.argv[3]) if len(sys.argv) > 3 else 512
+
+    world, cam = create_world_from_file(path)
+    world = BVH(world)
+    cam.image_width = width
+
+    cam.samples_per_pixel = reference_spp
+    # The reference gets its own seed so it shares no samples with the renders
+    cam.seed = 1
+    cam.initialize()
+    start = time.perf_counter()
+    reference, _ = render(cam, world, False)
+    print(f"Reference: {reference_spp} spp in {time.perf_counter() - start:.1f}s")
+    cam.seed = 0
+    cam.initialize()
+
+    print(f"{'sampler':<12}" + "".join(f"{f'{spp} spp':>10}" for spp in SPP_STEPS) + f"{'time (s)':>10}")
+    for name in SAMPLERS:
+        cam.sampler_type = name
+        errors = []
+        start = time.perf_counter()
+        for spp in SPP_STEPS:
+            cam.samples_per_pixel = spp
+            cam.initialize()
+            pixels, _ = render(cam, world, False)
+            errors.append(display_errors(pixels, reference)[0])
+        elapsed = time.perf_counter() - start
+        print(f"{name:<12}" + "".join(f"{e:>10.4f}" for e in errors) + f"{elapsed:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
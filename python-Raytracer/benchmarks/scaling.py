@@ -0,0 +1,64 @@
+"""Render time against sphere count on generated scenes.
+
+Generates scenes of each sphere count with scene_gen.py (fixed seed),
+builds the acceleration structure and renders a small image on one core.
+The render time per camera sample should grow with the log of the count
+for the BVH and linearly for the spheres and list accelerators; the build
+time shows where setup starts to dominate.
+
+Usage: python3 -m benchmarks.scaling [counts] [distribution] [accel] [width] [samples_per_pixel]
+       e.g. python3 -m benchmarks.scaling 1000,10000,100000 clustered bvh 64 1
+"""
+import sys
+import time
+
+from bvh import BVH
+from camera import Camera
+from main import set_camera_param
+from scene_gen import generate_scene
+
+
+def build(world, accel):
+    if accel == "bvh":
+        return BVH(world)
+    if accel == "spheres":
+        from sphere_set import SphereSet
+
+        return SphereSet(world)
+    return world
+
+
+def main():
+    counts = [int(n) for n in (sys.argv[1] if len(sys.argv) > 1 else "1000,10000,100000").split(",")]
+    distribution = sys.argv[2] if len(sys.argv) > 2 else "uniform"
+    accel = sys.argv[3] if len(sys.argv) > 3 else "bvh"
+    width = int(sys.argv[4]) if len(sys.argv) > 4 else 64
+    spp = int(sys.argv[5]) if len(sys.argv) > 5 else 1
+
+    print(f"{distribution} scenes, {accel}, {width} px wide @ {spp} spp, 1 core")
+    print(f"{'spheres':>9} {'generate s':>11} {'build s':>9} {'render s':>9} {'us/sample':>10}")
+    for count in counts:
+        start = time.perf_counter()
+        scene = generate_scene(count, seed=1, distribution=distribution)
+        world = scene.world()
+        generated = time.perf_counter()
+        world = build(world, accel)
+        built = time.perf_counter()
+
+        cam = Camera()
+        for parts in scene.camera_lines:
+            set_camera_param(cam, parts)
+        cam.image_width = width
+        cam.samples_per_pixel = spp
+        cam.initialize()
+        for tile in cam.row_tiles():
+            cam.render_tile(*tile, world)
+        rendered = time.perf_counter()
+
+        samples = cam.image_width * cam.image_height * spp
+        print(f"{len(scene) - 1:>9,} {generated - start:>11.3f} {built - generated:>9.3f} "
+              f"{rendered - built:>9.3f} {(rendered - built) / samples * 1e6:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Scene load time from text against the compiled scene file.
+
+Writes a scene of random small spheres to a temporary directory, then
+times parsing the text, the first load (parse and write the compiled
+file), loading the compiled file, turning it into Sphere objects,
+pickling the compiled world (as pool workers and render nodes receive it)
+and building a SphereSet from the text and from the compiled scene. The
+unpickled world is checked against the loaded one.
+
+Usage: python3 -m benchmarks.scene_load [sphere_count] [runs]
+"""
+import os
+import pickle
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+import compiled_scene
+from main import create_world_from_file
+
+
+def write_scene(path, count):
+    rng = random.Random(1)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("c width 400\nc samplesPerPixel 16\n")
+        for _ in range(count):
+            x, z = rng.uniform(-100.0, 100.0), rng.uniform(-100.0, 100.0)
+            choose = rng.random()
+            if choose < 0.8:
+                f.write(f"{x} 0.2 {z} 0.2 lambertian {rng.random()} {rng.random()} {rng.random()}\n")
+            elif choose < 0.95:
+                f.write(f"{x} 0.2 {z} 0.2 metal {rng.random()} {rng.random()} {rng.random()} "
+                        f"{0.5 * rng.random()}\n")
+            else:
+                f.write(f"{x} 0.2 {z} 0.2 dielectric 1.5\n")
+
+
+def same_world(world, other):
+    """True if both worlds hold the same spheres and materials"""
+    if len(world.objects) != len(other.objects) or len(world.palette) != len(other.palette):
+        return False
+    if any(world.palette[k] != other.palette[k] for k in range(len(world.palette))):
+        return False
+    return all(
+        (a.center.x(), a.center.y(), a.center.z(), a.radius, a.mat_index)
+        == (b.center.x(), b.center.y(), b.center.z(), b.radius, b.mat_index)
+        for a, b in zip(world.objects, other.objects)
+    )
+
+
+def timed(fn, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), result
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    tmpdir = tempfile.mkdtemp(prefix="scene-load-")
+    path = os.path.join(tmpdir, "scene.txt")
+    try:
+        write_scene(path, count)
+        size = os.path.getsize(path)
+        rows = []
+        parse, (text_world, _) = timed(lambda: create_world_from_file(path, compiled=False), 1)
+        rows.append(("parse text", parse))
+        first, _ = timed(lambda: create_world_from_file(path), 1)
+        rows.append(("first load (parse + compile)", first))
+        load, (world, _) = timed(lambda: create_world_from_file(path), runs)
+        rows.append(("compiled load", load))
+        rows.append(("compiled -> Sphere objects",
+                     timed(lambda: compiled_scene.load(path)[0].objects.spheres(), runs)[0]))
+        round_trip, copy = timed(lambda: pickle.loads(pickle.dumps(world)), runs)
+        rows.append(("pickle compiled world", round_trip))
+        if not same_world(world, copy):
+            print("Error: the unpickled compiled world differs from the loaded one")
+            sys.exit(1)
+        try:
+            from sphere_set import SphereSet
+
+            rows.append(("SphereSet from text world", timed(lambda: SphereSet(text_world), 1)[0]))
+            rows.append(("SphereSet from compiled", timed(lambda: SphereSet(world), runs)[0]))
+        except ImportError:
+            pass
+        compiled_size = os.path.getsize(compiled_scene.compiled_path(path))
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    print(f"{count:,} spheres: {size / 1e6:.1f} MB of text, {compiled_size / 1e6:.1f} MB compiled")
+    print(f"{'step':<30} {'seconds':>9}")
+    for label, seconds in rows:
+        print(f"{label:<30} {seconds:>9.4f}")
+    print(f"Compiled load is {parse / load:,.0f}x faster than parsing the text")
+
+
+if __name__ == "__main__":
+    main()
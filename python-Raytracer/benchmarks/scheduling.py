@@ -0,0 +1,70 @@
+"""Load balance of scanline tasks versus cost-ordered tiles.
+
+Measures the render time of every scanline and of every tile on one core,
+then replays both task lists through a greedy pool of N workers (each task
+goes to the first idle worker, as ProcessPoolExecutor does) to get the
+makespan at each core count from todo.md. Efficiency is the ideal time,
+total work / N, over the makespan; the gap is the tail where a few heavy
+tasks run while the other workers sit idle.
+
+Usage: python3 -m benchmarks.scheduling [scene_path] [width] [samples_per_pixel] [tile_size]
+"""
+import heapq
+import sys
+import time
+
+from bvh import BVH
+from main import create_world_from_file
+from scheduler import TileScheduler
+from benchmarks.ipc import CORE_COUNTS
+
+
+def measure(cam, world, tiles):
+    costs = []
+    for tile in tiles:
+        start = time.perf_counter()
+        cam.render_tile(*tile, world)
+        costs.append(time.perf_counter() - start)
+    return costs
+
+
+def makespan(costs, workers):
+    finish = [0.0] * workers
+    for cost in costs:
+        heapq.heappush(finish, heapq.heappop(finish) + cost)
+    return max(finish)
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else "../sphere_data.txt"
+    width = int(sys.argv[2]) if len(sys.argv) > 2 else 160
+    spp = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+    tile_size = int(sys.argv[4]) if len(sys.argv) > 4 else 16
+
+    world, cam = create_world_from_file(path)
+    world = BVH(world)
+    cam.image_width = width
+    cam.samples_per_pixel = spp
+    cam.initialize()
+
+    row_costs = measure(cam, world, cam.row_tiles())
+    scheduler = TileScheduler(cam.image_width, cam.image_height, tile_size)
+    for tile, cost in zip(scheduler.tiles, measure(cam, world, scheduler.tiles)):
+        scheduler.record(tile, cost)
+    tile_costs = [scheduler.costs[tile] for tile in scheduler.ordered()]
+
+    total = sum(row_costs)
+    print(f"Scene: {path}, {width}x{cam.image_height} @ {spp} spp, {total:.2f}s of work, "
+          f"{len(row_costs)} rows vs {len(tile_costs)} tiles of {tile_size}x{tile_size}")
+    print(f"heaviest row {max(row_costs) * 1000:.1f} ms, "
+          f"heaviest tile {max(tile_costs) * 1000:.1f} ms")
+    print(f"{'cores':>5} {'rows s':>8} {'rows eff':>9} {'tiles s':>8} {'tiles eff':>10}")
+    for n in CORE_COUNTS:
+        rows = makespan(row_costs, n)
+        tiles = makespan(tile_costs, n)
+        print(f"{n:>5} {rows:>8.3f} {total / n / rows:>9.0%} "
+              f"{tiles:>8.3f} {sum(tile_costs) / n / tiles:>10.0%}")
+
+
+if __name__ == "__main__":
+    main()
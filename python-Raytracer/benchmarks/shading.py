@@ -0,0 +1,100 @@
+"""Per-bounce shading cost: scatter per ray against material-sorted batches.
+
+Traces the camera samples of a generated scene a bounce at a time with
+the batched engine (shading.py). At every bounce the hits are shaded twice
+from the same sampler state, once the way Camera.ray_color does it (one
+scatter call per hit, in path order, whatever its material) and once with
+one Material.scatter_batch call per material class, and both times are
+reported per hit. The end-to-end render times of the scalar and batched
+engines follow.
+
+Usage: python3 -m benchmarks.shading [spheres] [width] [samples_per_pixel] [max_depth]
+       e.g. python3 -m benchmarks.shading 2000 64 2 8
+"""
+import sys
+import time
+
+from bvh import BVH
+from camera import Camera
+from main import set_camera_param
+from sampler import BOUNCE_DIMS, CAMERA_DIMS
+from scene_gen import generate_scene
+from shading import BatchedRenderer
+
+
+def per_ray(batch, hits, palette, sampler, dim):
+    for p in hits:
+        rec = batch.recs[p]
+        sampler.resume(batch.states[p], dim)
+        palette[rec.mat_index].scatter(batch.rays[p], rec, sampler)
+
+
+def per_group(batch, groups, palette, sampler, dim):
+    for kind, paths in groups.items():
+        recs = [batch.recs[p] for p in paths]
+        kind.scatter_batch(
+            [palette[rec.mat_index] for rec in recs],
+            [batch.rays[p] for p in paths],
+            recs,
+            [batch.states[p] for p in paths],
+            sampler,
+            dim,
+        )
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    width = int(sys.argv[2]) if len(sys.argv) > 2 else 64
+    spp = int(sys.argv[3]) if len(sys.argv) > 3 else 2
+    max_depth = int(sys.argv[4]) if len(sys.argv) > 4 else 8
+
+    scene = generate_scene(count, seed=1)
+    world = BVH(scene.world())
+    cam = Camera()
+    for parts in scene.camera_lines:
+        set_camera_param(cam, parts)
+    cam.image_width = width
+    cam.samples_per_pixel = spp
+    cam.max_depth = max_depth
+    cam.initialize()
+    palette = world.palette
+    sampler = cam.sampler
+    renderer = BatchedRenderer(cam, world)
+    clock = time.perf_counter
+
+    print(f"{len(scene) - 1:,} spheres, {cam.image_width}x{cam.image_height} @ {spp} spp, "
+          f"max depth {max_depth}, 1 core")
+    print(f"{'bounce':>6} {'hits':>8} {'groups':>6} {'per-ray us/hit':>15} {'batched us/hit':>15}")
+    batch = renderer.camera_paths(0, 0, cam.image_width, cam.image_height, spp)
+    for bounce in range(max_depth):
+        if not batch.active:
+            break
+        groups, _ = renderer.intersect(batch)
+        hit_paths = sorted(p for paths in groups.values() for p in paths)
+        hits = len(hit_paths)
+        if hits == 0:
+            break
+        dim = CAMERA_DIMS + BOUNCE_DIMS * bounce
+
+        start = clock()
+        per_ray(batch, hit_paths, palette, sampler, dim)
+        scalar = clock() - start
+        start = clock()
+        per_group(batch, groups, palette, sampler, dim)
+        batched = clock() - start
+        print(f"{bounce:>6} {hits:>8,} {len(groups):>6} {scalar / hits * 1e6:>15.2f} "
+              f"{batched / hits * 1e6:>15.2f}")
+        renderer.shade(batch, groups, bounce)
+
+    tile = (0, 0, cam.image_width, cam.image_height)
+    start = clock()
+    cam.render_tile(*tile, world)
+    scalar = clock() - start
+    start = clock()
+    renderer.render_tile(*tile)
+    batched = clock() - start
+    print(f"render: scalar {scalar:.3f}s, batched {batched:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+"""Benchmark suite for the tracer's hot paths and end-to-end scaling.
+
+Three groups of benchmarks, all on the same scene and with fixed seeds:
+
+    micro  Vec3 operations, random numbers, Sphere/BVH/list intersection,
+           the three scatter functions and color encoding
+    mid    one camera path, one scanline and one tile (scalar, and the
+           wavefront engine when NumPy is available)
+    e2e    Camera.render of the whole image for every core count of
+           todo.md that the machine has
+
+Every benchmark gets warmup and repeated timed runs (see harness.py); the
+table shows the median and minimum time per call and the spread. --json
+writes all repetitions with the environment, and benchmarks.compare diffs
+two such files:
+
+    python3 -m benchmarks.suite --json before.json
+    python3 -m benchmarks.suite --json after.json
+    python3 -m benchmarks.compare before.json after.json
+
+Usage: python3 -m benchmarks.suite [--scene <path>] [--groups micro,mid,e2e]
+       [--filter <text>] [--repeat <n>] [--warmup <n>] [--min-time <seconds>]
+       [--cores <n,...>] [--width <pixels>] [--spp <n>] [--json <path>]
+"""
+import contextlib
+import io
+import multiprocessing
+import sys
+
+from benchmarks.harness import print_header, print_record, run_benchmark, save
+from benchmarks.ipc import CORE_COUNTS
+from bvh import BVH
+from color import encode_ldr, write_color
+from hittable import Disk, HitRecord, Plane, Sphere
+from image import Image
+from main import create_world_from_file
+from material import Dielectric, Lambertian, Metal
+from ray import Ray
+from rng import stream_key, uniform
+from sampler import make_sampler
+from utils import Interval, INFINITY
+from vec3 import Color, Point3, Vec3, cross, dot, fma, unit_vector
+
+GROUPS = ("micro", "mid", "e2e")
+
+
+def micro_benchmarks(world, bvh, cam):
+    """(name, function, work per call) of the microbenchmarks"""
+    a = Vec3(1.0, 2.0, 3.0)
+    b = Vec3(0.5, 0.25, 0.125)
+
+    def iadd_scaled():
+        acc = Vec3()
+        acc.add_scaled(a, 0.5)
+        acc += b
+
+    key = stream_key(0, 1234, 5)
+    independent = make_sampler("independent", 16)
+    sobol = make_sampler("sobol", 16)
+
+    def next_2d(sampler):
+        def fn():
+            sampler.start(1234, 5)
+            sampler.next_2d()
+        return fn
+
+    # Camera rays through the middle of the image, shared by the world tests
+    sampler = cam.sampler
+    rays = []
+    for j in range(cam.image_height // 4, cam.image_height, max(1, cam.image_height // 8)):
+        for i in range(0, cam.image_width, max(1, cam.image_width // 32)):
+            sampler.start(j * cam.image_width + i, 0)
+            rays.append(cam.get_ray(i, j))
+
+    def trace_all(structure):
+        def fn():
+            rec = HitRecord()
+            ray_t = Interval(0.001, INFINITY)
+            for r in rays:
+                structure.hit(r, ray_t, rec)
+        return fn
+
+    sphere = Sphere(Point3(0.0, 0.0, -1.0), 0.5, 0)
+    ground = Sphere(Point3(0.0, -1000.0, 0.0), 1000.0, 0)
+    plane = Plane(Point3(0.0, 0.0, 0.0), Vec3(0.0, 1.0, 0.0), 0)
+    disk = Disk(Point3(0.0, 0.0, -1.0), Vec3(0.0, 0.0, 1.0), 0.5, 0)
+    ground_ray = Ray(Point3(0.0, 1.0, 0.0), Vec3(0.0, -1.0, -1.0))
+    hit_ray = Ray(Point3(0.0, 0.0, 0.0), Vec3(0.0, 0.0, -1.0))
+    miss_ray = Ray(Point3(0.0, 0.0, 0.0), Vec3(0.0, 1.0, -1.0))
+    rec = HitRecord()
+    sphere.hit(hit_ray, Interval(0.001, INFINITY), rec)
+    scatter_sampler = make_sampler("independent", 16)
+
+    def scatter(material):
+        def fn():
+            scatter_sampler.start(7, 0)
+            material.scatter(hit_ray, rec, scatter_sampler)
+        return fn
+
+    row = Image(cam.image_width, 1)
+    for i in range(cam.image_width):
+        row.set_pixel(i, 0, Color(i / cam.image_width, 0.5, 0.25))
+    pixel = Color(0.25, 0.5, 0.75)
+
+    return [
+        ("vec3.add", lambda: a + b, None),
+        ("vec3.sub", lambda: a - b, None),
+        ("vec3.mul_scalar", lambda: a * 0.5, None),
+        ("vec3.mul_vec", lambda: a * b, None),
+        ("vec3.dot", lambda: dot(a, b), None),
+        ("vec3.cross", lambda: cross(a, b), None),
+        ("vec3.unit_vector", lambda: unit_vector(a), None),
+        ("vec3.fma", lambda: fma(a, b, 0.5), None),
+        ("vec3.inplace_accumulate", iadd_scaled, None),
+        ("rng.uniform", lambda: uniform(key, 3), None),
+        ("sampler.independent.next_2d", next_2d(independent), None),
+        ("sampler.sobol.next_2d", next_2d(sobol), None),
+        ("sphere.hit", lambda: sphere.hit(hit_ray, Interval(0.001, INFINITY), HitRecord()), None),
+        ("sphere.miss", lambda: sphere.hit(miss_ray, Interval(0.001, INFINITY), HitRecord()), None),
+        ("ground_sphere.hit", lambda: ground.hit(ground_ray, Interval(0.001, INFINITY), HitRecord()), None),
+        ("plane.hit", lambda: plane.hit(ground_ray, Interval(0.001, INFINITY), HitRecord()), None),
+        ("disk.hit", lambda: disk.hit(hit_ray, Interval(0.001, INFINITY), HitRecord()), None),
+        ("world.bvh.hit", trace_all(bvh), len(rays)),
+        ("world.list.hit", trace_all(world), len(rays)),
+        ("scatter.lambertian", scatter(Lambertian(Color(0.5, 0.5, 0.5))), None),
+        ("scatter.metal", scatter(Metal(Color(0.8, 0.6, 0.2), 0.3)), None),
+        ("scatter.dielectric", scatter(Dielectric(1.5)), None),
+        ("color.write_color", lambda: write_color(io.StringIO(), pixel), None),
+        ("color.encode_ldr.row", lambda: encode_ldr(row.pixels), cam.image_width),
+    ]
+
+
+def mid_benchmarks(bvh, cam, world):
+    """(name, function, work per call) of the scanline and tile benchmarks"""
+    w = cam.image_width
+    h = cam.image_height
+    j = h // 2
+    size = min(16, w, h)
+    tile = ((w - size) // 2, (h - size) // 2, (w - size) // 2 + size, (h - size) // 2 + size)
+    spp = cam.samples_per_pixel
+
+    def path():
+        cam.sampler.start(j * w + w // 2, 0)
+        cam.ray_color(cam.get_ray(w // 2, j), cam.max_depth, bvh)
+
+    benchmarks = [
+        ("camera.path", path, None),
+        ("render.scanline", lambda: cam.render_tile(0, j, w, j + 1, bvh), w * spp),
+        (f"render.tile{size}", lambda: cam.render_tile(*tile, bvh), size * size * spp),
+    ]
+
+    try:
+        from wavefront import WavefrontRenderer
+    except ImportError:
+        print("NumPy not available, skipping the wavefront benchmarks")
+        return benchmarks
+
+    tracer = WavefrontRenderer(cam, world)
+    benchmarks.append(
+        (f"wavefront.tile{size}", lambda: tracer.render_tile(*tile), size * size * spp)
+    )
+    return benchmarks
+
+
+def e2e_benchmarks(bvh, cam, cores):
+    """(name, function, work per call) of the full renders"""
+    def render(n):
+        def fn():
+            with contextlib.redirect_stdout(io.StringIO()):
+                cam.render(bvh, io.BytesIO(), n, image_format="P6")
+        return fn
+
+    pixels = cam.image_width * cam.image_height * cam.samples_per_pixel
+    return [(f"render.cores{n}", render(n), pixels) for n in cores]
+
+
+def main():
+    scene = "../sphere_data.txt"
+    groups = GROUPS
+    name_filter = None
+    repeat = None
+    warmup = None
+    min_time = 0.05
+    cores = None
+    width = 80
+    spp = 4
+    json_path = None
+
+    args = sys.argv[1:]
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        value = args[i + 1] if i + 1 < len(args) else None
+        if arg in ("--help", "-h"):
+            print(__doc__)
+            return
+        if value is None:
+            print(f"Error: {arg} needs a value")
+            sys.exit(1)
+        if arg == "--scene":
+            scene = value
+        elif arg == "--groups":
+            groups = tuple(value.split(","))
+        elif arg == "--filter":
+            name_filter = value
+        elif arg == "--repeat":
+            repeat = int(value)
+        elif arg == "--warmup":
+            warmup = int(value)
+        elif arg == "--min-time":
+            min_time = float(value)
+        elif arg == "--cores":
+            cores = [int(c) for c in value.split(",")]
+        elif arg == "--width":
+            width = int(value)
+        elif arg == "--spp":
+            spp = int(value)
+        elif arg == "--json":
+            json_path = value
+        else:
+            print(f"Error: Unknown argument: {arg}")
+            sys.exit(1)
+        i += 2
+
+    unknown = [g for g in groups if g not in GROUPS]
+    if unknown:
+        print(f"Error: Unknown group(s): {', '.join(unknown)} (expected {', '.join(GROUPS)})")
+        sys.exit(1)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        world, cam = create_world_from_file(scene)
+    if world is None:
+        print(f"Error: could not load {scene}")
+        sys.exit(1)
+    bvh = BVH(world)
+    cam.image_width = width
+    cam.samples_per_pixel = spp
+    cam.seed = 0
+    cam.initialize()
+
+    available = multiprocessing.cpu_count()
+    if cores is None:
+        cores = [n for n in CORE_COUNTS if n <= available]
+        skipped = [n for n in CORE_COUNTS if n > available]
+        if "e2e" in groups and skipped:
+            print(f"Skipping core counts above the {available} available: {skipped}")
+
+    print(f"Scene: {scene} ({len(world.objects)} objects), {width}x{cam.image_height} @ {spp} spp")
+    settings = {
+        # (repeat, warmup, calls per repetition or None to calibrate)
+        "micro": (repeat or 7, 1 if warmup is None else warmup, None),
+        "mid": (repeat or 5, 1 if warmup is None else warmup, None),
+        "e2e": (repeat or 3, 0 if warmup is None else warmup, 1),
+    }
+
+    results = []
+    print_header()
+    for group in groups:
+        if group == "micro":
+            benchmarks = micro_benchmarks(world, bvh, cam)
+        elif group == "mid":
+            benchmarks = mid_benchmarks(bvh, cam, world)
+        else:
+            benchmarks = e2e_benchmarks(bvh, cam, cores)
+
+        group_repeat, group_warmup, number = settings[group]
+        for name, fn, work in benchmarks:
+            if name_filter and name_filter not in name:
+                continue
+            record = run_benchmark(
+                name, group, fn, group_repeat, group_warmup, min_time, number, work
+            )
+            print_record(record)
+            results.append(record)
+
+    if json_path:
+        save(json_path, results)
+        print(f"Results written to {json_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Microbenchmark of the Vec3 operations on the tracer's hot paths.
+
+Compares the slotted Vec3 against the previous list-backed implementation
+(kept below as LegacyVec3) operation by operation, then times a small
+single-core render end to end. Runs unchanged on CPython and PyPy:
+
+    python3 -m benchmarks.vec3_ops
+    pypy3 -m benchmarks.vec3_ops
+"""
+import platform
+import sys
+import time
+import timeit
+
+from vec3 import Vec3, dot, fma
+
+
+class LegacyVec3:
+    """The original list-backed vector, for comparison only"""
+
+    def __init__(self, e0=0.0, e1=0.0, e2=0.0):
+        self.e = [e0, e1, e2]
+
+    def __add__(self, other):
+        return LegacyVec3(
+            self.e[0] + other.e[0], self.e[1] + other.e[1], self.e[2] + other.e[2]
+        )
+
+    def __sub__(self, other):
+        return LegacyVec3(
+            self.e[0] - other.e[0], self.e[1] - other.e[1], self.e[2] - other.e[2]
+        )
+
+    def __mul__(self, other):
+        if isinstance(other, (int, float)):
+            return LegacyVec3(self.e[0] * other, self.e[1] * other, self.e[2] * other)
+        return LegacyVec3(
+            self.e[0] * other.e[0], self.e[1] * other.e[1], self.e[2] * other.e[2]
+        )
+
+
+def legacy_dot(u, v):
+    return u.e[0] * v.e[0] + u.e[1] * v.e[1] + u.e[2] * v.e[2]
+
+
+def accumulate_legacy(a, b):
+    acc = LegacyVec3()
+    for _ in range(10):
+        acc = acc + a * 0.5 + b
+    return acc
+
+
+def accumulate_inplace(a, b):
+    acc = Vec3()
+    for _ in range(10):
+        acc.add_scaled(a, 0.5)
+        acc += b
+    return acc
+
+
+def per_op(number):
+    a, b = Vec3(1.0, 2.0, 3.0), Vec3(0.5, 0.25, 0.125)
+    la, lb = LegacyVec3(1.0, 2.0, 3.0), LegacyVec3(0.5, 0.25, 0.125)
+    cases = [
+        ("a + b", lambda: la + lb, lambda: a + b),
+        ("a - b", lambda: la - lb, lambda: a - b),
+        ("a * s", lambda: la * 0.5, lambda: a * 0.5),
+        ("a * b", lambda: la * lb, lambda: a * b),
+        ("dot(a, b)", lambda: legacy_dot(la, lb), lambda: dot(a, b)),
+        ("a + b * s", lambda: la + lb * 0.5, lambda: fma(a, b, 0.5)),
+        ("10x accumulate", lambda: accumulate_legacy(la, lb), lambda: accumulate_inplace(a, b)),
+    ]
+
+    print(f"{'operation':<16} {'legacy ns':>10} {'new ns':>10} {'speedup':>9}")
+    for name, legacy, new in cases:
+        legacy_ns = min(timeit.repeat(legacy, number=number, repeat=5)) / number * 1e9
+        new_ns = min(timeit.repeat(new, number=number, repeat=5)) / number * 1e9
+        print(f"{name:<16} {legacy_ns:>10.1f} {new_ns:>10.1f} {legacy_ns / new_ns:>8.2f}x")
+
+
+def end_to_end(path, width, spp):
+    from main import create_world_from_file
+    from bvh import BVH
+
+    world, cam = create_world_from_file(path)
+    world = BVH(world)
+    cam.image_width = width
+    cam.samples_per_pixel = spp
+    cam.initialize()
+
+    start = time.perf_counter()
+    for tile in cam.row_tiles():
+        cam.render_tile(*tile, world)
+    elapsed = time.perf_counter() - start
+    samples = cam.image_width * cam.image_height * spp
+    print(f"End to end: {width}x{cam.image_height} @ {spp} spp in {elapsed:.2f}s "
+          f"({samples / elapsed:,.0f} camera rays/sec)")
+
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    print(f"{platform.python_implementation()} {platform.python_version()}")
+    per_op(number)
+    end_to_end("../sphere_data.txt", 100, 4)
+
+
+if __name__ == "__main__":
+    main()
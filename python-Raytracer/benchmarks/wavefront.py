@@ -0,0 +1,86 @@
+"""Throughput comparison between the scalar and the wavefront engines.
+
+Renders the same scene with both engines on a single core and reports ray
+segments traced per second (every bounce counts as one ray), together with
+the mean pixel value of both images and the RMS difference between them,
+which is zero up to rounding since both engines draw the same random
+streams.
+
+Usage: python3 -m benchmarks.wavefront [scene_path] [width] [samples_per_pixel]
+"""
+import math
+import sys
+import time
+
+from main import create_world_from_file
+
+
+class CountingWorld:
+    """Forwards hit() to the wrapped world and counts the rays tested; the
+    materials are the wrapped world's"""
+
+    def __init__(self, world):
+        self.world = world
+        self.palette = world.palette
+        self.rays = 0
+
+    def hit(self, r, ray_t, rec):
+        self.rays += 1
+        return self.world.hit(r, ray_t, rec)
+
+
+def render_scalar(cam, world):
+    cam.initialize()
+    counting = CountingWorld(world)
+    pixels = []
+    start = time.perf_counter()
+    for tile in cam.row_tiles():
+        pixels.extend(cam.render_tile(*tile, counting))
+    return time.perf_counter() - start, counting.rays, pixels
+
+
+def render_wavefront(cam, world):
+    from wavefront import WavefrontRenderer
+
+    cam.initialize()
+    tracer = WavefrontRenderer(cam, world)
+    pixels = []
+    start = time.perf_counter()
+    for tile in cam.row_tiles(4):
+        pixels.extend(tracer.render_tile(*tile))
+    return time.perf_counter() - start, tracer.rays_traced, pixels
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else "../sphere_data.txt"
+    width = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+    spp = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+
+    world, cam = create_world_from_file(path)
+    cam.image_width = width
+    cam.samples_per_pixel = spp
+
+    scalar_time, scalar_rays, scalar_pixels = render_scalar(cam, world)
+    wave_time, wave_rays, wave_pixels = render_wavefront(cam, world)
+
+    print(f"Scene: {path} ({len(world.objects)} objects), "
+          f"{width}x{cam.image_height} @ {spp} spp")
+    print(f"{'engine':<10} {'time (s)':>10} {'rays':>12} {'rays/sec':>12}")
+    for name, elapsed, rays in (
+        ("scalar", scalar_time, scalar_rays),
+        ("wavefront", wave_time, wave_rays),
+    ):
+        print(f"{name:<10} {elapsed:>10.2f} {rays:>12,} {rays / elapsed:>12,.0f}")
+    print(f"Speedup: {(wave_rays / wave_time) / (scalar_rays / scalar_time):.1f}x")
+
+    # render_tile returns sample sums; compare per-sample means
+    scalar_pixels = [v / spp for v in scalar_pixels]
+    wave_pixels = [v / spp for v in wave_pixels]
+    n = len(scalar_pixels)
+    rmse = math.sqrt(sum((a - b) ** 2 for a, b in zip(scalar_pixels, wave_pixels)) / n)
+    print(f"Mean value: scalar {sum(scalar_pixels) / n:.4f}, "
+          f"wavefront {sum(wave_pixels) / n:.4f}, RMS difference {rmse:.4f}")
+
+
+if __name__ == "__main__":
+    main()
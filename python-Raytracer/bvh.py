@@ -0,0 +1,310 @@
+"""Bounding volume hierarchy over the objects of a HittableList.
+
+The tree is built with a binned surface area heuristic and stored flattened
+in depth-first order: node k keeps its box at bounds[6k:6k+6] and its
+record (right child or first primitive, primitive count, split axis) at
+nodes[3k:3k+3]. The left child of an interior node is always k + 1. Both
+arrays pickle as raw bytes, so shipping the tree to pool workers costs little
+more than the primitives themselves.
+
+Objects that would spoil the tree stay out of it: unbounded ones (planes)
+and ones whose box takes up much of the scene's, like the huge sphere the
+scenes use as ground, which would otherwise enlarge every node on its way
+to a leaf. Each gets a leaf node of its own, visited after the tree, so
+its box is still tested (for a ground sphere the top of the box is the
+plane it touches, and rays leaving the ground upwards skip it) and the
+closest hit in the tree clips it.
+"""
+import time
+from array import array
+
+from aabb import AABB
+from hittable import Hittable, HitRecord
+from utils import Interval, INFINITY
+
+SAH_BINS = 12
+TRAVERSAL_COST = 1.0
+MAX_LEAF_SIZE = 4
+MAX_SAH_LEAF_SIZE = 8
+MAX_DEPTH = 64
+# Objects with more than this fraction of the scene box's area are kept
+# out of the tree
+LARGE_FRACTION = 0.25
+
+# Stand-in for 1/0 in the slab test; finite so that 0 * inv stays a number
+HUGE = 1e300
+
+
+def _union(box, other):
+    return (
+        min(box[0], other[0]), min(box[1], other[1]), min(box[2], other[2]),
+        max(box[3], other[3]), max(box[4], other[4]), max(box[5], other[5]),
+    )
+
+
+def _area(box):
+    dx = box[3] - box[0]
+    dy = box[4] - box[1]
+    dz = box[5] - box[2]
+    return 2.0 * (dx * dy + dy * dz + dz * dx)
+
+
+EMPTY_BOX = (HUGE, HUGE, HUGE, -HUGE, -HUGE, -HUGE)
+
+
+def _bounded(box):
+    return all(abs(v) < INFINITY for v in box)
+
+
+class BVH(Hittable):
+    def __init__(self, hittable_list):
+        start = time.perf_counter()
+
+        objects = hittable_list.objects
+        self.palette = hittable_list.palette
+        self.boxes = []
+        for obj in objects:
+            b = obj.bounding_box()
+            self.boxes.append((b.min[0], b.min[1], b.min[2], b.max[0], b.max[1], b.max[2]))
+        self.centroids = [
+            (0.5 * (b[0] + b[3]), 0.5 * (b[1] + b[4]), 0.5 * (b[2] + b[5]))
+            for b in self.boxes
+        ]
+
+        # Unbounded and large objects first, then the leaves of the tree in order
+        indices = [k for k in range(len(objects)) if _bounded(self.boxes[k])]
+        scene_box = EMPTY_BOX
+        for k in indices:
+            scene_box = _union(scene_box, self.boxes[k])
+        limit = LARGE_FRACTION * _area(scene_box)
+        order = [k for k in range(len(objects))
+                 if not _bounded(self.boxes[k]) or _area(self.boxes[k]) > limit]
+        self.outside_count = len(order)
+        outside = set(order)
+        box = EMPTY_BOX
+        for k in order:
+            box = _union(box, self.boxes[k])
+
+        self.bounds = array("d")
+        self.nodes = array("i")
+        self.leaf_count = 0
+        self.depth = 0
+        self._build([k for k in indices if k not in outside], order, 1)
+        self.objects = [objects[k] for k in order]
+        self.box = _union(box, tuple(self.bounds[0:6]))
+
+        # A leaf of its own for each object outside the tree, behind the
+        # tree's nodes; the traversal stack starts with them under the root
+        self.start_stack = []
+        for k in range(self.outside_count):
+            self.start_stack.append(len(self.nodes) // 3)
+            self.bounds.extend(self.boxes[order[k]])
+            self.nodes.extend((k, 1, -1))
+        self.start_stack.append(0)
+
+        # Only needed while building
+        del self.boxes
+        del self.centroids
+
+        self.build_time = time.perf_counter() - start
+        self.collect_stats = False
+        self.rays = 0
+        self.nodes_visited = 0
+        self.prims_tested = 0
+
+    def _build(self, indices, order, depth):
+        node = len(self.nodes) // 3
+        self.depth = max(self.depth, depth)
+
+        box = EMPTY_BOX
+        for k in indices:
+            box = _union(box, self.boxes[k])
+        self.bounds.extend(box)
+        self.nodes.extend((len(order), len(indices), -1))
+
+        split = None
+        if len(indices) > MAX_LEAF_SIZE and depth < MAX_DEPTH:
+            split = self._find_split(indices, box)
+
+        if split is None:
+            self.leaf_count += 1
+            order.extend(indices)
+            return node
+
+        axis, left, right = split
+        self._build(left, order, depth + 1)
+        right_node = self._build(right, order, depth + 1)
+        self.nodes[3 * node] = right_node
+        self.nodes[3 * node + 1] = 0
+        self.nodes[3 * node + 2] = axis
+        return node
+
+    def _find_split(self, indices, box):
+        """Binned SAH split; returns (axis, left, right) or None to make a leaf"""
+        centroids = self.centroids
+        n = len(indices)
+        parent_area = _area(box)
+        best = None
+        best_cost = float(n)
+
+        for axis in range(3):
+            lo = min(centroids[k][axis] for k in indices)
+            hi = max(centroids[k][axis] for k in indices)
+            if hi <= lo:
+                continue
+
+            scale = SAH_BINS / (hi - lo)
+            counts = [0] * SAH_BINS
+            bin_boxes = [EMPTY_BOX] * SAH_BINS
+            for k in indices:
+                b = min(SAH_BINS - 1, int((centroids[k][axis] - lo) * scale))
+                counts[b] += 1
+                bin_boxes[b] = _union(bin_boxes[b], self.boxes[k])
+
+            # Sweep from the right to get the cost of every suffix
+            right_area = [0.0] * SAH_BINS
+            right_count = [0] * SAH_BINS
+            acc_box = EMPTY_BOX
+            acc_count = 0
+            for b in range(SAH_BINS - 1, 0, -1):
+                acc_box = _union(acc_box, bin_boxes[b])
+                acc_count += counts[b]
+                right_area[b] = _area(acc_box) if acc_count else 0.0
+                right_count[b] = acc_count
+
+            acc_box = EMPTY_BOX
+            acc_count = 0
+            for b in range(SAH_BINS - 1):
+                acc_box = _union(acc_box, bin_boxes[b])
+                acc_count += counts[b]
+                if acc_count == 0 or right_count[b + 1] == 0:
+                    continue
+                cost = TRAVERSAL_COST + (
+                    _area(acc_box) * acc_count + right_area[b + 1] * right_count[b + 1]
+                ) / parent_area
+                if cost < best_cost:
+                    best_cost = cost
+                    best = (axis, lo, scale, b)
+
+        if best is None:
+            if n <= MAX_SAH_LEAF_SIZE:
+                return None
+            # All centroids coincide or no split pays off: halve the list
+            box_axis = max(range(3), key=lambda a: box[a + 3] - box[a])
+            ordered = sorted(indices, key=lambda k: centroids[k][box_axis])
+            return box_axis, ordered[: n // 2], ordered[n // 2:]
+
+        axis, lo, scale, split_bin = best
+        left = []
+        right = []
+        for k in indices:
+            if min(SAH_BINS - 1, int((centroids[k][axis] - lo) * scale)) <= split_bin:
+                left.append(k)
+            else:
+                right.append(k)
+        return axis, left, right
+
+    def hit(self, r, ray_t, rec):
+        origin = r.origin
+        direction = r.direction
+        ox, oy, oz = origin.x(), origin.y(), origin.z()
+        dx, dy, dz = direction.x(), direction.y(), direction.z()
+        inv_x = 1.0 / dx if dx != 0.0 else HUGE
+        inv_y = 1.0 / dy if dy != 0.0 else HUGE
+        inv_z = 1.0 / dz if dz != 0.0 else HUGE
+
+        # Offsets of the near and far slab planes inside a node's bounds
+        near_x, far_x = (3, 0) if inv_x < 0.0 else (0, 3)
+        near_y, far_y = (4, 1) if inv_y < 0.0 else (1, 4)
+        near_z, far_z = (5, 2) if inv_z < 0.0 else (2, 5)
+        negative = (inv_x < 0.0, inv_y < 0.0, inv_z < 0.0)
+
+        bounds = self.bounds
+        nodes = self.nodes
+        objects = self.objects
+        t_min = ray_t.min
+        closest = ray_t.max
+        hit_anything = False
+        visited = 0
+        tested = 0
+
+        stack = self.start_stack[:]
+        while stack:
+            node = stack.pop()
+            visited += 1
+
+            # Slab test clipped to the closest hit found so far
+            b = 6 * node
+            t0 = (bounds[b + near_x] - ox) * inv_x
+            t1 = (bounds[b + far_x] - ox) * inv_x
+            if t0 < t_min:
+                t0 = t_min
+            if t1 > closest:
+                t1 = closest
+            t = (bounds[b + near_y] - oy) * inv_y
+            if t > t0:
+                t0 = t
+            t = (bounds[b + far_y] - oy) * inv_y
+            if t < t1:
+                t1 = t
+            t = (bounds[b + near_z] - oz) * inv_z
+            if t > t0:
+                t0 = t
+            t = (bounds[b + far_z] - oz) * inv_z
+            if t < t1:
+                t1 = t
+            if t0 > t1:
+                continue
+
+            n = 3 * node
+            axis = nodes[n + 2]
+            if axis < 0:
+                first = nodes[n]
+                for k in range(first, first + nodes[n + 1]):
+                    tested += 1
+                    if objects[k].hit(r, Interval(t_min, closest), rec):
+                        hit_anything = True
+                        closest = rec.t
+            elif negative[axis]:
+                # Push the far child first so the near one is visited first
+                stack.append(node + 1)
+                stack.append(nodes[n])
+            else:
+                stack.append(nodes[n])
+                stack.append(node + 1)
+
+        if self.collect_stats:
+            self.rays += 1
+            self.nodes_visited += visited
+            self.prims_tested += tested
+
+        return hit_anything
+
+    def bounding_box(self):
+        return AABB(*self.box)
+
+    def node_count(self):
+        return len(self.nodes) // 3 - self.outside_count
+
+    def build_summary(self):
+        return (
+            f"BVH: {len(self.objects)} primitives ({self.outside_count} outside the tree), "
+            f"{self.node_count()} nodes, {self.leaf_count} leaves, depth {self.depth}, "
+            f"built in {self.build_time * 1000.0:.1f} ms"
+        )
+
+    def traversal_summary(self, rays):
+        """Trace the given rays with counters enabled and summarize the work per ray"""
+        self.collect_stats = True
+        self.rays = self.nodes_visited = self.prims_tested = 0
+        for r in rays:
+            self.hit(r, Interval(0.001, INFINITY), HitRecord())
+        self.collect_stats = False
+
+        count = max(1, self.rays)
+        return (
+            f"BVH traversal over {self.rays} rays: "
+            f"{self.nodes_visited / count:.1f} nodes visited and "
+            f"{self.prims_tested / count:.1f} primitive tests per ray "
+            f"(linear scan: {len(self.objects)})"
+        )
@@ -1,12 +1,25 @@
 import math
+import os
 import sys
-from concurrent.futures import ProcessPoolExecutor
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import nullcontext
+from functools import partial
 
 from ray import Ray
-from vec3 import Color, Point3, Vec3, cross, random_in_unit_disk, unit_vector
-from utils import degrees_to_radians, random_double, INFINITY, Interval
+from vec3 import Color, Point3, Vec3, cross, disk_from_square, fma, unit_vector
+from utils import degrees_to_radians, INFINITY, Interval
 from image import Image
-from hittable import HitRecord
+from hittable import HitRecord, HittableList
+from bvh import BVH
+from framebuffer import Framebuffer
+from scheduler import TileScheduler
+from sampler import BOUNCE_DIMS, CAMERA_DIMS, make_sampler
+from checkpoint import Checkpoint, Checkpointer, fingerprint
+from profiling import RenderProfile, TileProfiler
+from stats import RenderStats
+from frustum import TileCuller
 
 
 class Camera:
@@ -22,6 +35,34 @@ class Camera:
         self.vup = Vec3(0.0, 1.0, 0.0)
         self.defocus_angle = 0.0
         self.focus_dist = 10.0
+        self.roulette_depth = 0  # bounces before Russian roulette kicks in, 0 disables it
+        self.roulette_min_survival = 0.05
+        self.tile_size = 16
+        self.sampler_type = "independent"  # see sampler.SAMPLERS
+        self.seed = 0  # renders with the same seed are bit-identical
+        self.collect_stats = False  # count rays, bounces and time into self.stats
+        self.frustum_cull = True  # camera rays only test the objects in view of their tile
+        self.profile = False  # profile every tile into self.profiler
+        self.checkpoint_path = None  # write the running render here
+        self.checkpoint_interval = 60.0  # seconds between checkpoints
+        self.resume = False  # continue from checkpoint_path if it exists
+
+        # Progressive rendering: passes of pass_samples until samples_per_pixel,
+        # the time budget (seconds, 0 for none) or the convergence threshold
+        # (relative RMS change between passes, 0 for none) is reached
+        self.progressive = False
+        self.pass_samples = 1
+        self.time_budget = 0.0
+        self.convergence_threshold = 0.0
+
+        # Adaptive sampling: every pixel takes min_samples (at most
+        # samples_per_pixel), then keeps sampling until the standard error of
+        # its displayed (gamma 2) luminance drops below adaptive_threshold or
+        # it reaches max_samples
+        self.adaptive = False
+        self.min_samples = 8
+        self.max_samples = 0  # 0 means 4 * samples_per_pixel
+        self.adaptive_threshold = 0.05
 
         # Private fields - will be initialized later
         self.image_height = 0
@@ -35,6 +76,17 @@ class Camera:
         self.w = Vec3(0.0, 0.0, 0.0)
         self.defocus_disk_u = Vec3(0.0, 0.0, 0.0)
         self.defocus_disk_v = Vec3(0.0, 0.0, 0.0)
+        self.sampler = None
+        self.stats = None
+        self.profiler = None
+        self.checkpointer = None
+        self.first_pixel_time = None  # wall-clock time the first tile came back
+
+    def __getstate__(self):
+        # The parent's checkpoint writer does not go to the workers
+        state = self.__dict__.copy()
+        state["checkpointer"] = None
+        return state
 
     def __str__(self):
         return (
@@ -48,6 +100,14 @@ class Camera:
             f"vup={self.vup}\n "
             f"defocus_angle={self.defocus_angle}\n "
             f"focus_dist={self.focus_dist}\n "
+            f"roulette_depth={self.roulette_depth}\n "
+            f"roulette_min_survival={self.roulette_min_survival}\n "
+            f"sampler={self.sampler_type}\n "
+            f"seed={self.seed}\n "
+            f"adaptive={self.adaptive}\n "
+            f"min_samples={self.min_samples}\n "
+            f"max_samples={self.sample_cap()}\n "
+            f"adaptive_threshold={self.adaptive_threshold}\n "
         )
 
     def initialize(self):
@@ -56,6 +116,7 @@ class Camera:
 
         self.pixel_samples_scale = 1.0 / self.samples_per_pixel
         self.center = self.look_from
+        self.sampler = make_sampler(self.sampler_type, self.samples_per_pixel, self.seed)
 
         # Determine viewport dimensions
         theta = degrees_to_radians(self.vfov)
@@ -92,118 +153,644 @@ class Camera:
         self.defocus_disk_v = self.v * defocus_radius
 
     def get_ray(self, i, j):
-        """Get a randomly sampled camera ray for the pixel at location i,j"""
+        """Get a randomly sampled camera ray for the pixel at location i,j,
+        drawing from the sampler's current pixel sample"""
         offset = self.sample_square()
-        pixel_sample = (
-            self.pixel00_loc
-            + self.pixel_delta_u * (i + offset.x())
-            + self.pixel_delta_v * (j + offset.y())
-        )
+        pixel_sample = fma(self.pixel00_loc, self.pixel_delta_u, i + offset.x())
+        pixel_sample.add_scaled(self.pixel_delta_v, j + offset.y())
 
         ray_origin = (
             self.center if self.defocus_angle <= 0.0 else self.defocus_disk_sample()
         )
-        ray_direction = pixel_sample - ray_origin
+        pixel_sample -= ray_origin
 
-        return Ray(ray_origin, ray_direction)
+        return Ray(ray_origin, pixel_sample)
 
     def sample_square(self):
         """Returns a random point in the [-0.5,0.5] x [-0.5,0.5] square"""
-        return Vec3(random_double() - 0.5, random_double() - 0.5, 0.0)
+        u, v = self.sampler.next_2d()
+        return Vec3(u - 0.5, v - 0.5, 0.0)
 
     def defocus_disk_sample(self):
         """Returns a random point in the camera defocus disk"""
-        p = random_in_unit_disk()
-        return self.center + self.defocus_disk_u * p.x() + self.defocus_disk_v * p.y()
-
-    def ray_color(self, r, depth, world):
-        """Calculate the color for a ray"""
-        # Base case: ray bounce limit reached
-        if depth <= 0:
-            return Color(0.0, 0.0, 0.0)
+        p = disk_from_square(*self.sampler.next_2d())
+        return fma(self.center, self.defocus_disk_u, p.x()).add_scaled(
+            self.defocus_disk_v, p.y()
+        )
 
+    def ray_color(self, r, depth, world, primary=None):
+        """Calculate the color for a ray by following its path for up to depth
+        bounces; the first segment is traced against primary when given (the
+        candidates of a tile, see frustum.py)"""
+        throughput = Color(1.0, 1.0, 1.0)
         rec = HitRecord()
-
-        if world.hit(r, Interval(0.001, INFINITY), rec):
-            scatter_happened, attenuation, scattered = rec.mat.scatter(r, rec)
-            if scatter_happened:
-                return attenuation * self.ray_color(scattered, depth - 1, world)
-            return Color(0.0, 0.0, 0.0)
-
-        # Background - a simple gradient
-        unit_direction = unit_vector(r.direction)
-        a = 0.5 * (unit_direction.y() + 1.0)
-        return Color(1.0, 1.0, 1.0) * (1.0 - a) + Color(0.5, 0.7, 1.0) * a
-
-    def process_row(self, j, world):
-        """Process a single row of the image"""
-        row_pixels = [Color(0.0, 0.0, 0.0) for _ in range(self.image_width)]
-
-        for i in range(self.image_width):
-            pixel_color = Color(0.0, 0.0, 0.0)
-            for _ in range(self.samples_per_pixel):
-                r = self.get_ray(i, j)
-                pixel_color = pixel_color + self.ray_color(r, self.max_depth, world)
-            row_pixels[i] = pixel_color * self.pixel_samples_scale
-
-        return j, row_pixels
-
-    def render(self, world, out_stream, num_threads=1):
-        """Render the scene to the output stream"""
+        ray_t = Interval(0.001, INFINITY)
+        sampler = self.sampler
+        palette = world.palette
+        target = world if primary is None else primary
+
+        for bounce in range(depth):
+            # Every bounce draws from its own dimensions of the camera sample
+            sampler.dim = CAMERA_DIMS + BOUNCE_DIMS * bounce
+            hit = target.hit(r, ray_t, rec)
+            target = world
+            if not hit:
+                # Background - a simple gradient, (1 - a) * white + a * (0.5, 0.7, 1.0)
+                unit_direction = unit_vector(r.direction)
+                a = 0.5 * (unit_direction.y() + 1.0)
+                throughput *= Color(1.0 - 0.5 * a, 1.0 - 0.3 * a, 1.0)
+                return throughput
+
+            scatter_happened, attenuation, r = palette[rec.mat_index].scatter(r, rec, sampler)
+            if not scatter_happened:
+                return Color(0.0, 0.0, 0.0)
+
+            throughput *= attenuation
+            survival = max(throughput.x(), throughput.y(), throughput.z())
+            if survival <= 0.0:
+                return Color(0.0, 0.0, 0.0)
+
+            # Russian roulette: end the path with probability 1 - survival and
+            # boost the survivors by 1 / survival so the estimate stays unbiased
+            if 0 < self.roulette_depth <= bounce + 1:
+                survival = min(1.0, max(survival, self.roulette_min_survival))
+                sampler.dim = CAMERA_DIMS + BOUNCE_DIMS * bounce + 2
+                if sampler.next_1d() >= survival:
+                    return Color(0.0, 0.0, 0.0)
+                throughput /= survival
+
+        # Ray bounce limit reached
+        return Color(0.0, 0.0, 0.0)
+
+    def ray_color_stats(self, r, depth, world, stats, primary=None):
+        """ray_color that also counts rays, path ends and material bounces into
+        stats and times intersection and shading; keep the two in step"""
+        throughput = Color(1.0, 1.0, 1.0)
+        rec = HitRecord()
+        ray_t = Interval(0.001, INFINITY)
+        sampler = self.sampler
+        palette = world.palette
+        clock = time.perf_counter
+        phase_times = stats.phase_times
+        target = world if primary is None else primary
+
+        for bounce in range(depth):
+            sampler.dim = CAMERA_DIMS + BOUNCE_DIMS * bounce
+            stats.rays += 1
+            start = clock()
+            hit = target.hit(r, ray_t, rec)
+            target = world
+            shading = clock()
+            phase_times["intersect"] += shading - start
+            if not hit:
+                unit_direction = unit_vector(r.direction)
+                a = 0.5 * (unit_direction.y() + 1.0)
+                throughput *= Color(1.0 - 0.5 * a, 1.0 - 0.3 * a, 1.0)
+                phase_times["shade"] += clock() - shading
+                stats.end_path(bounce + 1, "miss")
+                return throughput
+
+            mat = palette[rec.mat_index]
+            stats.bounce(type(mat).__name__)
+            scatter_happened, attenuation, r = mat.scatter(r, rec, sampler)
+            if not scatter_happened:
+                phase_times["shade"] += clock() - shading
+                stats.end_path(bounce + 1, "absorbed")
+                return Color(0.0, 0.0, 0.0)
+
+            throughput *= attenuation
+            survival = max(throughput.x(), throughput.y(), throughput.z())
+            if survival <= 0.0:
+                phase_times["shade"] += clock() - shading
+                stats.end_path(bounce + 1, "black")
+                return Color(0.0, 0.0, 0.0)
+
+            if 0 < self.roulette_depth <= bounce + 1:
+                survival = min(1.0, max(survival, self.roulette_min_survival))
+                sampler.dim = CAMERA_DIMS + BOUNCE_DIMS * bounce + 2
+                if sampler.next_1d() >= survival:
+                    phase_times["shade"] += clock() - shading
+                    stats.end_path(bounce + 1, "roulette")
+                    return Color(0.0, 0.0, 0.0)
+                throughput /= survival
+            phase_times["shade"] += clock() - shading
+
+        stats.end_path(depth, "depth")
+        return Color(0.0, 0.0, 0.0)
+
+    def trace_sample(self, i, j, world, primary=None):
+        """Color of one camera sample of pixel (i, j); the sampler must have
+        been started on it"""
+        return self.ray_color(self.get_ray(i, j), self.max_depth, world, primary)
+
+    def trace_sample_stats(self, i, j, world, primary=None, stats=None):
+        """trace_sample with render statistics"""
+        start = time.perf_counter()
+        r = self.get_ray(i, j)
+        stats.phase_times["camera"] += time.perf_counter() - start
+        stats.camera_rays += 1
+        return self.ray_color_stats(r, self.max_depth, world, stats, primary)
+
+    def primary_structure(self, culler, x0, y0, x1, y1, stats):
+        """The structure for the camera rays of pixels [x0, x1) x [y0, y1),
+        or None to trace them against the world"""
+        if culler is None:
+            return None
+        primary = culler.tile_world(x0, y0, x1, y1)
+        if stats is not None and primary is not None:
+            primary.collect_stats = True
+            stats.reset_world(primary)
+        return primary
+
+    def _tracer(self, stats):
+        if stats is None:
+            return self.trace_sample
+        return partial(self.trace_sample_stats, stats=stats)
+
+    def render_tile(self, x0, y0, x1, y1, world, samples=None, first_sample=0, stats=None,
+                    culler=None):
+        """Render pixels [x0, x1) x [y0, y1); returns the per-pixel sums of
+        samples (default samples_per_pixel) samples, numbered from
+        first_sample, as flat RGB triples in row-major order. Counters go
+        into stats when one is given. With a frustum.TileCuller, camera rays
+        are traced against the tile's candidates."""
+        if samples is None:
+            samples = self.samples_per_pixel
+        sampler = self.sampler
+        trace = self._tracer(stats)
+        primary = self.primary_structure(culler, x0, y0, x1, y1, stats)
+        out = array("d")
+        for j in range(y0, y1):
+            for i in range(x0, x1):
+                pixel = j * self.image_width + i
+                pixel_color = Color(0.0, 0.0, 0.0)
+                for index in range(first_sample, first_sample + samples):
+                    sampler.start(pixel, index)
+                    pixel_color += trace(i, j, world, primary)
+                out.extend((pixel_color.x(), pixel_color.y(), pixel_color.z()))
+        if stats is not None and primary is not None:
+            stats.collect_world(primary)
+        return out
+
+    def first_samples(self):
+        """Samples every pixel of an adaptive render takes first: min_samples,
+        but no more than samples_per_pixel so a smooth image never costs more
+        than the fixed render, and at least 2 to measure a variance"""
+        return max(2, min(self.min_samples, self.samples_per_pixel))
+
+    def sample_cap(self):
+        """Most samples an adaptive render takes in a pixel"""
+        return self.max_samples if self.max_samples > 0 else 4 * self.samples_per_pixel
+
+    def render_tile_adaptive(self, x0, y0, x1, y1, world, stats=None, culler=None):
+        """Render pixels [x0, x1) x [y0, y1) with a per-pixel sample count;
+        returns (sums, counts) with the flat RGB sample sums and the number of
+        samples of every pixel, both in row-major order.
+
+        Every pixel first takes first_samples(). After that a pixel keeps doubling
+        its sample count until the standard error of its mean luminance is
+        small on screen: a luminance L is displayed as sqrt(L), so the error
+        of the displayed value is about se / (2 * sqrt(mean)), which must stay
+        under adaptive_threshold. The per-sample variance used is at least the
+        largest one measured in the pixel's 3x3 neighbourhood after the first
+        round, so a pixel whose few first samples happened to agree is not
+        stopped early next to noisy ones. Neighbours across the tile border
+        are traced for the first round too; their samples are the ones the
+        neighbouring tile takes, so the result does not depend on the tiling.
+        """
+        min_samples = self.first_samples()
+        max_samples = max(min_samples, self.sample_cap())
+        limit = 4.0 * self.adaptive_threshold * self.adaptive_threshold
+        sampler = self.sampler
+        trace = self._tracer(stats)
+
+        # First round over the tile and a one pixel ring around it
+        ex0 = max(0, x0 - 1)
+        ey0 = max(0, y0 - 1)
+        ex1 = min(self.image_width, x1 + 1)
+        ey1 = min(self.image_height, y1 + 1)
+        primary = self.primary_structure(culler, ex0, ey0, ex1, ey1, stats)
+
+        def take(i, j, first, n):
+            """Samples first .. first + n - 1 of pixel (i, j) as (color sum,
+            luminance sum, luminance square sum)"""
+            pixel = j * self.image_width + i
+            color = Color(0.0, 0.0, 0.0)
+            total = total_sq = 0.0
+            for index in range(first, first + n):
+                sampler.start(pixel, index)
+                sample = trace(i, j, world, primary)
+                color += sample
+                lum = 0.2126 * sample.x() + 0.7152 * sample.y() + 0.0722 * sample.z()
+                total += lum
+                total_sq += lum * lum
+            return color, total, total_sq
+
+        def variance(n, total, total_sq):
+            return max(0.0, total_sq - total * total / n) / (n - 1)
+
+        first_round = {}
+        for j in range(ey0, ey1):
+            for i in range(ex0, ex1):
+                first_round[i, j] = take(i, j, 0, min_samples)
+
+        first = {
+            key: variance(min_samples, total, total_sq)
+            for key, (_, total, total_sq) in first_round.items()
+        }
+
+        sums = array("d")
+        counts = array("d")
+        lum_sum = array("d")
+        lum_sq = array("d")
+        floor = array("d")
+        for j in range(y0, y1):
+            for i in range(x0, x1):
+                color, total, total_sq = first_round[i, j]
+                sums.extend((color.x(), color.y(), color.z()))
+                counts.append(min_samples)
+                lum_sum.append(total)
+                lum_sq.append(total_sq)
+                floor.append(max(
+                    first[ii, jj]
+                    for jj in range(max(ey0, j - 1), min(ey1, j + 2))
+                    for ii in range(max(ex0, i - 1), min(ex1, i + 2))
+                ))
+
+        width = x1 - x0
+        active = range(len(counts))
+        while active:
+            remaining = []
+            for k in active:
+                n = counts[k]
+                if n >= max_samples:
+                    continue
+                if max(variance(n, lum_sum[k], lum_sq[k]), floor[k]) <= limit * lum_sum[k]:
+                    continue
+                extra = int(min(n, max_samples - n))
+                color, total, total_sq = take(x0 + k % width, y0 + k // width, int(n), extra)
+                sums[3 * k] += color.x()
+                sums[3 * k + 1] += color.y()
+                sums[3 * k + 2] += color.z()
+                counts[k] += extra
+                lum_sum[k] += total
+                lum_sq[k] += total_sq
+                remaining.append(k)
+            active = remaining
+
+        if stats is not None and primary is not None:
+            stats.collect_world(primary)
+        return sums, counts
+
+    def row_tiles(self, rows_per_tile=1):
+        """Split the image into full-width bands of rows_per_tile scanlines"""
+        return [
+            (0, j0, self.image_width, min(j0 + rows_per_tile, self.image_height))
+            for j0 in range(0, self.image_height, rows_per_tile)
+        ]
+
+    def render(self, world, out_stream, num_threads=1, engine="scalar", image_format="P3",
+               pool=None):
+        """Render the scene and write it to out_stream in the given image format.
+
+        pool is a long-lived worker pool to render on (see daemon.WarmPool)
+        instead of starting num_threads processes for this render.
+
+        With checkpoint_path set the framebuffer is saved there every
+        checkpoint_interval seconds and at the end; with resume set as well,
+        a checkpoint found there is continued instead of starting from zero.
+        """
+        checkpoint = None
+        if self.checkpoint_path and self.resume:
+            if os.path.exists(self.checkpoint_path):
+                checkpoint = Checkpoint.load(self.checkpoint_path)
+                # The checkpoint's random streams and tiling carry on
+                self.seed = checkpoint.seed
+                self.sampler_type = checkpoint.sampler
+                self.tile_size = checkpoint.tile_size
+            else:
+                print(f"No checkpoint at {self.checkpoint_path}, starting from zero")
         self.initialize()
-
-        # Create image data
-        img = Image(self.image_width, self.image_height)
-
+        digest = fingerprint(self, world) if self.checkpoint_path else None
+        if checkpoint is not None and (
+            checkpoint.fingerprint != digest
+            or (checkpoint.width, checkpoint.height) != (self.image_width, self.image_height)
+        ):
+            raise ValueError(
+                f"Checkpoint {self.checkpoint_path} belongs to a different scene or camera"
+            )
+
+        if pool is not None:
+            num_threads = pool.workers
         print(f"Rendering with {num_threads} threads")
 
-        if num_threads <= 1:
-            # Single-threaded rendering
-            for j in range(self.image_height):
-                print(
-                    f"\rScanlines remaining: {self.image_height - j} ",
-                    end=""
-                )
-                sys.stderr.flush()
-
-                for i in range(self.image_width):
-                    pixel_color = Color(0.0, 0.0, 0.0)
-                    for _ in range(self.samples_per_pixel):
-                        r = self.get_ray(i, j)
-                        pixel_color = pixel_color + self.ray_color(
-                            r, self.max_depth, world
+        scheduler = TileScheduler(self.image_width, self.image_height, self.tile_size)
+        fb = Framebuffer(
+            self.image_width, self.image_height, shared=num_threads > 1 or pool is not None
+        )
+        self.stats = RenderStats() if self.collect_stats else None
+        self.profiler = RenderProfile() if self.profile else None
+        resumed = 0
+        if checkpoint is not None:
+            fb.data[:] = checkpoint.data
+            resumed = int(fb.total_samples())
+            print(
+                f"Resuming {self.checkpoint_path}: "
+                f"{resumed / (self.image_width * self.image_height):.1f} spp on average"
+            )
+        self.checkpointer = None
+        if self.checkpoint_path:
+            self.checkpointer = Checkpointer(
+                self.checkpoint_path, self.checkpoint_interval, self, digest, fb
+            )
+        flushed = False
+        self.first_pixel_time = None
+        wall_start = time.time()
+        start = time.perf_counter()
+
+        try:
+            with self._tile_pool(world, engine, fb, num_threads, pool) as executor:
+                level = 0
+                if checkpoint is not None:
+                    level = self._resume(executor, scheduler, fb)
+                if self.progressive:
+                    img, flushed = self._render_progressive(
+                        executor, scheduler, fb, out_stream, image_format, level
+                    )
+                elif checkpoint is None or (not self.adaptive and level < self.samples_per_pixel):
+                    if executor is not None:
+                        scheduler.estimate(executor, _probe_tile)
+                        print(
+                            f"Cost pre-pass over {len(scheduler.tiles)} tiles of "
+                            f"{self.tile_size}x{self.tile_size}: "
+                            f"{time.perf_counter() - start:.2f}s"
                         )
-                    img.set_pixel(i, j, pixel_color * self.pixel_samples_scale)
-        else:
-            # Multi-threaded rendering
-            with ProcessPoolExecutor(max_workers=num_threads) as executor:
-                # Submit tasks for each row
-                futures = [
-                    executor.submit(self.process_row, j, world)
-                    for j in range(self.image_height)
-                ]
-
-                # Process results as they become available
-                total_rows = self.image_height
-                processed_rows = 0
-
-                for future in futures:
-                    j, row_pixels = future.result()
-                    processed_rows += 1
-
-                    print(
-                        f"\rScanlines remaining: {total_rows - processed_rows} ",
-                        end=""
+                    self._run_pass(
+                        executor, scheduler,
+                        None if self.adaptive else self.samples_per_pixel - level,
+                        first_sample=level,
                     )
-                    sys.stderr.flush()
-
-                    for i in range(self.image_width):
-                        img.set_pixel(i, j, row_pixels[i])
-
-        print("\rScanlines remaining: 0 ", end="")
+            if not flushed:
+                img = Image.from_framebuffer(fb)
+            if self.checkpointer is not None:
+                # The pool is done, so the framebuffer is complete
+                self.checkpointer.write()
+                print()
+
+            elapsed = time.perf_counter() - start
+            samples = int(fb.total_samples())
+            rate = (samples - resumed) / elapsed
+            print(f"\rRendered in {elapsed:.2f}s ({rate:,.0f} camera rays/sec)")
+            if self.first_pixel_time is not None:
+                print(f"First tile done {self.first_pixel_time - wall_start:.3f}s into the render")
+            if self.adaptive and not self.progressive:
+                print(self.adaptive_summary(samples))
+        finally:
+            fb.close()
+            fb.unlink()
+            if self.collect_stats and hasattr(world, "collect_stats"):
+                world.collect_stats = False
 
         # Write the image to the output stream
-        img.write_to(out_stream)
+        if not flushed:
+            start = time.perf_counter()
+            self._write_image(img, out_stream, image_format)
+            print(f"Encoded {image_format} in {time.perf_counter() - start:.3f}s")
+
+        if self.stats is not None:
+            self.stats.render_time = elapsed
+            print(self.stats.summary())
 
         print("\rDone.                 ")
         return True
+
+    def adaptive_summary(self, samples):
+        """Average samples per pixel and rays saved (or spent on noisy pixels)
+        against a fixed-spp render"""
+        pixels = self.image_width * self.image_height
+        fixed = pixels * self.samples_per_pixel
+        saved = fixed - samples
+        return (
+            f"Adaptive sampling: {samples / pixels:.1f} spp on average "
+            f"(min {self.first_samples()}, max {self.sample_cap()}), "
+            f"{abs(saved):,} camera rays {'saved' if saved >= 0 else 'extra'} "
+            f"({100.0 * abs(saved) / fixed:.1f}%) against {self.samples_per_pixel} spp"
+        )
+
+    def _tile_pool(self, world, engine, fb, num_threads, pool=None):
+        """Executor for the tile tasks, or None to render in this process.
+
+        The camera, the world and the shared framebuffer reach each worker once
+        through the initializer (inherited directly when the pool forks). Tasks
+        only carry tile coordinates and workers add their samples straight into
+        the framebuffer, so only tile timings come back.
+        """
+        if pool is not None:
+            return pool.session(self, world, engine, fb)
+        if num_threads <= 1:
+            _init_worker(self, world, engine, fb)
+            return nullcontext(None)
+        return ProcessPoolExecutor(
+            max_workers=num_threads,
+            initializer=_init_worker,
+            initargs=(self, world, engine, fb),
+        )
+
+    def _resume(self, executor, scheduler, fb):
+        """Bring a resumed framebuffer to a common sample count and return it.
+
+        Tiles of an interrupted pass are one pass behind the others; they get
+        the missing samples, numbered on from the samples they have. Tiles
+        whose pixels disagree (adaptive ones) are left as they are. Adaptive
+        renders only render the tiles that have no samples yet and return 0.
+        """
+        counts = {tile: fb.tile_counts(*tile) for tile in scheduler.tiles}
+        if self.adaptive:
+            jobs = [(tile, None, 0) for tile in scheduler.ordered() if counts[tile][1] == 0]
+            if jobs:
+                self._run_tiles(executor, scheduler, jobs)
+            return 0
+
+        level = max(hi for _, hi in counts.values())
+        jobs = [
+            (tile, level - lo, lo)
+            for tile in scheduler.ordered()
+            for lo, hi in (counts[tile],)
+            if lo == hi and lo < level
+        ]
+        if jobs:
+            print(f"Catching up {len(jobs)} tiles to {level} spp")
+            self._run_tiles(executor, scheduler, jobs)
+            print()
+        return level
+
+    def _run_pass(self, executor, scheduler, samples, deadline=None, first_sample=0):
+        """Add samples per pixel, numbered from first_sample, to every tile,
+        heaviest tiles first.
+
+        Returns False when the deadline cut the pass short; tiles that did not
+        run simply keep fewer samples.
+        """
+        jobs = [(tile, samples, first_sample) for tile in scheduler.ordered()]
+        return self._run_tiles(executor, scheduler, jobs, deadline)
+
+    def _run_tiles(self, executor, scheduler, jobs, deadline=None):
+        """Render (tile, samples, first_sample) jobs in order; see _run_pass"""
+        if self.checkpointer is not None:
+            self.checkpointer.begin_pass()
+        if executor is None:
+            results = (_render_tile(*job) for job in jobs)
+        else:
+            futures = [executor.submit(_render_tile, *job) for job in jobs]
+            results = (future.result() for future in as_completed(futures))
+
+        tiles_remaining = len(jobs)
+        for tile, seconds, tile_stats, tile_profile in results:
+            if self.first_pixel_time is None:
+                self.first_pixel_time = time.time()
+            scheduler.record(tile, seconds)
+            if tile_stats is not None:
+                self.stats.merge(tile_stats)
+            if tile_profile is not None:
+                self.profiler.add(*tile_profile)
+            if self.checkpointer is not None:
+                self.checkpointer.tile_done(tile)
+            tiles_remaining -= 1
+            print(f"\rTiles remaining: {tiles_remaining} ", end="")
+            sys.stdout.flush()
+
+            if tiles_remaining and deadline is not None and time.perf_counter() >= deadline:
+                if executor is not None:
+                    for future in futures:
+                        future.cancel()
+                return False
+        return True
+
+    def _render_progressive(self, executor, scheduler, fb, out_stream, image_format, taken=0):
+        """Render successive passes over the whole image, flushing the running
+        estimate to out_stream (when seekable) after each one; taken is the
+        number of samples per pixel the framebuffer already holds. Returns the
+        image and whether it has been written to out_stream."""
+        start = time.perf_counter()
+        deadline = start + self.time_budget if self.time_budget > 0.0 else None
+        previous = None
+        img = Image.from_framebuffer(fb)
+        flushed = False
+
+        while taken < self.samples_per_pixel:
+            samples = min(self.pass_samples, self.samples_per_pixel - taken)
+            finished = self._run_pass(executor, scheduler, samples, deadline, taken)
+            taken += samples
+
+            img = Image.from_framebuffer(fb)
+            change = img.relative_change(previous) if previous is not None else None
+            print(
+                f"\rPass {taken // self.pass_samples}: {taken} spp in "
+                f"{time.perf_counter() - start:.2f}s"
+                + (f", change {change:.5f}" if change is not None else "")
+                + " " * 10
+            )
+            if out_stream.seekable():
+                self._write_image(img, out_stream, image_format)
+                flushed = True
+
+            if not finished or (deadline is not None and time.perf_counter() >= deadline):
+                print("Time budget reached")
+                break
+            if change is not None and change < self.convergence_threshold:
+                print("Converged")
+                break
+            previous = img
+
+        return img, flushed
+
+    def _write_image(self, img, out_stream, image_format):
+        """Write img to the start of out_stream, replacing any earlier pass"""
+        start = time.perf_counter()
+        if out_stream.seekable():
+            out_stream.seek(0)
+            out_stream.truncate()
+        img.write_to(out_stream, image_format)
+        out_stream.flush()
+        if self.stats is not None:
+            self.stats.output_time += time.perf_counter() - start
+
+
+# Per-process render state, set up once by _init_worker
+_worker_camera = None
+_worker_render_tile = None
+_worker_adaptive_tile = None
+_worker_framebuffer = None
+_worker_world = None
+
+
+def _init_worker(cam, world, engine, fb):
+    """Pool initializer: keep the scene and build the tile renderer for this process"""
+    global _worker_camera, _worker_render_tile, _worker_adaptive_tile, _worker_framebuffer
+    global _worker_world
+    _worker_camera = cam
+    _worker_framebuffer = fb
+    _worker_world = world
+    if cam.collect_stats and hasattr(world, "collect_stats"):
+        world.collect_stats = True
+    culler = None
+    if cam.frustum_cull and engine != "wavefront" and isinstance(world, (BVH, HittableList)):
+        culler = TileCuller(cam, world)
+    if engine == "wavefront":
+        from wavefront import WavefrontRenderer
+
+        _worker_render_tile = WavefrontRenderer(cam, world).render_tile
+    elif engine == "batched":
+        from shading import BatchedRenderer
+
+        _worker_render_tile = BatchedRenderer(cam, world, culler).render_tile
+    else:
+        _worker_render_tile = partial(cam.render_tile, world=world, culler=culler)
+    _worker_adaptive_tile = partial(cam.render_tile_adaptive, world=world, culler=culler)
+
+
+def _render_tile(tile, samples, first_sample=0):
+    """Render samples per pixel of a tile into the framebuffer, or an adaptive
+    number of them when samples is None; returns (tile, seconds, stats,
+    profile), stats and profile being None unless the camera collects
+    statistics or profiles"""
+    stats = None
+    if _worker_camera.collect_stats:
+        stats = RenderStats()
+        stats.reset_world(_worker_world)
+    profile = None
+    start = time.perf_counter()
+    if _worker_camera.profile:
+        profiler = TileProfiler()
+        with profiler:
+            _accumulate_tile(tile, samples, first_sample, stats)
+        profile = profiler.result()
+    else:
+        _accumulate_tile(tile, samples, first_sample, stats)
+    seconds = time.perf_counter() - start
+    if stats is not None:
+        stats.collect_world(_worker_world)
+        stats.record_tile(tile, seconds)
+    return tile, seconds, stats, profile
+
+
+def _accumulate_tile(tile, samples, first_sample, stats):
+    if samples is None:
+        sums, counts = _worker_adaptive_tile(*tile, stats=stats)
+        _worker_framebuffer.accumulate(*tile, sums, counts)
+    else:
+        sums = _worker_render_tile(
+            *tile, samples=samples, first_sample=first_sample, stats=stats
+        )
+        _worker_framebuffer.accumulate(*tile, sums, samples)
+
+
+def _probe_tile(tile, stride):
+    """Time one sample on every stride-th pixel of the tile, scaled to the full tile"""
+    x0, y0, x1, y1 = tile
+    start = time.perf_counter()
+    for j in range(y0 + stride // 2, y1, stride):
+        for i in range(x0 + stride // 2, x1, stride):
+            _worker_render_tile(i, j, i + 1, j + 1, samples=1)
+    seconds = time.perf_counter() - start
+    return tile, seconds * stride * stride * _worker_camera.samples_per_pixel
@@ -0,0 +1,164 @@
+"""Render checkpoints.
+
+A checkpoint is the accumulation framebuffer (per-pixel sample sums and
+counts) plus everything needed to continue it: the seed, sampler and tile
+size, and a fingerprint of the scene and of the camera settings that change
+the image. The random streams are keyed by seed, pixel and sample index
+(see rng.py), so the per-pixel sample counts are the whole RNG state:
+resuming draws sample number count, count + 1, ... of every pixel, as the
+uninterrupted render would have.
+
+File layout (little-endian):
+
+    magic       8 bytes  b"RTCKPT\\0\\1"
+    fingerprint 32 bytes SHA-256, see fingerprint()
+    width, height, tile_size    uint32
+    seed                        uint64
+    sampler                     16 bytes, ASCII, NUL padded
+    framebuffer width * height * 4 float64 (r, g, b sums and count)
+
+Files are written next to the target and renamed over it, so a crash while
+writing keeps the previous checkpoint.
+"""
+import hashlib
+import os
+import struct
+import sys
+import time
+from array import array
+
+from framebuffer import CHANNELS
+
+MAGIC = b"RTCKPT\0\1"
+HEADER = struct.Struct("<8s32sIIIQ16s")
+
+# Camera settings a checkpoint must agree on; samples_per_pixel, the
+# sampler, seed and tile size are not among them
+CAMERA_FIELDS = (
+    "aspect_ratio", "image_width", "vfov", "look_from", "look_at", "vup",
+    "defocus_angle", "focus_dist", "max_depth", "roulette_depth", "roulette_min_survival",
+)
+
+
+def _describe(value, palette=None):
+    """Canonical text of a scene value: numbers, vectors and plain objects.
+    With a palette, an object's mat_index is described by its material, so
+    the text does not depend on the palette order."""
+    if isinstance(value, (int, float, str, bool)) or value is None:
+        return repr(value)
+    if hasattr(value, "__slots__"):
+        fields = value.__slots__
+        return f"{type(value).__name__}({','.join(_describe(getattr(value, f)) for f in fields)})"
+    fields = []
+    for k, v in sorted(vars(value).items()):
+        if k == "mat_index" and palette is not None:
+            v = palette[v]
+        fields.append(f"{k}={_describe(v)}")
+    return f"{type(value).__name__}({','.join(fields)})"
+
+
+def fingerprint(cam, world):
+    """SHA-256 of the camera settings and the objects of the world, in any order"""
+    h = hashlib.sha256()
+    for name in CAMERA_FIELDS:
+        h.update(f"{name}={_describe(getattr(cam, name))};".encode())
+    for text in sorted(_describe(obj, world.palette) for obj in world.objects):
+        h.update(text.encode())
+        h.update(b"\n")
+    return h.digest()
+
+
+class Checkpoint:
+    def __init__(self, fingerprint, width, height, tile_size, seed, sampler, data):
+        self.fingerprint = fingerprint
+        self.width = width
+        self.height = height
+        self.tile_size = tile_size
+        self.seed = seed
+        self.sampler = sampler
+        self.data = data  # array("d") in the framebuffer layout
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            header = f.read(HEADER.size)
+            if len(header) < HEADER.size:
+                raise ValueError(f"{path} is not a render checkpoint")
+            magic, digest, width, height, tile_size, seed, sampler = HEADER.unpack(header)
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a render checkpoint")
+            data = array("d")
+            data.frombytes(f.read())
+        if len(data) != width * height * CHANNELS:
+            raise ValueError(f"{path} is truncated")
+        if sys.byteorder == "big":
+            data.byteswap()
+        return cls(digest, width, height, tile_size, seed, sampler.rstrip(b"\0").decode(), data)
+
+
+def write_checkpoint(path, cam, digest, data):
+    """Write the framebuffer data (a buffer of doubles) of cam's render to path"""
+    header = HEADER.pack(
+        MAGIC, digest, cam.image_width, cam.image_height, cam.tile_size, cam.seed,
+        cam.sampler_type.encode(),
+    )
+    if sys.byteorder == "big":
+        data = array("d", data)
+        data.byteswap()
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(header)
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class Checkpointer:
+    """Writes a render's checkpoint every interval seconds while passes run.
+
+    Workers add to the shared framebuffer while the parent writes, so a
+    mid-pass checkpoint takes the framebuffer as it was when the pass began
+    and copies in only the tiles whose results have come back.
+    """
+
+    def __init__(self, path, interval, cam, digest, fb):
+        self.path = path
+        self.interval = interval
+        self.cam = cam
+        self.digest = digest
+        self.fb = fb
+        self.base = None
+        self.done = []
+        self.last = time.perf_counter()
+
+    def begin_pass(self):
+        """Call with no tiles in flight"""
+        self.base = array("d", self.fb.data)
+        self.done = []
+
+    def tile_done(self, tile):
+        self.done.append(tile)
+        if time.perf_counter() - self.last >= self.interval:
+            self.write_pass()
+
+    def write_pass(self):
+        """Checkpoint the running pass: the start of the pass plus finished tiles"""
+        data = array("d", self.base)
+        live = self.fb.data
+        width = self.fb.width
+        for x0, y0, x1, y1 in self.done:
+            for j in range(y0, y1):
+                a = (j * width + x0) * CHANNELS
+                b = (j * width + x1) * CHANNELS
+                data[a:b] = array("d", live[a:b])
+        self._write(data)
+
+    def write(self):
+        """Checkpoint the framebuffer as it is; call with no tiles in flight"""
+        self._write(self.fb.data)
+
+    def _write(self, data):
+        start = time.perf_counter()
+        write_checkpoint(self.path, self.cam, self.digest, data)
+        self.last = time.perf_counter()
+        print(f"\rCheckpoint written to {self.path} in {self.last - start:.2f}s ", end="")
+        sys.stdout.flush()
@@ -0,0 +1,119 @@
+"""Thin client for the render daemon (daemon.py).
+
+Only imports the standard library, so it starts in a fraction of the time
+main.py takes. It sends the scene path and camera overrides, writes the
+returned image to the output path and reports where the time went,
+including the startup-to-first-pixel latency: from the start of this
+process to the moment the daemon had the first tile back.
+
+Usage: python3 client.py --path <scene> --output <image> [--server <host:port>]
+       [--format p3|p6|pfm|png] [--engine scalar|batched|wavefront] [--accel bvh|spheres|list]
+       [--spp <n>] [--width <n>] [--seed <n>] [--sampler <name>] [--set <field>=<value>]...
+"""
+import http.client
+import json
+import os
+import sys
+import time
+
+from utils import process_start_time
+
+FORMATS = {".ppm": "P6", ".pfm": "PFM", ".png": "PNG"}
+SHORTCUTS = {
+    "--spp": "samples_per_pixel",
+    "--width": "image_width",
+    "--seed": "seed",
+    "--sampler": "sampler_type",
+}
+
+
+def _value(text):
+    """A JSON literal (number, true, ...) or else the plain string"""
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def main():
+    started = process_start_time()
+    server = "127.0.0.1:8765"
+    request = {"path": "sphere_data.txt", "camera": {}}
+    output_path = None
+
+    args = sys.argv[1:]
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        if arg in ("--help", "-h"):
+            print(__doc__)
+            return
+        if i + 1 >= len(args):
+            print(f"Error: {arg} needs a value")
+            sys.exit(1)
+        value = args[i + 1]
+        if arg == "--server":
+            server = value
+        elif arg == "--path":
+            request["path"] = os.path.abspath(value)
+        elif arg == "--output":
+            output_path = value
+        elif arg == "--format":
+            request["format"] = value.upper()
+        elif arg == "--engine":
+            request["engine"] = value
+        elif arg == "--accel":
+            request["accel"] = value
+        elif arg in SHORTCUTS:
+            request["camera"][SHORTCUTS[arg]] = _value(value)
+        elif arg == "--set" and "=" in value:
+            name, _, text = value.partition("=")
+            request["camera"][name] = _value(text)
+        else:
+            print(f"Error: Unknown argument: {arg}")
+            sys.exit(1)
+        i += 2
+
+    if output_path is None:
+        print("Error: --output is required")
+        sys.exit(1)
+    request.setdefault(
+        "format", FORMATS.get(os.path.splitext(output_path)[1].lower(), "P6")
+    )
+
+    host, _, port = server.rpartition(":")
+    connection = http.client.HTTPConnection(host, int(port))
+    sent = time.time()
+    try:
+        connection.request(
+            "POST", "/render", json.dumps(request), {"Content-Type": "application/json"}
+        )
+        response = connection.getresponse()
+        if response.status != 200:
+            print(f"Error: {json.loads(response.read()).get('error')}")
+            sys.exit(1)
+        timings = json.loads(response.getheader("X-Render-Timings"))
+        with open(output_path, "wb") as f:
+            while True:
+                chunk = response.read(1 << 16)
+                if not chunk:
+                    break
+                f.write(chunk)
+    except OSError as e:
+        print(f"Error: Could not reach the render daemon at {server}: {e}")
+        sys.exit(1)
+    finally:
+        connection.close()
+    done = time.time()
+
+    scene = "cached" if timings["scene_cached"] else "loaded"
+    print(f"Client startup {sent - started:.3f}s, scene {scene} in {timings['scene']:.3f}s, "
+          f"render and encode {timings['render']:.3f}s, queued {timings['queue']:.3f}s")
+    if timings["first_pixel"] is not None:
+        print(f"Startup to first pixel: {timings['first_pixel'] - started:.3f}s")
+    print(f"Startup to image written: {done - started:.3f}s "
+          f"({timings['bytes']:,} bytes to {output_path})")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,10 @@
 import math
 
+try:
+    import numpy as np
+except ImportError:  # PyPy and minimal installs take the pure Python path
+    np = None
+
 
 def linear_to_gamma(linear_component):
     """Convert linear to gamma (gamma 2)"""
@@ -37,3 +42,21 @@ def write_color(file, pixel_color):
 
     # Write the bytes
     file.write(f"{r_byte} {g_byte} {b_byte}\n")
+
+
+def encode_ldr(pixels):
+    """Gamma-correct, clamp and quantize flat linear RGB floats to 8-bit bytes.
+
+    Same mapping as write_color, applied to the whole buffer at once.
+    """
+    if np is not None:
+        linear = np.frombuffer(pixels, dtype=np.float64)
+        # The comparison maps NaN and negatives to 0 like linear_to_gamma
+        positive = linear > 0.0
+        gamma = np.sqrt(np.where(positive, linear, 0.0))
+        return (256.0 * np.clip(gamma, 0.0, 0.999)).astype(np.uint8).tobytes()
+
+    sqrt = math.sqrt
+    return bytes(
+        int(256.0 * min(sqrt(v), 0.999)) if v > 0.0 else 0 for v in pixels
+    )
@@ -0,0 +1,274 @@
+"""Compiled binary form of a scene description file.
+
+Parsing a text scene costs a few microseconds per sphere for the float()
+calls and objects alone. The first load of `scene.txt` therefore writes
+`scene.rtscene` next to it, and later loads map that file instead:
+
+    header      magic, version, source size, mtime and SHA-256, counts
+    camera      JSON list of the camera lines ("c ...") of the file
+    materials   6 doubles per palette material: type, albedo r g b, fuzz, ir
+    centers     3 doubles per sphere
+    radii       1 double per sphere
+    material    1 uint32 per sphere, its palette index
+
+The compiled file is reused while the source has the same size and mtime,
+or failing that the same content hash. A compiled file can also stand on
+its own (scene_gen.py writes them) and be loaded by its path. Loading maps the file and wraps
+the arrays in PackedSpheres without creating any per-sphere object, so it
+takes the same time for a million spheres as for ten. Sphere objects are
+only built when something iterates the world; SphereSet and the wavefront
+engine read the packed arrays directly.
+"""
+import contextlib
+import hashlib
+import io
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from hittable import HittableList, Sphere
+from material import Lambertian, Metal, Dielectric
+from vec3 import Point3, Color
+
+MAGIC = b"RTSCENE\0"
+VERSION = 2
+HEADER = struct.Struct("<8sIQq32sQII")
+MTIME_OFFSET = struct.calcsize("<8sIQ")
+# Signature of a compiled scene written without a text source
+NO_SOURCE = (0, 0, bytes(32))
+SUFFIX = ".rtscene"
+
+# Material type codes, the same as the wavefront engine's
+LAMBERTIAN = 0
+METAL = 1
+DIELECTRIC = 2
+MATERIAL_FIELDS = 6
+
+
+def compiled_path(path):
+    """Path of the compiled form of the scene file at path"""
+    return os.path.splitext(path)[0] + SUFFIX
+
+
+def source_signature(path):
+    """(size, mtime in ns, SHA-256) of a scene file"""
+    with open(path, "rb") as f:
+        stat = os.fstat(f.fileno())
+        digest = hashlib.file_digest(f, "sha256").digest()
+    return stat.st_size, stat.st_mtime_ns, digest
+
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+
+class MaterialTable:
+    """Read-only material palette of a compiled scene, each material created
+    the first time it is indexed"""
+
+    def __init__(self, table):
+        self.table = table
+        self.created = {}
+
+    def __len__(self):
+        return len(self.table) // MATERIAL_FIELDS
+
+    def __getitem__(self, k):
+        mat = self.created.get(k)
+        if mat is None:
+            if not 0 <= k < len(self):
+                raise IndexError("material index out of range")
+            start = k * MATERIAL_FIELDS
+            mat = self.created[k] = _material(self.table[start:start + MATERIAL_FIELDS])
+        return mat
+
+    def __reduce__(self):
+        # The rows as bytes, like PackedSpheres; the table may be a view of
+        # the mapped file, which does not pickle
+        return _material_table, (bytes(self.table),)
+
+
+def _material_table(data):
+    return MaterialTable(memoryview(data).cast("d"))
+
+
+class PackedSpheres:
+    """Read-only sequence of the Spheres of a compiled scene.
+
+    Holds the packed arrays as memoryviews of the mapped file; the Sphere
+    objects are created the first time the sequence is indexed or iterated.
+    """
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+        (magic, version, _, _, _, count, material_count,
+         camera_size) = HEADER.unpack_from(buffer)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not a compiled scene file")
+        view = memoryview(buffer)
+        offset = HEADER.size
+        self.camera = json.loads(bytes(view[offset:offset + camera_size]))
+        offset = _align(offset + camera_size)
+        sections = []
+        for size, fmt in (
+            (material_count * MATERIAL_FIELDS * 8, "d"),
+            (count * 3 * 8, "d"),
+            (count * 8, "d"),
+            (count * 4, "I"),
+        ):
+            if offset + size > len(view):
+                raise ValueError("Truncated compiled scene file")
+            sections.append(view[offset:offset + size].cast(fmt))
+            offset = _align(offset + size)
+        self.material_table, self.centers, self.radii, self.mat_index = sections
+        self.materials = MaterialTable(self.material_table)
+        self._spheres = None
+
+    def __reduce__(self):
+        # The raw file content: far smaller and faster to pickle than the
+        # spheres, and does not need the file on the other side
+        return PackedSpheres, (bytes(self.buffer),)
+
+    def __len__(self):
+        return len(self.radii)
+
+    def __getitem__(self, k):
+        return self.spheres()[k]
+
+    def __iter__(self):
+        return iter(self.spheres())
+
+    def spheres(self):
+        """The list of Sphere objects, built on first use"""
+        if self._spheres is None:
+            c = self.centers.tolist()
+            self._spheres = [
+                Sphere(Point3(x, y, z), r, m)
+                for x, y, z, r, m in zip(
+                    c[0::3], c[1::3], c[2::3], self.radii.tolist(), self.mat_index.tolist()
+                )
+            ]
+        return self._spheres
+
+
+def _material(record):
+    kind, r, g, b, fuzz, ir = record
+    if kind == LAMBERTIAN:
+        return Lambertian(Color(r, g, b))
+    if kind == METAL:
+        return Metal(Color(r, g, b), fuzz)
+    return Dielectric(ir)
+
+
+def material_record(mat):
+    """Table row of a material, with the wavefront engine's defaults for the
+    fields the material does not use; None if it cannot be compiled"""
+    if isinstance(mat, Lambertian):
+        return (LAMBERTIAN, mat.albedo.x(), mat.albedo.y(), mat.albedo.z(), 0.0, 1.0)
+    if isinstance(mat, Metal):
+        return (METAL, mat.albedo.x(), mat.albedo.y(), mat.albedo.z(), mat.fuzz, 1.0)
+    if isinstance(mat, Dielectric):
+        return (DIELECTRIC, 1.0, 1.0, 1.0, 0.0, mat.ir)
+    return None
+
+
+def load(path):
+    """(world, camera lines) from the compiled form of the scene file at
+    path, or None when there is none or it is out of date. The camera lines
+    are the split "c ..." lines of the source, in order."""
+    target = path if path.endswith(SUFFIX) else compiled_path(path)
+    if sys.byteorder != "little":
+        return None
+    try:
+        with open(target, "rb") as f:
+            header = f.read(HEADER.size)
+            if len(header) < HEADER.size:
+                return None
+            magic, version, size, mtime, digest, _, _, _ = HEADER.unpack(header)
+            if magic != MAGIC or version != VERSION:
+                return None
+            # A compiled file given directly is its own source
+            stat = os.stat(path) if target != path else None
+            if stat is not None and (stat.st_size, stat.st_mtime_ns) != (size, mtime):
+                # Touched or copied: still valid if the content is the same
+                if stat.st_size != size or source_signature(path)[2] != digest:
+                    return None
+                _update_mtime(target, stat.st_mtime_ns)
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        packed = PackedSpheres(buffer)
+    except (OSError, ValueError):
+        return None
+
+    world = HittableList(packed.materials)
+    world.objects = packed
+    return world, packed.camera
+
+
+def _update_mtime(target, mtime):
+    # Record the new mtime so the next load need not hash the source again
+    with contextlib.suppress(OSError), open(target, "r+b") as f:
+        f.seek(MTIME_OFFSET)
+        f.write(struct.pack("<q", mtime))
+
+
+def save(path, signature, world, camera_lines):
+    """Write the compiled form of a scene parsed from path, whose
+    source_signature was taken before parsing. Returns False when the world
+    holds something the format cannot store."""
+    if sys.byteorder != "little":
+        return False
+    materials = array("d")
+    for k in range(len(world.palette)):
+        record = material_record(world.palette[k])
+        if record is None:
+            return False
+        materials.extend(record)
+    centers = array("d")
+    radii = array("d")
+    mat_index = array("I")
+    for obj in world.objects:
+        if type(obj) is not Sphere:
+            return False
+        centers.extend((obj.center.x(), obj.center.y(), obj.center.z()))
+        radii.append(obj.radius)
+        mat_index.append(obj.mat_index)
+
+    write(compiled_path(path), signature, camera_lines, materials, centers, radii, mat_index)
+    return True
+
+
+def _write_sections(f, signature, camera_lines, materials, centers, radii, mat_index):
+    camera = json.dumps(camera_lines).encode()
+    size, mtime, digest = signature
+    f.write(HEADER.pack(MAGIC, VERSION, size, mtime, digest, len(radii),
+                        len(materials) // MATERIAL_FIELDS, len(camera)))
+    f.write(camera)
+    for section in (materials, centers, radii, mat_index):
+        f.write(bytes(_align(f.tell()) - f.tell()))
+        f.write(section)
+
+
+def write(target, signature, camera_lines, materials, centers, radii, mat_index):
+    """Write a compiled scene file from its packed arrays (array("d") of
+    material rows, centers and radii, array("I") of material indices).
+    signature is the source_signature of the scene file it stands for, or
+    NO_SOURCE for a scene that only exists in compiled form."""
+    tmp = f"{target}.tmp{os.getpid()}"
+    try:
+        with open(tmp, "wb") as f:
+            _write_sections(f, signature, camera_lines, materials, centers, radii, mat_index)
+        os.replace(tmp, target)
+    except OSError:
+        with contextlib.suppress(OSError):
+            os.remove(tmp)
+        raise
+
+
+def pack(camera_lines, materials, centers, radii, mat_index):
+    """PackedSpheres over the given arrays, in memory"""
+    f = io.BytesIO()
+    _write_sections(f, NO_SOURCE, camera_lines, materials, centers, radii, mat_index)
+    return PackedSpheres(f.getbuffer())
@@ -0,0 +1,337 @@
+"""Long-lived render server with a warm worker pool and a scene cache.
+
+A plain `python3 main.py` pays for interpreter startup, imports, scene
+parsing, the BVH build and the process pool before the first ray. The
+daemon pays for them once:
+
+    python3 daemon.py [--port 8765] [--cores n]
+    python3 client.py --path scene.txt --output out.ppm [--spp 16] [--set key=value]
+
+It listens on local HTTP (127.0.0.1 only) and renders one request at a
+time on a pool that outlives the requests. Parsed scenes with their BVH
+are kept per path and reloaded when the file's mtime changes. Each render
+pickles its camera, world, engine and shared framebuffer to a file once.
+Pool workers load it on the first tile they get from that render, so the
+tile tasks of Camera.render work unchanged on the warm pool.
+
+    POST /render    JSON {"path", "camera": {field: value}, "format",
+                    "engine", "accel"}; answers with the encoded image and an
+                    X-Render-Timings header (JSON, times in seconds, first
+                    tile as a wall-clock timestamp)
+    GET  /status    scenes cached, renders served, pool size
+    POST /shutdown  stop the server
+"""
+import contextlib
+import copy
+import io
+import json
+import multiprocessing
+import os
+import pickle
+import shutil
+import signal
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import camera
+from bvh import BVH
+from image import FORMATS
+from main import create_world_from_file
+
+DEFAULT_PORT = 8765
+
+# Camera fields a request may override, with their types
+CAMERA_OVERRIDES = {
+    "image_width": int,
+    "aspect_ratio": float,
+    "samples_per_pixel": int,
+    "max_depth": int,
+    "vfov": float,
+    "defocus_angle": float,
+    "focus_dist": float,
+    "roulette_depth": int,
+    "roulette_min_survival": float,
+    "tile_size": int,
+    "sampler_type": str,
+    "seed": int,
+    "adaptive": bool,
+    "min_samples": int,
+    "max_samples": int,
+    "adaptive_threshold": float,
+    "progressive": bool,
+    "pass_samples": int,
+    "time_budget": float,
+    "convergence_threshold": float,
+}
+
+
+# Render whose scene this pool worker holds
+_session_key = None
+
+
+def _ping(_):
+    # Long enough that every worker gets one
+    time.sleep(0.05)
+    return os.getpid()
+
+
+def _session_task(key, path, fn, *args):
+    """Run a tile task of the render key, loading its scene on first use"""
+    global _session_key
+    if key != _session_key:
+        with open(path, "rb") as f:
+            cam, world, engine, fb = pickle.load(f)
+        if camera._worker_framebuffer is not None:
+            camera._worker_framebuffer.close()
+        camera._init_worker(cam, world, engine, fb)
+        _session_key = key
+    return fn(*args)
+
+
+class _Session:
+    """Executor stand-in that runs the tasks of one render on a WarmPool"""
+
+    def __init__(self, executor, key, path):
+        self.executor = executor
+        self.key = key
+        self.path = path
+        self.futures = []
+
+    def submit(self, fn, *args):
+        future = self.executor.submit(_session_task, self.key, self.path, fn, *args)
+        self.futures.append(future)
+        return future
+
+
+class WarmPool:
+    """A process pool kept between renders"""
+
+    def __init__(self, workers):
+        self.workers = workers
+        self.renders = 0
+        self.tmpdir = tempfile.mkdtemp(prefix="raytracer-daemon-")
+        self.executor = None
+        self.start()
+
+    def start(self):
+        self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        # Start every worker now rather than on the first render
+        list(self.executor.map(_ping, range(self.workers)))
+
+    def close(self):
+        self.executor.shutdown(cancel_futures=True)
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    @contextlib.contextmanager
+    def session(self, cam, world, engine, fb):
+        """Executor for the tiles of one render (see Camera._tile_pool)"""
+        self.renders += 1
+        key = f"{os.getpid()}-{self.renders}"
+        path = os.path.join(self.tmpdir, f"{key}.pickle")
+        with open(path, "wb") as f:
+            pickle.dump((cam, world, engine, fb), f, pickle.HIGHEST_PROTOCOL)
+        session = _Session(self.executor, key, path)
+        try:
+            yield session
+        finally:
+            # Like a pool shutdown: tiles still running finish before the
+            # framebuffer is read and freed
+            wait(session.futures)
+            os.remove(path)
+
+
+class SceneCache:
+    """Parsed scenes and their camera, with the accelerator built, by path"""
+
+    def __init__(self):
+        self.scenes = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path, accel="bvh"):
+        """(world, camera, cached) for the scene file at path"""
+        path = os.path.abspath(path)
+        mtime = os.stat(path).st_mtime_ns
+        entry = self.scenes.get((path, accel))
+        if entry is not None and entry[0] == mtime:
+            self.hits += 1
+            return entry[1], entry[2], True
+
+        world, cam = create_world_from_file(path)
+        if world is None:
+            raise ValueError(f"Could not load scene {path}")
+        if accel == "bvh":
+            world = BVH(world)
+        elif accel == "spheres":
+            from sphere_set import SphereSet
+
+            world = SphereSet(world)
+        elif accel != "list":
+            raise ValueError(f"Unknown accelerator: {accel}")
+        self.scenes[(path, accel)] = (mtime, world, cam)
+        self.misses += 1
+        return world, cam, False
+
+
+class RenderServer:
+    def __init__(self, workers):
+        self.pool = WarmPool(workers)
+        self.scenes = SceneCache()
+        self.lock = threading.Lock()
+        self.served = 0
+
+    def render(self, request):
+        """Render a request; returns (encoded image, timings)"""
+        received = time.perf_counter()
+        with self.lock:
+            started = time.perf_counter()
+            world, cached_cam, cached = self.scenes.get(
+                request["path"], request.get("accel", "bvh")
+            )
+            loaded = time.perf_counter()
+            if cached_cam is None:
+                raise ValueError(f"{request['path']} has no camera settings")
+            cam = copy.copy(cached_cam)
+            for name, value in request.get("camera", {}).items():
+                if name not in CAMERA_OVERRIDES:
+                    raise ValueError(f"Unknown camera setting: {name}")
+                setattr(cam, name, CAMERA_OVERRIDES[name](value))
+
+            engine = request.get("engine", "scalar")
+            if engine == "wavefront" and cam.sampler_type != "independent":
+                raise ValueError(
+                    f"The wavefront engine only draws independent samples, not {cam.sampler_type}"
+                )
+
+            image_format = request.get("format", "P6").upper()
+            if image_format not in ("P3", *FORMATS.values()):
+                raise ValueError(f"Unknown image format: {image_format}")
+            out = io.StringIO() if image_format == "P3" else io.BytesIO()
+            try:
+                cam.render(world, out, engine=engine,
+                           image_format=image_format, pool=self.pool)
+            except BrokenProcessPool:
+                # A worker died; start a fresh pool for the next request
+                self.pool.start()
+                raise
+            rendered = time.perf_counter()
+            data = out.getvalue()
+            if image_format == "P3":
+                data = data.encode("ascii")
+            self.served += 1
+
+        return data, {
+            "queue": started - received,
+            "scene": loaded - started,
+            "scene_cached": cached,
+            "render": rendered - loaded,
+            "first_pixel": cam.first_pixel_time,
+            "bytes": len(data),
+        }
+
+    def status(self):
+        return {
+            "workers": self.pool.workers,
+            "renders": self.served,
+            "scenes": [path for path, _ in self.scenes.scenes],
+            "cache_hits": self.scenes.hits,
+            "cache_misses": self.scenes.misses,
+        }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "RaytracerDaemon/1"
+
+    def _reply(self, code, body, content_type="application/json", headers=()):
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, code, message):
+        self._reply(code, json.dumps({"error": message}).encode())
+
+    def do_GET(self):
+        if self.path == "/status":
+            self._reply(200, json.dumps(self.server.renderer.status()).encode())
+        else:
+            self._error(404, f"No such endpoint: {self.path}")
+
+    def do_POST(self):
+        if self.path == "/shutdown":
+            self._reply(200, b"{}")
+            threading.Thread(target=self.server.shutdown).start()
+            return
+        if self.path != "/render":
+            self._error(404, f"No such endpoint: {self.path}")
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length))
+            data, timings = self.server.renderer.render(request)
+        except (ValueError, KeyError, TypeError, OSError, BrokenProcessPool) as e:
+            self._error(400, f"{type(e).__name__}: {e}")
+            return
+        self._reply(
+            200, data, "application/octet-stream",
+            [("X-Render-Timings", json.dumps(timings))],
+        )
+
+    def log_message(self, format, *args):
+        print(f"{self.address_string()} {format % args}")
+
+
+def main():
+    port = DEFAULT_PORT
+    cores = multiprocessing.cpu_count()
+    args = sys.argv[1:]
+    i = 0
+    while i < len(args):
+        if args[i] in ("--help", "-h"):
+            print(__doc__)
+            return
+        if args[i] == "--port" and i + 1 < len(args):
+            port = int(args[i + 1])
+        elif args[i] == "--cores" and i + 1 < len(args):
+            cores = int(args[i + 1])
+        else:
+            print(f"Error: Unknown argument: {args[i]}")
+            sys.exit(1)
+        i += 2
+
+    start = time.perf_counter()
+    renderer = RenderServer(max(1, cores))
+    server = None
+    # Stop on SIGTERM as on Ctrl-C, so the warm workers are shut down too
+    # rather than left running with our stdout
+    signal.signal(signal.SIGTERM, _terminate)
+    try:
+        server = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+        server.renderer = renderer
+        print(f"Render daemon on http://127.0.0.1:{server.server_address[1]} with "
+              f"{renderer.pool.workers} warm workers (ready in {time.perf_counter() - start:.2f}s)",
+              flush=True)
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if server is not None:
+            server.server_close()
+        renderer.pool.close()
+        print("Render daemon stopped")
+
+
+def _terminate(signum, frame):
+    raise KeyboardInterrupt
+
+
+if __name__ == "__main__":
+    main()
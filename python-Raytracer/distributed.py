@@ -0,0 +1,431 @@
+"""Distributed rendering: a TCP coordinator hands out tiles to worker nodes.
+
+    python3 main.py --path scene.txt --coordinator 0.0.0.0:5000 --output out.ppm
+    python3 main.py --worker coordinator-host:5000 [--cores n]     (every node)
+
+On one machine, --spawn-workers n makes the coordinator start n local
+single-core workers itself, which is how the mode is tested.
+
+The coordinator loads the scene and accepts workers at any time during the
+render. It sends each one the camera, the world and the engine once, then
+keeps as many tiles in flight on every worker as the worker has cores,
+most expensive tiles first. A worker renders its tiles with the tile
+renderer and process pool of a local render, into a framebuffer of its
+own, and sends back the sample sums and counts of each finished tile. The
+coordinator adds them into its framebuffer and assembles the image.
+
+Faults: the tiles of a worker whose connection drops go back to the front
+of the queue. Once the queue is empty, idle workers also get copies of
+tiles that have been out for more than STRAGGLER_FACTOR times the median
+tile time, so a slow or hung worker cannot hold up the end of the render.
+The first result of a tile wins and later copies are dropped. Samples are
+keyed by seed, pixel and sample index, so whichever worker renders a tile
+the image is identical to a local render.
+
+Every message is a kind byte and a 32-bit length followed by the payload:
+
+    H  worker -> coordinator  JSON {"cores", "host"}
+    S  coordinator -> worker  pickle of (camera, world, engine)
+    T  coordinator -> worker  JSON {"tile", "samples", "first_sample"}
+    R  worker -> coordinator  JSON header length (uint32), JSON {"tile",
+                              "seconds", "byteorder"}, then the tile's sums
+                              (3 doubles per pixel) and counts (1 double)
+    Q  coordinator -> worker  quit
+
+The setup message is a pickle, so only connect workers to a coordinator
+you trust. The coordinator itself never unpickles anything it receives.
+Progressive rendering, statistics (--stats, --stats-json, --heatmap),
+profiles and checkpoints are local-only: main refuses those flags with
+--coordinator, and distributed renders take the fixed or adaptive path.
+"""
+import json
+import os
+import pickle
+import selectors
+import socket
+import statistics
+import struct
+import subprocess
+import sys
+import threading
+import time
+from array import array
+from collections import deque
+
+from camera import _render_tile
+from framebuffer import Framebuffer
+from image import Image
+from scheduler import TileScheduler
+
+HELLO = b"H"
+SETUP = b"S"
+TASK = b"T"
+RESULT = b"R"
+QUIT = b"Q"
+
+FRAME = struct.Struct("<cI")
+RESULT_HEADER = struct.Struct("<I")
+
+# A tile out for longer than this many median tile times (and at least
+# STRAGGLER_MIN seconds) is copied to an idle worker
+STRAGGLER_FACTOR = 3.0
+STRAGGLER_MIN = 1.0
+# Seconds a blocked send to a worker may take before it counts as dead
+SEND_TIMEOUT = 30.0
+# Seconds a worker keeps trying to reach the coordinator
+CONNECT_TIMEOUT = 30.0
+
+
+def parse_address(text):
+    """(host, port) from "host:port" """
+    host, sep, port = text.rpartition(":")
+    if not sep or not port.isdigit():
+        raise ValueError(f"Expected host:port, got {text!r}")
+    return host or "0.0.0.0", int(port)
+
+
+def send_message(sock, kind, payload=b""):
+    sock.sendall(FRAME.pack(kind, len(payload)) + payload)
+
+
+def _recv_exact(sock, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(min(size - len(data), 1 << 20))
+        if not chunk:
+            return None
+        data += chunk
+    return bytes(data)
+
+
+def recv_message(sock):
+    """(kind, payload) of the next message, or (None, None) when the peer closed"""
+    header = _recv_exact(sock, FRAME.size)
+    if header is None:
+        return None, None
+    kind, size = FRAME.unpack(header)
+    payload = _recv_exact(sock, size)
+    if payload is None:
+        return None, None
+    return kind, payload
+
+
+def encode_result(tile, seconds, sums, counts):
+    header = json.dumps(
+        {"tile": list(tile), "seconds": seconds, "byteorder": sys.byteorder}
+    ).encode()
+    return RESULT_HEADER.pack(len(header)) + header + sums.tobytes() + counts.tobytes()
+
+
+def decode_result(payload):
+    """(tile, seconds, sums, counts) of a result message"""
+    (size,) = RESULT_HEADER.unpack_from(payload)
+    start = RESULT_HEADER.size
+    header = json.loads(payload[start:start + size])
+    x0, y0, x1, y1 = tile = tuple(header["tile"])
+    pixels = (x1 - x0) * (y1 - y0)
+    data = array("d")
+    data.frombytes(payload[start + size:])
+    if len(data) != 4 * pixels:
+        raise ValueError(f"Result for tile {tile} has {len(data)} values, expected {4 * pixels}")
+    if header["byteorder"] != sys.byteorder:
+        data.byteswap()
+    return tile, header["seconds"], data[:3 * pixels], data[3 * pixels:]
+
+
+class _Worker:
+    """Coordinator-side state of one connected worker"""
+
+    def __init__(self, sock, address):
+        self.sock = sock
+        self.name = f"{address[0]}:{address[1]}"
+        self.buffer = bytearray()
+        self.cores = 0  # known once the worker said hello
+        self.tiles = {}  # tile -> time it was sent
+        self.done = 0
+
+    def messages(self):
+        """Complete messages received so far"""
+        while len(self.buffer) >= FRAME.size:
+            kind, size = FRAME.unpack_from(self.buffer)
+            end = FRAME.size + size
+            if len(self.buffer) < end:
+                break
+            payload = bytes(self.buffer[FRAME.size:end])
+            del self.buffer[:end]
+            yield kind, payload
+
+
+class Coordinator:
+    def __init__(self, cam, world, engine="scalar", address=("0.0.0.0", 0)):
+        self.cam = cam
+        self.world = world
+        self.engine = engine
+        self.server = socket.create_server(address)
+        self.address = self.server.getsockname()[:2]
+        self.workers = []
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.server, selectors.EVENT_READ)
+        self.setup = None
+        self.pending = deque()
+        self.finished = set()
+        self.reissued = 0
+        self.duplicates = 0
+
+    def close(self):
+        for worker in list(self.workers):
+            try:
+                send_message(worker.sock, QUIT)
+            except OSError:
+                pass
+            self._drop(worker, None)
+        self.selector.close()
+        self.server.close()
+
+    def render(self, fb, scheduler, samples):
+        """Render every tile with samples per pixel (None: adaptive) into fb"""
+        self.setup = pickle.dumps((self.cam, self.world, self.engine))
+        self.pending = deque(scheduler.ordered())
+        self.finished = set()
+        tiles = len(scheduler.tiles)
+        times = []
+        waiting = False
+
+        while len(self.finished) < tiles:
+            for key, _ in self.selector.select(timeout=0.25):
+                if key.fileobj is self.server:
+                    self._accept()
+                    continue
+                worker = key.data
+                if worker not in self.workers:
+                    continue  # dropped earlier in this round
+                try:
+                    data = worker.sock.recv(1 << 20)
+                except OSError:
+                    data = b""
+                if not data:
+                    self._drop(worker, "disconnected")
+                    continue
+                worker.buffer += data
+                try:
+                    for kind, payload in worker.messages():
+                        self._handle(worker, kind, payload, fb, scheduler, times)
+                except (ValueError, KeyError, OSError) as e:
+                    self._drop(worker, f"sent a bad message ({e})")
+
+            if not any(worker.cores for worker in self.workers):
+                if not waiting:
+                    waiting = True
+                    print(f"\rWaiting for workers on {self.address[0]}:{self.address[1]} ", end="")
+                    sys.stdout.flush()
+                continue
+            waiting = False
+            self._dispatch(samples, times)
+            print(f"\rTiles remaining: {tiles - len(self.finished)} ", end="")
+            sys.stdout.flush()
+
+    def _accept(self):
+        sock, address = self.server.accept()
+        sock.settimeout(SEND_TIMEOUT)
+        worker = _Worker(sock, address)
+        self.workers.append(worker)
+        self.selector.register(sock, selectors.EVENT_READ, worker)
+
+    def _drop(self, worker, reason):
+        """Forget a worker and put its unfinished tiles back in the queue"""
+        self.selector.unregister(worker.sock)
+        worker.sock.close()
+        self.workers.remove(worker)
+        lost = [
+            tile for tile in worker.tiles
+            if tile not in self.finished
+            and not any(tile in other.tiles for other in self.workers)
+        ]
+        self.pending.extendleft(lost)
+        self.reissued += len(lost)
+        if reason is not None:
+            print(f"\rWorker {worker.name} {reason}, re-issuing {len(lost)} tiles")
+
+    def _handle(self, worker, kind, payload, fb, scheduler, times):
+        if kind == HELLO:
+            hello = json.loads(payload)
+            send_message(worker.sock, SETUP, self.setup)
+            worker.cores = max(1, int(hello["cores"]))
+            print(f"\rWorker {worker.name} ({hello.get('host', '?')}) joined with "
+                  f"{worker.cores} cores")
+        elif kind == RESULT:
+            tile, seconds, sums, counts = decode_result(payload)
+            worker.tiles.pop(tile)
+            if tile in self.finished:
+                self.duplicates += 1
+                return
+            fb.accumulate(*tile, sums, counts)
+            self.finished.add(tile)
+            scheduler.record(tile, seconds)
+            times.append(seconds)
+            worker.done += 1
+        else:
+            raise ValueError(f"unexpected message {kind!r}")
+
+    def _dispatch(self, samples, times):
+        """Fill the free slots of every worker, first from the queue, then
+        with copies of straggling tiles"""
+        now = time.perf_counter()
+        limit = max(STRAGGLER_MIN, STRAGGLER_FACTOR * statistics.median(times)) if times else None
+        for worker in list(self.workers):
+            while worker.cores and len(worker.tiles) < worker.cores:
+                tile = self._next_tile(worker, now, limit)
+                if tile is None:
+                    break
+                task = {"tile": list(tile), "samples": samples, "first_sample": 0}
+                try:
+                    send_message(worker.sock, TASK, json.dumps(task).encode())
+                except OSError:
+                    self.pending.appendleft(tile)
+                    self._drop(worker, "stopped responding")
+                    break
+                worker.tiles[tile] = now
+
+    def _next_tile(self, worker, now, limit):
+        while self.pending:
+            tile = self.pending.popleft()
+            if tile not in self.finished:
+                return tile
+        if limit is None:
+            return None
+        # Copy the longest-running tile another worker is late with, once
+        late = [
+            (sent, tile)
+            for other in self.workers if other is not worker
+            for tile, sent in other.tiles.items()
+            if now - sent > limit and tile not in self.finished
+            and sum(tile in w.tiles for w in self.workers) == 1
+        ]
+        if not late:
+            return None
+        self.reissued += 1
+        return min(late)[1]
+
+
+def spawn_local_workers(address, count):
+    """Start count single-core workers on this machine"""
+    main_py = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+    host = "127.0.0.1" if address[0] in ("", "0.0.0.0") else address[0]
+    return [
+        subprocess.Popen(
+            [sys.executable, main_py, "--worker", f"{host}:{address[1]}", "--cores", "1"],
+            stdout=subprocess.DEVNULL,
+        )
+        for _ in range(count)
+    ]
+
+
+def render_distributed(cam, world, out_stream, engine="scalar", image_format="P3",
+                       address=("0.0.0.0", 0), spawn_workers=0):
+    """Render the scene on the workers that connect to address and write it"""
+    if cam.progressive:
+        print("Progressive rendering is not distributed; rendering all samples in one pass")
+    cam.progressive = False
+    cam.collect_stats = False
+    cam.profile = False
+    cam.checkpoint_path = None
+    cam.initialize()
+
+    coordinator = Coordinator(cam, world, engine, address)
+    host, port = coordinator.address
+    print(f"Coordinator listening on {host}:{port}")
+    local = spawn_local_workers(coordinator.address, spawn_workers)
+
+    scheduler = TileScheduler(cam.image_width, cam.image_height, cam.tile_size)
+    fb = Framebuffer(cam.image_width, cam.image_height)
+    start = time.perf_counter()
+    try:
+        coordinator.render(fb, scheduler, None if cam.adaptive else cam.samples_per_pixel)
+    finally:
+        coordinator.close()
+        for process in local:
+            try:
+                process.wait(timeout=10.0)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    elapsed = time.perf_counter() - start
+    samples = int(fb.total_samples())
+    print(f"\rRendered in {elapsed:.2f}s ({samples / elapsed:,.0f} camera rays/sec), "
+          f"{coordinator.reissued} tiles re-issued, {coordinator.duplicates} duplicate results")
+    if cam.adaptive:
+        print(cam.adaptive_summary(samples))
+
+    img = Image.from_framebuffer(fb)
+    start = time.perf_counter()
+    img.write_to(out_stream, image_format)
+    out_stream.flush()
+    print(f"Encoded {image_format} in {time.perf_counter() - start:.3f}s")
+    print("\rDone.                 ")
+    return img
+
+
+def _connect(address):
+    deadline = time.perf_counter() + CONNECT_TIMEOUT
+    while True:
+        try:
+            return socket.create_connection(address)
+        except OSError:
+            if time.perf_counter() >= deadline:
+                raise
+            time.sleep(0.5)
+
+
+def run_worker(address, cores=1):
+    """Render tiles for the coordinator at address until it says quit"""
+    sock = _connect(address)
+    send_message(sock, HELLO, json.dumps({"cores": cores, "host": socket.gethostname()}).encode())
+    kind, payload = recv_message(sock)
+    if kind != SETUP:
+        print("Error: the coordinator did not send a scene")
+        sock.close()
+        return
+    cam, world, engine = pickle.loads(payload)
+    print(f"Connected to {address[0]}:{address[1]}: {cam.image_width}x{cam.image_height}, "
+          f"{len(world.objects)} objects, {cores} cores")
+
+    fb = Framebuffer(cam.image_width, cam.image_height, shared=cores > 1)
+    send_lock = threading.Lock()
+    rendered = 0
+
+    def send_result(tile, seconds):
+        sums, counts = fb.take_tile(*tile)
+        with send_lock:
+            send_message(sock, RESULT, encode_result(tile, seconds, sums, counts))
+
+    def on_done(future):
+        try:
+            tile, seconds, _, _ = future.result()
+            send_result(tile, seconds)
+        except Exception as e:  # the pool or the coordinator went away
+            print(f"Error: tile failed: {e}")
+
+    try:
+        with cam._tile_pool(world, engine, fb, cores) as executor:
+            while True:
+                kind, payload = recv_message(sock)
+                if kind is None or kind == QUIT:
+                    if executor is not None:
+                        # Tiles still queued here were copies the coordinator no longer needs
+                        executor.shutdown(cancel_futures=True)
+                    break
+                task = json.loads(payload)
+                job = (tuple(task["tile"]), task["samples"], task["first_sample"])
+                rendered += 1
+                if executor is None:
+                    tile, seconds, _, _ = _render_tile(*job)
+                    send_result(tile, seconds)
+                else:
+                    executor.submit(_render_tile, *job).add_done_callback(on_done)
+    except OSError as e:
+        print(f"Connection to the coordinator lost: {e}")
+    finally:
+        fb.close()
+        fb.unlink()
+        sock.close()
+    print(f"Worker done, {rendered} tiles rendered")
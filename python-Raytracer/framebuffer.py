@@ -0,0 +1,119 @@
+"""Accumulation framebuffer, optionally in shared memory.
+
+Every pixel holds the running sum of its samples and the number of samples
+taken, as CHANNELS consecutive doubles. In multi-core renders the buffer
+lives in a multiprocessing.shared_memory block: workers attach to it once
+and add the samples of their tiles in place, so the parent never receives
+pixel data and its memory and IPC volume do not depend on the image size.
+Tiles never overlap, so no locking is needed.
+"""
+import itertools
+from array import array
+from multiprocessing import shared_memory, resource_tracker
+
+R, G, B, COUNT = range(4)
+CHANNELS = 4
+
+
+class Framebuffer:
+    def __init__(self, width, height, shared=False):
+        self.width = width
+        self.height = height
+        size = width * height * CHANNELS * 8
+        if shared:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+            self.data = self.shm.buf.cast("d")
+        else:
+            self.shm = None
+            self.data = memoryview(bytearray(size)).cast("d")
+
+    @classmethod
+    def attach(cls, name, width, height):
+        """Map an existing shared framebuffer, e.g. in a spawned worker"""
+        fb = cls.__new__(cls)
+        fb.width = width
+        fb.height = height
+        fb.shm = shared_memory.SharedMemory(name=name)
+        # Only the creator owns the block; keep the tracker from unlinking it
+        # when this process exits
+        resource_tracker.unregister(fb.shm._name, "shared_memory")
+        fb.data = fb.shm.buf.cast("d")
+        return fb
+
+    def __reduce__(self):
+        if self.shm is None:
+            raise TypeError("Only shared framebuffers can be sent to other processes")
+        return Framebuffer.attach, (self.shm.name, self.width, self.height)
+
+    def accumulate(self, x0, y0, x1, y1, sums, samples):
+        """Add per-pixel sample sums (flat RGB, row-major over the tile) to the buffer.
+
+        samples is the sample count of every pixel, or a row-major sequence
+        with one count per pixel for adaptively sampled tiles.
+        """
+        if isinstance(samples, int):
+            samples = itertools.repeat(samples)
+        data = self.data
+        counts = iter(samples)
+        k = 0
+        for j in range(y0, y1):
+            base = (j * self.width + x0) * CHANNELS
+            for _ in range(x0, x1):
+                data[base + R] += sums[k]
+                data[base + G] += sums[k + 1]
+                data[base + B] += sums[k + 2]
+                data[base + COUNT] += next(counts)
+                base += CHANNELS
+                k += 3
+
+    def take_tile(self, x0, y0, x1, y1):
+        """Remove the samples of a tile from the buffer; returns its sums
+        (flat RGB, row-major) and per-pixel counts, as accumulate takes them"""
+        data = self.data
+        sums = array("d")
+        counts = array("d")
+        for j in range(y0, y1):
+            base = (j * self.width + x0) * CHANNELS
+            end = base + (x1 - x0) * CHANNELS
+            row = data[base:end]
+            for k in range(0, len(row), CHANNELS):
+                sums.extend(row[k:k + 3])
+                counts.append(row[k + COUNT])
+            data[base:end] = array("d", bytes(8 * (end - base)))
+        return sums, counts
+
+    def pixel(self, i, j):
+        """Mean color of pixel (i, j) as an (r, g, b) tuple"""
+        base = (j * self.width + i) * CHANNELS
+        n = self.data[base + COUNT]
+        if n <= 0.0:
+            return 0.0, 0.0, 0.0
+        inv = 1.0 / n
+        return self.data[base] * inv, self.data[base + 1] * inv, self.data[base + 2] * inv
+
+    def tile_counts(self, x0, y0, x1, y1):
+        """(min, max) sample count over the pixels of a tile"""
+        lo = hi = None
+        for j in range(y0, y1):
+            base = (j * self.width + x0) * CHANNELS
+            row = self.data[base + COUNT:base + (x1 - x0) * CHANNELS:CHANNELS]
+            row_lo, row_hi = min(row), max(row)
+            lo = row_lo if lo is None else min(lo, row_lo)
+            hi = row_hi if hi is None else max(hi, row_hi)
+        return int(lo), int(hi)
+
+    def total_samples(self):
+        """Number of samples accumulated over the whole image"""
+        return sum(self.data[COUNT::CHANNELS])
+
+    def close(self):
+        """Release this process's mapping of the shared block"""
+        if self.shm is None:
+            return
+        self.data.release()
+        self.shm.close()
+
+    def unlink(self):
+        """Free the shared block; called once by the creator after close()"""
+        if self.shm is not None:
+            self.shm.unlink()
@@ -0,0 +1,151 @@
+"""Per-tile view frustum culling for primary rays.
+
+The camera rays of a tile start on the defocus disk (radius R around the
+camera center, in the u, v plane) and pass through the tile's rectangle on
+the focus plane, at distance f. In camera coordinates (x along u, y along
+v, s the distance in front of the camera) a point of such a ray is
+
+    x = x_origin * (1 - s / f) + x_focus * s / f,   s >= 0
+
+so with x_focus >= a and |x_origin| <= R it satisfies
+
+    x >= s * (a - R) / f - R
+
+and likewise on the other three sides: the frustum of the pinhole camera,
+widened by the lens. Those four half-spaces and s >= 0 hold every point
+a primary ray of the tile can reach. An object whose box lies outside one
+of them cannot be hit by them, and the objects left are the tile's
+candidates. The tile is widened by PIXEL_MARGIN pixels on every side, so
+the rounding of Camera.get_ray never takes a ray past the frustum and the
+first hits are the ones the whole world gives.
+
+Primary rays are traced against the candidates and every later bounce
+against the world. A BVH world is culled node by node, so a tile costs a
+walk over the part of the tree in view rather than a test of every object.
+Up to LIST_MAX candidates are tested one by one; more get a BVH of their
+own, which is kept for the later passes over the tile. Building it costs
+about as much per candidate as BUILD_COST camera rays save by using it,
+so a tile of a BVH world with fewer camera samples than that (far into a
+huge scene, at a low sample count) traces its camera rays against the
+world's tree instead. The walk that collects the candidates stops as soon
+as there are too many for that, so such a tile costs at most a walk over
+samples / BUILD_COST candidates, a small fraction of what its rays cost.
+"""
+from bvh import BVH
+from hittable import HittableList
+
+PIXEL_MARGIN = 1.0
+LIST_MAX = 8
+BUILD_COST = 16
+
+
+def tile_planes(cam, x0, y0, x1, y1):
+    """Half-spaces (nx, ny, nz, d), n . p + d >= 0, holding every point the
+    camera rays of pixels [x0, x1) x [y0, y1) reach"""
+    center = cam.center
+    u, v, w = cam.u, cam.v, cam.w
+    corner = cam.pixel00_loc - center
+    f = -(corner.x() * w.x() + corner.y() * w.y() + corner.z() * w.z())
+    radius = cam.defocus_disk_u.length() if cam.defocus_angle > 0.0 else 0.0
+
+    # Extent of the tile on the focus plane; pixel i takes samples over
+    # [i - 0.5, i + 0.5), and pixel_delta_v points along -v
+    su = cam.pixel_delta_u.length()
+    sv = cam.pixel_delta_v.length()
+    u00 = corner.x() * u.x() + corner.y() * u.y() + corner.z() * u.z()
+    v00 = corner.x() * v.x() + corner.y() * v.y() + corner.z() * v.z()
+    a_u = u00 + (x0 - 0.5 - PIXEL_MARGIN) * su
+    b_u = u00 + (x1 - 0.5 + PIXEL_MARGIN) * su
+    a_v = v00 - (y1 - 0.5 + PIXEL_MARGIN) * sv
+    b_v = v00 - (y0 - 0.5 - PIXEL_MARGIN) * sv
+
+    # (alpha, beta, gamma, delta): alpha x + beta y + gamma s + delta >= 0
+    camera_planes = (
+        (1.0, 0.0, -(a_u - radius) / f, radius),
+        (-1.0, 0.0, (b_u + radius) / f, radius),
+        (0.0, 1.0, -(a_v - radius) / f, radius),
+        (0.0, -1.0, (b_v + radius) / f, radius),
+        (0.0, 0.0, 1.0, 1e-6 * f),
+    )
+    # x = u . (p - center), y = v . (p - center), s = -w . (p - center)
+    planes = []
+    for alpha, beta, gamma, delta in camera_planes:
+        n = u * alpha + v * beta - w * gamma
+        d = delta - (n.x() * center.x() + n.y() * center.y() + n.z() * center.z())
+        planes.append((n.x(), n.y(), n.z(), d))
+    return planes
+
+
+def box_outside(planes, box, offset=0):
+    """True if the box (min x, y, z, max x, y, z at box[offset:offset + 6])
+    lies wholly outside one of the half-spaces. Unbounded boxes are never
+    outside: their far corner is infinite or not a number."""
+    for nx, ny, nz, d in planes:
+        # The corner furthest along n
+        x = box[offset + 3] if nx > 0.0 else box[offset]
+        y = box[offset + 4] if ny > 0.0 else box[offset + 1]
+        z = box[offset + 5] if nz > 0.0 else box[offset + 2]
+        if nx * x + ny * y + nz * z + d < 0.0:
+            return True
+    return False
+
+
+class TileCuller:
+    """Builds and keeps the primary ray structure of every tile of a BVH or
+    HittableList world"""
+
+    def __init__(self, cam, world):
+        self.cam = cam
+        self.world = world
+        self.tiles = {}
+        if not isinstance(world, BVH):
+            self.boxes = []
+            for obj in world.objects:
+                b = obj.bounding_box()
+                self.boxes.extend((b.min[0], b.min[1], b.min[2], b.max[0], b.max[1], b.max[2]))
+
+    def candidates(self, x0, y0, x1, y1, limit=None):
+        """The objects of the world the tile's camera rays can hit; for a BVH
+        world, None as soon as there are more than limit"""
+        planes = tile_planes(self.cam, x0, y0, x1, y1)
+        world = self.world
+        objects = world.objects
+        if not isinstance(world, BVH):
+            return [obj for k, obj in enumerate(objects) if not box_outside(planes, self.boxes, 6 * k)]
+
+        bounds = world.bounds
+        nodes = world.nodes
+        found = []
+        stack = world.start_stack[:]
+        while stack:
+            node = stack.pop()
+            if box_outside(planes, bounds, 6 * node):
+                continue
+            n = 3 * node
+            if nodes[n + 2] < 0:
+                found.extend(objects[nodes[n]:nodes[n] + nodes[n + 1]])
+                if limit is not None and len(found) > limit:
+                    return None
+            else:
+                stack.append(nodes[n])
+                stack.append(node + 1)
+        return found
+
+    def tile_world(self, x0, y0, x1, y1):
+        """Structure to trace the tile's camera rays against, or None for
+        the world"""
+        tile = (x0, y0, x1, y1)
+        if tile in self.tiles:
+            return self.tiles[tile]
+        samples = (x1 - x0) * (y1 - y0) * self.cam.samples_per_pixel
+        limit = max(LIST_MAX, samples // BUILD_COST) if isinstance(self.world, BVH) else None
+        found = self.candidates(x0, y0, x1, y1, limit)
+        if found is None:
+            structure = None
+        else:
+            structure = HittableList(self.world.palette)
+            structure.objects = found
+            if len(found) > LIST_MAX and len(found) * BUILD_COST <= samples:
+                structure = BVH(structure)
+        self.tiles[tile] = structure
+        return structure
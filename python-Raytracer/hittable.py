@@ -1,13 +1,15 @@
 import math
-from vec3 import dot, Point3, Vec3
-from utils import Interval
+from vec3 import dot, unit_vector, Point3, Vec3
+from utils import Interval, INFINITY
+from aabb import AABB
+from material import MaterialPalette
 
 
 class HitRecord:
     def __init__(self):
         self.p = Point3()
         self.normal = Vec3()
-        self.mat = None
+        self.mat_index = 0
         self.t = 0.0
         self.front_face = False
 
@@ -21,10 +23,19 @@ class Hittable:
         """Returns True if hit, updates rec"""
         pass
 
+    def bounding_box(self):
+        """Returns the AABB enclosing the object"""
+        pass
+
 
 class HittableList(Hittable):
-    def __init__(self):
+    def __init__(self, palette=None):
         self.objects = []
+        # Materials of the objects, by the index they hold
+        self.palette = MaterialPalette() if palette is None else palette
+        self.collect_stats = False
+        self.rays = 0
+        self.prims_tested = 0
 
     def add(self, obj):
         self.objects.append(obj)
@@ -39,20 +50,44 @@ class HittableList(Hittable):
                 hit_anything = True
                 closest_so_far = rec.t
 
+        if self.collect_stats:
+            self.rays += 1
+            self.prims_tested += len(self.objects)
+
         return hit_anything
 
+    def bounding_box(self):
+        box = AABB()
+        for obj in self.objects:
+            box.expand(obj.bounding_box())
+        return box
+
 
 class Sphere(Hittable):
-    def __init__(self, center, radius, material):
+    def __init__(self, center, radius, mat_index):
         self.center = center
         self.radius = radius
-        self.material = material
+        self.mat_index = mat_index
+
+    def bounding_box(self):
+        c = self.center
+        r = abs(self.radius)
+        return AABB(c.x() - r, c.y() - r, c.z() - r, c.x() + r, c.y() + r, c.z() + r)
 
     def hit(self, r, ray_t, rec):
-        oc = r.origin - self.center
-        a = r.direction.length_squared()
-        half_b = dot(oc, r.direction)
-        c = oc.length_squared() - self.radius * self.radius
+        # The ray/sphere quadratic in plain floats, in the operation order
+        # of the Vec3 form (oc = origin - center, dot(oc, direction), ...),
+        # so no temporaries are allocated and the roots keep their bits
+        o = r.origin
+        d = r.direction
+        center = self.center
+        ox = o.e0 - center.e0
+        oy = o.e1 - center.e1
+        oz = o.e2 - center.e2
+        dx, dy, dz = d.e0, d.e1, d.e2
+        a = dx * dx + dy * dy + dz * dz
+        half_b = ox * dx + oy * dy + oz * dz
+        c = ox * ox + oy * oy + oz * oz - self.radius * self.radius
 
         discriminant = half_b * half_b - a * c
         if discriminant < 0:
@@ -62,15 +97,92 @@ class Sphere(Hittable):
 
         # Find the nearest root in the acceptable range
         root = (-half_b - sqrtd) / a
-        if not ray_t.contains(root):
+        if not ray_t.min <= root <= ray_t.max:
             root = (-half_b + sqrtd) / a
-            if not ray_t.contains(root):
+            if not ray_t.min <= root <= ray_t.max:
                 return False
 
         rec.t = root
-        rec.p = r.at(rec.t)
-        outward_normal = (rec.p - self.center) / self.radius
+        rec.p = r.at(root)
+        outward_normal = rec.p - center
+        outward_normal /= self.radius
         rec.set_face_normal(r, outward_normal)
-        rec.mat = self.material
+        rec.mat_index = self.mat_index
+
+        return True
+
+
+class Plane(Hittable):
+    """The infinite plane through point, facing along normal"""
+
+    def __init__(self, point, normal, mat_index):
+        self.point = point
+        self.normal = unit_vector(normal)
+        self.mat_index = mat_index
+        # dot(normal, p) of the points on the plane, and the normal seen
+        # from behind
+        self.offset = dot(self.normal, point)
+        self.back = -self.normal
+
+    def bounding_box(self):
+        return AABB(-INFINITY, -INFINITY, -INFINITY, INFINITY, INFINITY, INFINITY)
+
+    def hit(self, r, ray_t, rec):
+        n = self.normal
+        d = r.direction
+        denom = n.e0 * d.e0 + n.e1 * d.e1 + n.e2 * d.e2
+        if denom == 0.0:
+            return False  # Parallel to the plane
+        o = r.origin
+        t = (self.offset - (n.e0 * o.e0 + n.e1 * o.e1 + n.e2 * o.e2)) / denom
+        if not ray_t.min <= t <= ray_t.max:
+            return False
+
+        rec.t = t
+        rec.p = r.at(t)
+        rec.front_face = denom < 0.0
+        rec.normal = n if rec.front_face else self.back
+        rec.mat_index = self.mat_index
+        return True
+
+
+class Disk(Plane):
+    """The disk of the given radius around center, facing along normal"""
+
+    def __init__(self, center, normal, radius, mat_index):
+        super().__init__(center, normal, mat_index)
+        self.radius = radius
+
+    def bounding_box(self):
+        # Along an axis the disk reaches radius * sin(angle of the normal to it)
+        c = self.point
+        n = self.normal
+        ex = self.radius * math.sqrt(max(0.0, 1.0 - n.x() * n.x()))
+        ey = self.radius * math.sqrt(max(0.0, 1.0 - n.y() * n.y()))
+        ez = self.radius * math.sqrt(max(0.0, 1.0 - n.z() * n.z()))
+        return AABB(c.x() - ex, c.y() - ey, c.z() - ez, c.x() + ex, c.y() + ey, c.z() + ez)
+
+    def hit(self, r, ray_t, rec):
+        n = self.normal
+        d = r.direction
+        denom = n.e0 * d.e0 + n.e1 * d.e1 + n.e2 * d.e2
+        if denom == 0.0:
+            return False
+        o = r.origin
+        t = (self.offset - (n.e0 * o.e0 + n.e1 * o.e1 + n.e2 * o.e2)) / denom
+        if not ray_t.min <= t <= ray_t.max:
+            return False
+        p = r.at(t)
+        c = self.point
+        x = p.e0 - c.e0
+        y = p.e1 - c.e1
+        z = p.e2 - c.e2
+        if x * x + y * y + z * z > self.radius * self.radius:
+            return False
 
+        rec.t = t
+        rec.p = p
+        rec.front_face = denom < 0.0
+        rec.normal = n if rec.front_face else self.back
+        rec.mat_index = self.mat_index
         return True
@@ -1,24 +1,128 @@
+import math
+import os
+import struct
+import sys
+import zlib
+from array import array
+
 from vec3 import Color
-from color import write_color
+from color import write_color, encode_ldr, np
+from framebuffer import CHANNELS
+
+# Output formats by file extension
+FORMATS = {".ppm": "P6", ".pfm": "PFM", ".png": "PNG"}
+
+
+def format_for_path(path, default="P6"):
+    return FORMATS.get(os.path.splitext(path)[1].lower(), default)
 
 
 class Image:
     def __init__(self, width, height):
         self.width = width
         self.height = height
-        self.pixels = [Color(0.0, 0.0, 0.0) for _ in range(width * height)]
+        # Flat linear RGB triples in row-major order
+        self.pixels = array("d", bytes(8 * 3 * width * height))
+
+    @classmethod
+    def from_framebuffer(cls, fb):
+        """Resolve the per-pixel sample sums of a Framebuffer into mean colors"""
+        img = cls(fb.width, fb.height)
+        if np is not None:
+            data = np.frombuffer(fb.data, dtype=np.float64).reshape(-1, CHANNELS)
+            counts = data[:, 3:4]
+            rgb = np.divide(data[:, :3], counts, out=np.zeros((len(data), 3)), where=counts > 0)
+            img.pixels = array("d", rgb.tobytes())
+            return img
+
+        k = 0
+        for j in range(fb.height):
+            for i in range(fb.width):
+                img.pixels[k], img.pixels[k + 1], img.pixels[k + 2] = fb.pixel(i, j)
+                k += 3
+        return img
 
     def set_pixel(self, x, y, color):
-        self.pixels[y * self.width + x] = color
+        k = 3 * (y * self.width + x)
+        self.pixels[k] = color.x()
+        self.pixels[k + 1] = color.y()
+        self.pixels[k + 2] = color.z()
+
+    def get_pixel(self, x, y):
+        k = 3 * (y * self.width + x)
+        return Color(self.pixels[k], self.pixels[k + 1], self.pixels[k + 2])
+
+    def relative_change(self, other):
+        """RMS difference to another image of the same size, relative to the
+        RMS value of this one; used as a convergence measure between passes"""
+        if np is not None:
+            a = np.frombuffer(self.pixels, dtype=np.float64)
+            b = np.frombuffer(other.pixels, dtype=np.float64)
+            norm = float(np.dot(a, a))
+            diff = a - b
+            return math.sqrt(float(np.dot(diff, diff)) / norm) if norm > 0.0 else 0.0
+
+        norm = sum(v * v for v in self.pixels)
+        diff = sum((u - v) * (u - v) for u, v in zip(self.pixels, other.pixels))
+        return math.sqrt(diff / norm) if norm > 0.0 else 0.0
+
+    def write_to(self, out, image_format="P3"):
+        """Write the image to the given stream; P3 needs a text stream, the rest binary"""
+        if image_format == "P3":
+            return self.write_p3(out)
+        if image_format == "P6":
+            return self.write_p6(out)
+        if image_format == "PFM":
+            return self.write_pfm(out)
+        if image_format == "PNG":
+            return self.write_png(out)
+        raise ValueError(f"Unknown image format: {image_format}")
 
-    def write_to(self, out):
-        """Write the image to the given file stream in PPM format"""
+    def write_p3(self, out):
+        """ASCII PPM, one pixel per line"""
         # Write PPM header
         out.write(f"P3\n{self.width} {self.height}\n255\n")
 
         # Write all pixels
         for j in range(self.height):
             for i in range(self.width):
-                write_color(out, self.pixels[j * self.width + i])
+                write_color(out, self.get_pixel(i, j))
+
+        return True
+
+    def write_p6(self, out):
+        """Binary PPM with 8-bit gamma-corrected samples"""
+        out.write(f"P6\n{self.width} {self.height}\n255\n".encode("ascii"))
+        out.write(encode_ldr(self.pixels))
+        return True
+
+    def write_pfm(self, out):
+        """Portable float map with the linear HDR values, rows stored bottom to top"""
+        # A negative scale marks little-endian data
+        endian = "-1.0" if sys.byteorder == "little" else "1.0"
+        out.write(f"PF\n{self.width} {self.height}\n{endian}\n".encode("ascii"))
+
+        floats = array("f", self.pixels)
+        row = 3 * self.width
+        for j in range(self.height - 1, -1, -1):
+            out.write(floats[j * row:(j + 1) * row].tobytes())
+        return True
+
+    def write_png(self, out):
+        """8-bit RGB PNG compressed with zlib"""
+        data = encode_ldr(self.pixels)
+        row = 3 * self.width
+        # Every scanline starts with filter type 0 (none)
+        raw = b"".join(
+            b"\x00" + data[j * row:(j + 1) * row] for j in range(self.height)
+        )
+
+        def chunk(kind, payload):
+            crc = zlib.crc32(kind + payload) & 0xFFFFFFFF
+            return struct.pack(">I", len(payload)) + kind + payload + struct.pack(">I", crc)
 
+        out.write(b"\x89PNG\r\n\x1a\n")
+        out.write(chunk(b"IHDR", struct.pack(">IIBBBBB", self.width, self.height, 8, 2, 0, 0, 0)))
+        out.write(chunk(b"IDAT", zlib.compress(raw, 6)))
+        out.write(chunk(b"IEND", b""))
         return True
@@ -3,23 +3,124 @@ import os
 import multiprocessing
 
 from vec3 import Vec3, Point3, Color
-from hittable import HittableList, Sphere
+from hittable import HittableList, Sphere, Plane, Disk
+from bvh import BVH
 from material import Lambertian, Metal, Dielectric
 from camera import Camera
-from utils import random_double
+import compiled_scene
+from distributed import parse_address, render_distributed, run_worker
+from image import format_for_path
+from sampler import SAMPLERS
+from scene_gen import BOOK_SPHERES, generate_scene
+from utils import process_start_time
+
+# Spheres at least this large, a radius below the scene, are its ground
+GROUND_RADIUS = 100.0
+
+
+def set_camera_param(cam, parts):
+    """Apply a split camera line of a scene file ("c <param> <values>...")"""
+    param_name = parts[1]
+    if param_name == "ratio" and len(parts) >= 4:
+        cam.aspect_ratio = float(parts[2]) / float(parts[3])
+    elif param_name == "width" and len(parts) >= 3:
+        cam.image_width = int(parts[2])
+    elif param_name == "samplesPerPixel" and len(parts) >= 3:
+        cam.samples_per_pixel = int(parts[2])
+    elif param_name == "maxDepth" and len(parts) >= 3:
+        cam.max_depth = int(parts[2])
+    elif param_name == "vfov" and len(parts) >= 3:
+        cam.vfov = float(parts[2])
+    elif param_name == "lookFrom" and len(parts) >= 5:
+        cam.look_from = Point3(float(parts[2]), float(parts[3]), float(parts[4]))
+    elif param_name == "lookAt" and len(parts) >= 5:
+        cam.look_at = Point3(float(parts[2]), float(parts[3]), float(parts[4]))
+    elif param_name == "vup" and len(parts) >= 5:
+        cam.vup = Vec3(float(parts[2]), float(parts[3]), float(parts[4]))
+    elif param_name == "defocusAngle" and len(parts) >= 3:
+        cam.defocus_angle = float(parts[2])
+    elif param_name == "focusDist" and len(parts) >= 3:
+        cam.focus_dist = float(parts[2])
+    elif param_name == "rouletteDepth" and len(parts) >= 3:
+        cam.roulette_depth = int(parts[2])
+    elif param_name == "rouletteMinSurvival" and len(parts) >= 3:
+        cam.roulette_min_survival = float(parts[2])
+    elif param_name == "sampler" and len(parts) >= 3:
+        if parts[2] in SAMPLERS:
+            cam.sampler_type = parts[2]
+    elif param_name == "minSamples" and len(parts) >= 3:
+        cam.min_samples = int(parts[2])
+        cam.adaptive = True
+    elif param_name == "maxSamples" and len(parts) >= 3:
+        cam.max_samples = int(parts[2])
+        cam.adaptive = True
+    elif param_name == "adaptiveThreshold" and len(parts) >= 3:
+        cam.adaptive_threshold = float(parts[2])
+        cam.adaptive = True
+
+
+def parse_material(palette, parts):
+    """Palette index of the material of a split scene line from its type
+    name on ("lambertian r g b", "metal r g b fuzz", "dielectric index"),
+    or None if it is not one"""
+    if not parts:
+        return None
+    material_type = parts[0]
+    if material_type == "lambertian" and len(parts) >= 4:
+        r = float(parts[1]) if parts[1] else 0.5
+        g = float(parts[2]) if parts[2] else 0.5
+        b = float(parts[3]) if parts[3] else 0.5
+        return palette.add(Lambertian(Color(r, g, b)))
+    if material_type == "metal" and len(parts) >= 5:
+        r = float(parts[1]) if parts[1] else 0.5
+        g = float(parts[2]) if parts[2] else 0.5
+        b = float(parts[3]) if parts[3] else 0.5
+        fuzz = float(parts[4]) if parts[4] else 0.0
+        return palette.add(Metal(Color(r, g, b), fuzz))
+    if material_type == "dielectric" and len(parts) >= 2:
+        index = float(parts[1]) if parts[1] else 1.5
+        return palette.add(Dielectric(index))
+    return None
+
+
+def is_ground_sphere(y, radius):
+    """True for the huge sphere scenes use as ground: at least GROUND_RADIUS,
+    its center about a radius below the scene"""
+    return radius >= GROUND_RADIUS and y <= -0.9 * radius
+
+
+def create_world_from_file(filepath, compiled=True):
+    """Create world from a scene description file.
+
+    With compiled, the world comes from the file's compiled form
+    (compiled_scene.py) when that is up to date, and a parsed file is
+    compiled for the next load.
+    """
+    if compiled or filepath.endswith(compiled_scene.SUFFIX):
+        loaded = compiled_scene.load(filepath)
+        if loaded is None and filepath.endswith(compiled_scene.SUFFIX):
+            print(f"Error reading from {filepath}: not a compiled scene file")
+            return None, None
+        if loaded is not None:
+            world, camera_lines = loaded
+            cam = Camera()
+            for parts in camera_lines:
+                set_camera_param(cam, parts)
+            print(f"Loaded world from {compiled_scene.compiled_path(filepath)}")
+            return world, cam
 
-
-def create_world_from_file(filepath):
-    """Create world from a scene description file"""
     world = HittableList()
     cam = Camera()
+    camera_lines = []
 
-    # Add ground sphere
-    ground_material = Lambertian(Color(0.5, 0.5, 0.5))
-    world.add(Sphere(Point3(0.0, -1000.0, 0.0), 1000.0, ground_material))
+    # Default ground sphere, added unless the file has its own
+    ground_material = world.palette.add(Lambertian(Color(0.5, 0.5, 0.5)))
+    ground_sphere = None
+    ground = "sphere"
 
-    # Read spheres from file
+    # Read objects from file
     try:
+        signature = compiled_scene.source_signature(filepath)
         with open(filepath, "r", encoding="utf-8") as file:
             for line in file:
                 line = line.strip()
@@ -31,27 +132,27 @@ def create_world_from_file(filepath):
 
                 # Check if this is a camera parameter
                 if line.startswith("c ") and len(parts) >= 3:
-                    param_name = parts[1]
-                    if param_name == "ratio" and len(parts) >= 4:
-                        cam.aspect_ratio = float(parts[2]) / float(parts[3])
-                    elif param_name == "width" and len(parts) >= 3:
-                        cam.image_width = int(parts[2])
-                    elif param_name == "samplesPerPixel" and len(parts) >= 3:
-                        cam.samples_per_pixel = int(parts[2])
-                    elif param_name == "maxDepth" and len(parts) >= 3:
-                        cam.max_depth = int(parts[2])
-                    elif param_name == "vfov" and len(parts) >= 3:
-                        cam.vfov = float(parts[2])
-                    elif param_name == "lookFrom" and len(parts) >= 5:
-                        cam.look_from = Point3(float(parts[2]), float(parts[3]), float(parts[4]))
-                    elif param_name == "lookAt" and len(parts) >= 5:
-                        cam.look_at = Point3(float(parts[2]), float(parts[3]), float(parts[4]))
-                    elif param_name == "vup" and len(parts) >= 5:
-                        cam.vup = Vec3(float(parts[2]), float(parts[3]), float(parts[4]))
-                    elif param_name == "defocusAngle" and len(parts) >= 3:
-                        cam.defocus_angle = float(parts[2])
-                    elif param_name == "focusDist" and len(parts) >= 3:
-                        cam.focus_dist = float(parts[2])
+                    set_camera_param(cam, parts)
+                    camera_lines.append(parts)
+                    continue
+
+                if parts[0] == "ground" and len(parts) >= 2:
+                    ground = parts[1]
+                    continue
+
+                if parts[0] in ("plane", "disk"):
+                    # plane x y z nx ny nz <material>, disk x y z nx ny nz radius <material>
+                    count = 7 if parts[0] == "disk" else 6
+                    material = parse_material(world.palette, parts[1 + count:])
+                    if material is None:
+                        continue
+                    values = [float(v) for v in parts[1:1 + count]]
+                    point = Point3(*values[0:3])
+                    normal = Vec3(*values[3:6])
+                    if parts[0] == "disk":
+                        world.add(Disk(point, normal, values[6], material))
+                    else:
+                        world.add(Plane(point, normal, material))
                     continue
 
                 if len(parts) < 5:
@@ -62,134 +163,46 @@ def create_world_from_file(filepath):
                 y = float(parts[1]) if parts[1] else 0.0
                 z = float(parts[2]) if parts[2] else 0.0
                 radius = float(parts[3]) if parts[3] else 0.2
-                material_type = parts[4]
-
-                center = Point3(x, y, z)
-
-                # Parse material based on type
-                if material_type == "lambertian" and len(parts) >= 8:
-                    r = float(parts[5]) if parts[5] else 0.5
-                    g = float(parts[6]) if parts[6] else 0.5
-                    b = float(parts[7]) if parts[7] else 0.5
-                    material = Lambertian(Color(r, g, b))
-                    world.add(Sphere(center, radius, material))
-                elif material_type == "metal" and len(parts) >= 9:
-                    r = float(parts[5]) if parts[5] else 0.5
-                    g = float(parts[6]) if parts[6] else 0.5
-                    b = float(parts[7]) if parts[7] else 0.5
-                    fuzz = float(parts[8]) if parts[8] else 0.0
-                    material = Metal(Color(r, g, b), fuzz)
-                    world.add(Sphere(center, radius, material))
-                elif material_type == "dielectric" and len(parts) >= 6:
-                    index = float(parts[5]) if parts[5] else 1.5
-                    material = Dielectric(index)
-                    world.add(Sphere(center, radius, material))
-                else:
+
+                material = parse_material(world.palette, parts[4:])
+                if material is None:
                     continue  # Skip invalid material types or insufficient parameters
+                world.add(Sphere(Point3(x, y, z), radius, material))
+                if ground_sphere is None and is_ground_sphere(y, radius):
+                    ground_sphere = len(world.objects) - 1
 
         print(f"Loaded world from {filepath}")
-        return world, cam
     except (FileNotFoundError, IOError) as e:
         print(f"Error reading from {filepath}: {e}")
         return None, None
 
+    if ground_sphere is None:
+        world.objects.insert(0, Sphere(Point3(0.0, -1000.0, 0.0), 1000.0, ground_material))
+        ground_sphere = 0
+    # "ground plane" swaps the ground sphere for the plane touching its top
+    if ground == "plane":
+        sphere = world.objects[ground_sphere]
+        top = sphere.center + Vec3(0.0, sphere.radius, 0.0)
+        world.objects[ground_sphere] = Plane(top, Vec3(0.0, 1.0, 0.0), sphere.mat_index)
+    elif ground == "none":
+        del world.objects[ground_sphere]
+
+    if compiled:
+        try:
+            compiled_scene.save(filepath, signature, world, camera_lines)
+        except OSError as e:
+            print(f"Could not write {compiled_scene.compiled_path(filepath)}: {e}")
+    return world, cam
 
-def random_scene():
-    """Generate a random scene with many spheres"""
-    world = HittableList()
 
-    # Ground
-    ground_material = Lambertian(Color(0.5, 0.5, 0.5))
-    world.add(Sphere(Point3(0.0, -1000.0, 0.0), 1000.0, ground_material))
-
-    # Small random spheres
-    for a in range(-11, 11):
-        for b in range(-11, 11):
-            choose_mat = random_double()
-            center = Point3(a + 0.9 * random_double(), 0.2, b + 0.9 * random_double())
-
-            if (center - Point3(4.0, 0.2, 0.0)).length() > 0.9:
-                if choose_mat < 0.8:
-                    # Diffuse
-                    albedo = Color(
-                        random_double() * random_double(),
-                        random_double() * random_double(),
-                        random_double() * random_double(),
-                    )
-                    sphere_material = Lambertian(albedo)
-                    world.add(Sphere(center, 0.2, sphere_material))
-                elif choose_mat < 0.95:
-                    # Metal
-                    albedo = Color(
-                        0.5 * (1.0 + random_double()),
-                        0.5 * (1.0 + random_double()),
-                        0.5 * (1.0 + random_double()),
-                    )
-                    fuzz = 0.5 * random_double()
-                    sphere_material = Metal(albedo, fuzz)
-                    world.add(Sphere(center, 0.2, sphere_material))
-                else:
-                    # Glass
-                    sphere_material = Dielectric(1.5)
-                    world.add(Sphere(center, 0.2, sphere_material))
-
-    # Three larger spheres
-    material1 = Dielectric(1.5)
-    world.add(Sphere(Point3(0.0, 1.0, 0.0), 1.0, material1))
-
-    material2 = Lambertian(Color(0.4, 0.2, 0.1))
-    world.add(Sphere(Point3(-4.0, 1.0, 0.0), 1.0, material2))
-
-    material3 = Metal(Color(0.7, 0.6, 0.5), 0.0)
-    world.add(Sphere(Point3(4.0, 1.0, 0.0), 1.0, material3))
-
-    # After creating the random scene, also save it to a file
+def random_scene(seed=0):
+    """Generate the book cover scene (scene_gen.py) and save it to sphere_data.txt"""
+    scene = generate_scene(BOOK_SPHERES, seed)
     try:
-        with open("sphere_data.txt", "w", encoding="utf-8") as file:
-            # Small spheres
-            for a in range(-11, 11):
-                for b in range(-11, 11):
-                    choose_mat = random_double()
-                    center = Point3(
-                        a + 0.9 * random_double(), 0.2, b + 0.9 * random_double()
-                    )
-
-                    if (center - Point3(4.0, 0.2, 0.0)).length() > 0.9:
-                        if choose_mat < 0.8:
-                            # Diffuse
-                            albedo = Color(
-                                random_double() * random_double(),
-                                random_double() * random_double(),
-                                random_double() * random_double(),
-                            )
-                            file.write(
-                                f"{center.x()} {center.y()} {center.z()} 0.2 lambertian {albedo.x()} {albedo.y()} {albedo.z()}\n"
-                            )
-                        elif choose_mat < 0.95:
-                            # Metal
-                            albedo = Color(
-                                0.5 * (1.0 + random_double()),
-                                0.5 * (1.0 + random_double()),
-                                0.5 * (1.0 + random_double()),
-                            )
-                            fuzz = 0.5 * random_double()
-                            file.write(
-                                f"{center.x()} {center.y()} {center.z()} 0.2 metal {albedo.x()} {albedo.y()} {albedo.z()} {fuzz}\n"
-                            )
-                        else:
-                            # Glass
-                            file.write(
-                                f"{center.x()} {center.y()} {center.z()} 0.2 dielectric 1.5\n"
-                            )
-
-            # Large spheres
-            file.write("0.0 1.0 0.0 1.0 dielectric 1.5\n")
-            file.write("-4.0 1.0 0.0 1.0 lambertian 0.4 0.2 0.1\n")
-            file.write("4.0 1.0 0.0 1.0 metal 0.7 0.6 0.5 0.0\n")
+        scene.save("sphere_data.txt")
     except (IOError, OSError) as e:
         print(f"Error writing scene to file: {e}")
-
-    return world
+    return scene.world()
 
 
 def main():
@@ -198,6 +211,29 @@ def main():
     filepath = "sphere_data.txt"
     output_path = "cpp_spheres.ppm"
     num_threads = multiprocessing.cpu_count()
+    engine = "scalar"
+    accel = "bvh"
+    tile_size = 16
+    image_format = None
+    samples_per_pixel = None
+    progressive = False
+    pass_samples = 1
+    time_budget = 0.0
+    convergence_threshold = 0.0
+    adaptive = None
+    sampler_type = None
+    seed = None
+    collect_stats = False
+    frustum_cull = True
+    stats_json = None
+    heatmap_path = None
+    profile_path = None
+    checkpoint_path = None
+    checkpoint_interval = None
+    resume = False
+    coordinator_address = None
+    worker_address = None
+    spawn_workers = 0
 
     i = 1
     while i < len(sys.argv):
@@ -216,10 +252,184 @@ def main():
                 print(f"Error: Invalid number of cores specified: {e}")
                 sys.exit(1)
             i += 2
+        elif sys.argv[i] == "--engine" and i + 1 < len(sys.argv):
+            engine = sys.argv[i + 1]
+            if engine not in ("scalar", "batched", "wavefront"):
+                print(f"Error: Unknown engine: {engine} (expected scalar, batched or wavefront)")
+                sys.exit(1)
+            i += 2
+        elif sys.argv[i] == "--accel" and i + 1 < len(sys.argv):
+            accel = sys.argv[i + 1]
+            if accel not in ("bvh", "spheres", "list"):
+                print(f"Error: Unknown acceleration structure: {accel} (expected bvh, spheres or list)")
+                sys.exit(1)
+            i += 2
+        elif sys.argv[i] == "--tile-size" and i + 1 < len(sys.argv):
+            try:
+                tile_size = int(sys.argv[i + 1])
+                if tile_size <= 0:
+                    raise ValueError("Tile size must be positive")
+            except ValueError as e:
+                print(f"Error: Invalid tile size specified: {e}")
+                sys.exit(1)
+            i += 2
+        elif sys.argv[i] == "--format" and i + 1 < len(sys.argv):
+            image_format = sys.argv[i + 1].upper()
+            if image_format not in ("P3", "P6", "PFM", "PNG"):
+                print(f"Error: Unknown image format: {sys.argv[i + 1]} (expected p3, p6, pfm or png)")
+                sys.exit(1)
+            i += 2
+        elif sys.argv[i] == "--spp" and i + 1 < len(sys.argv):
+            try:
+                samples_per_pixel = int(sys.argv[i + 1])
+                if samples_per_pixel <= 0:
+                    raise ValueError("Samples per pixel must be positive")
+            except ValueError as e:
+                print(f"Error: Invalid samples per pixel specified: {e}")
+                sys.exit(1)
+            i += 2
+        elif sys.argv[i] == "--sampler" and i + 1 < len(sys.argv):
+            sampler_type = sys.argv[i + 1]
+            if sampler_type not in SAMPLERS:
+                print(f"Error: Unknown sampler: {sampler_type} (expected {', '.join(SAMPLERS)})")
+                sys.exit(1)
+            i += 2
+        elif sys.argv[i] == "--seed" and i + 1 < len(sys.argv):
+            try:
+                seed = int(sys.argv[i + 1])
+                if seed < 0:
+                    raise ValueError("Seed must not be negative")
+            except ValueError as e:
+                print(f"Error: Invalid seed specified: {e}")
+                sys.exit(1)
+            i += 2
+        elif sys.argv[i] == "--stats":
+            collect_stats = True
+            i += 1
+        elif sys.argv[i] == "--stats-json" and i + 1 < len(sys.argv):
+            stats_json = sys.argv[i + 1]
+            collect_stats = True
+            i += 2
+        elif sys.argv[i] == "--heatmap" and i + 1 < len(sys.argv):
+            heatmap_path = sys.argv[i + 1]
+            collect_stats = True
+            i += 2
+        elif sys.argv[i] == "--profile" and i + 1 < len(sys.argv):
+            profile_path = sys.argv[i + 1]
+            i += 2
+        elif sys.argv[i] in ("--checkpoint", "--resume") and i + 1 < len(sys.argv):
+            checkpoint_path = sys.argv[i + 1]
+            resume = resume or sys.argv[i] == "--resume"
+            i += 2
+        elif sys.argv[i] == "--checkpoint-interval" and i + 1 < len(sys.argv):
+            try:
+                checkpoint_interval = float(sys.argv[i + 1])
+                if checkpoint_interval <= 0.0:
+                    raise ValueError("Checkpoint interval must be positive")
+            except ValueError as e:
+                print(f"Error: Invalid checkpoint interval specified: {e}")
+                sys.exit(1)
+            i += 2
+        elif sys.argv[i] in ("--worker", "--coordinator") and i + 1 < len(sys.argv):
+            try:
+                address = parse_address(sys.argv[i + 1])
+            except ValueError as e:
+                print(f"Error: Invalid address specified: {e}")
+                sys.exit(1)
+            if sys.argv[i] == "--worker":
+                worker_address = address
+            else:
+                coordinator_address = address
+            i += 2
+        elif sys.argv[i] == "--spawn-workers" and i + 1 < len(sys.argv):
+            try:
+                spawn_workers = int(sys.argv[i + 1])
+                if spawn_workers < 0:
+                    raise ValueError("Worker count must not be negative")
+            except ValueError as e:
+                print(f"Error: Invalid worker count specified: {e}")
+                sys.exit(1)
+            i += 2
+        elif sys.argv[i] == "--adaptive":
+            adaptive = True
+            i += 1
+        elif sys.argv[i] == "--fixed":
+            adaptive = False
+            i += 1
+        elif sys.argv[i] == "--no-cull":
+            frustum_cull = False
+            i += 1
+        elif sys.argv[i] == "--progressive":
+            progressive = True
+            i += 1
+        elif sys.argv[i] == "--pass-spp" and i + 1 < len(sys.argv):
+            try:
+                pass_samples = int(sys.argv[i + 1])
+                if pass_samples <= 0:
+                    raise ValueError("Samples per pass must be positive")
+            except ValueError as e:
+                print(f"Error: Invalid samples per pass specified: {e}")
+                sys.exit(1)
+            progressive = True
+            i += 2
+        elif sys.argv[i] == "--time" and i + 1 < len(sys.argv):
+            try:
+                time_budget = float(sys.argv[i + 1])
+                if time_budget <= 0.0:
+                    raise ValueError("Time budget must be positive")
+            except ValueError as e:
+                print(f"Error: Invalid time budget specified: {e}")
+                sys.exit(1)
+            progressive = True
+            i += 2
+        elif sys.argv[i] == "--converge" and i + 1 < len(sys.argv):
+            try:
+                convergence_threshold = float(sys.argv[i + 1])
+                if convergence_threshold <= 0.0:
+                    raise ValueError("Convergence threshold must be positive")
+            except ValueError as e:
+                print(f"Error: Invalid convergence threshold specified: {e}")
+                sys.exit(1)
+            progressive = True
+            i += 2
         elif sys.argv[i] == "--help" or sys.argv[i] == "-h":
             print(f"Usage: {sys.argv[0]} [--path <sphere_data_path>] [--output <output_ppm_path>]")
+            print("       [--cores <n>] [--engine scalar|batched|wavefront] [--accel bvh|spheres|list]")
+            print("       [--tile-size <pixels>] [--format p3|p6|pfm|png] [--spp <n>]")
+            print("       [--progressive] [--pass-spp <n>] [--time <seconds>] [--converge <threshold>]")
+            print("       [--adaptive | --fixed] [--no-cull] [--sampler independent|stratified|halton|sobol]")
+            print("       [--seed <n>] [--stats] [--stats-json <path>] [--heatmap <image_path>]")
+            print("       [--profile <pstats_path>] [--checkpoint <path> | --resume <path>]")
+            print("       [--checkpoint-interval <seconds>] [--coordinator <host:port>]")
+            print("       [--spawn-workers <n>] [--worker <host:port>]")
             print(f"Default sphere data path: {filepath}")
+            print("A scene file is compiled to <name>.rtscene next to it on first load; later loads map")
+            print("that file while the scene file is unchanged (delete it to force a fresh parse)")
+            print("Besides spheres (x y z radius <material>), scene lines can add planes and disks:")
+            print("plane x y z nx ny nz <material> and disk x y z nx ny nz radius <material>; the")
+            print("ground sphere (the file's own, or a default one at y = -1000) is replaced by the plane")
+            print("touching its top with ground plane, or left out with ground none")
             print("Default output: stdout")
+            print("Output format: from the --output extension (.ppm -> P6, .pfm, .png) unless --format is given")
+            print("The batched engine traces a tile's samples a bounce at a time and shades the hits in")
+            print("one batch per material type; its images are the same as the scalar engine's")
+            print("Progressive mode renders passes of --pass-spp samples until --spp (the scene's")
+            print("samples per pixel by default), the --time budget or the --converge threshold")
+            print("(relative RMS change between passes) is reached, rewriting the output after each pass")
+            print("Adaptive sampling is enabled by --adaptive or the scene's c minSamples, c maxSamples")
+            print("and c adaptiveThreshold lines; --fixed takes samplesPerPixel in every pixel")
+            print("Renders with the same --seed (default 0) are identical for any core count and tile size")
+            print("Camera rays only test the objects in view of their tile (with the bvh and list")
+            print("accelerators); --no-cull traces them against the whole scene, with the same image")
+            print("--stats counts rays, path lengths, bounces per material and time per phase and prints")
+            print("a summary; --stats-json also writes it as JSON and --heatmap an image of the time per tile")
+            print("--profile profiles the tiles in every worker process and writes the merged pstats file")
+            print("plus collapsed stacks for flamegraph tools next to it (<name>.folded)")
+            print("--checkpoint saves the running render every --checkpoint-interval seconds (default 60)")
+            print("and at the end; --resume does the same and first continues the checkpoint if it exists,")
+            print("with any core count, or adds samples to a finished render when given a higher --spp")
+            print("--coordinator renders on the worker nodes that connect to it (started with --worker")
+            print("<coordinator host:port> and --cores); --spawn-workers starts n local workers for testing")
             return
         else:
             print(f"Error: Unknown argument: {sys.argv[i]}")
@@ -227,6 +437,23 @@ def main():
             sys.exit(1)
             i += 1
 
+    if worker_address is not None:
+        # Everything else comes from the coordinator
+        run_worker(worker_address, num_threads)
+        return
+
+    if coordinator_address is not None:
+        local_only = [
+            flag for flag, given in (
+                ("--stats/--stats-json/--heatmap", collect_stats),
+                ("--profile", profile_path is not None),
+                ("--checkpoint/--resume", checkpoint_path is not None),
+            ) if given
+        ]
+        if local_only:
+            print(f"Error: --coordinator cannot be used with {', '.join(local_only)}; they are local-only")
+            sys.exit(1)
+
     # Default camera setup
     cam = Camera()
 
@@ -252,25 +479,111 @@ def main():
         print(
             f"File {filepath} not found or error loading. Generating random scene instead."
         )
-        world = random_scene()
+        world = random_scene(seed if seed is not None else 0)
+
+    cam.tile_size = tile_size
+    if samples_per_pixel is not None:
+        cam.samples_per_pixel = samples_per_pixel
+    cam.progressive = progressive
+    cam.pass_samples = pass_samples
+    cam.time_budget = time_budget
+    cam.convergence_threshold = convergence_threshold
+    if adaptive is not None:
+        cam.adaptive = adaptive
+    if sampler_type is not None:
+        cam.sampler_type = sampler_type
+    if seed is not None:
+        cam.seed = seed
+    cam.collect_stats = collect_stats
+    cam.frustum_cull = frustum_cull
+    cam.profile = profile_path is not None
+    cam.checkpoint_path = checkpoint_path
+    cam.resume = resume
+    if checkpoint_interval is not None:
+        cam.checkpoint_interval = checkpoint_interval
+    if cam.adaptive and (progressive or engine != "scalar"):
+        print("Adaptive sampling needs the scalar engine without progressive passes; using fixed sampling")
+        cam.adaptive = False
+    if engine == "wavefront" and cam.sampler_type != "independent":
+        print(f"The wavefront engine only draws independent samples; ignoring the {cam.sampler_type} sampler")
+        cam.sampler_type = "independent"
+    if cam.adaptive and cam.samples_per_pixel < 2:
+        print("Adaptive sampling needs at least 2 samples per pixel; using fixed sampling")
+        cam.adaptive = False
+
+    if engine == "wavefront" or accel == "spheres":
+        try:
+            import numpy  # noqa: F401
+        except ImportError:
+            print("Error: the wavefront engine and the spheres accelerator require NumPy (pip install numpy)")
+            sys.exit(1)
+        if not isinstance(world.objects, compiled_scene.PackedSpheres) and not all(
+            isinstance(obj, Sphere) for obj in world.objects
+        ):
+            print("Error: the wavefront engine and the spheres accelerator only support spheres")
+            sys.exit(1)
 
-    # Determine the output file or stdout
-    output_file = sys.stdout
+    if accel == "bvh":
+        # Replace the linear object list with a bounding volume hierarchy
+        world = BVH(world)
+        print(world.build_summary())
+        cam.initialize()
+        print(world.traversal_summary(
+            cam.get_ray(i, j)
+            for j in range(0, cam.image_height, 8)
+            for i in range(0, cam.image_width, 8)
+        ))
+    elif accel == "spheres":
+        from sphere_set import SphereSet
+
+        world = SphereSet(world)
+        print(f"SphereSet: {len(world.objects)} spheres, {len(world.palette)} materials")
+
+    if image_format is None:
+        image_format = format_for_path(output_path) if output_path else "P6"
+
+    # Determine the output file or stdout; only P3 is written as text
+    text_output = image_format == "P3"
+    output_file = sys.stdout if text_output else sys.stdout.buffer
     if output_path:
         try:
-            output_file = open(output_path, 'w')
+            output_file = open(output_path, 'w' if text_output else 'wb')
         except IOError as e:
             print(f"Error: Could not open output file {output_path}: {e}")
             sys.exit(1)
 
     try:
         # Render the scene
-        cam.render(world, output_file, num_threads)
+        if coordinator_address is not None:
+            render_distributed(
+                cam, world, output_file, engine, image_format, coordinator_address, spawn_workers
+            )
+        else:
+            cam.render(world, output_file, num_threads, engine, image_format)
+            if cam.first_pixel_time is not None:
+                print(f"Startup to first pixel: {cam.first_pixel_time - process_start_time():.3f}s")
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
     finally:
         # Close the output file if it's not stdout
-        if output_file != sys.stdout:
+        if output_path:
             output_file.close()
 
+    if stats_json:
+        cam.stats.write_json(stats_json)
+        print(f"Statistics written to {stats_json}")
+    if heatmap_path:
+        heatmap_format = format_for_path(heatmap_path)
+        heatmap = cam.stats.heatmap(cam.image_width, cam.image_height)
+        with open(heatmap_path, 'w' if heatmap_format == "P3" else 'wb') as f:
+            heatmap.write_to(f, heatmap_format)
+        print(f"Tile cost heatmap written to {heatmap_path}")
+    if profile_path:
+        print(cam.profiler.summary())
+        folded = cam.profiler.write(profile_path)
+        print(f"Profile written to {profile_path}, collapsed stacks to {folded}")
+
 
 if __name__ == "__main__":
     main()
@@ -1,21 +1,82 @@
-import random
 import math
 from ray import Ray
-from vec3 import dot, random_unit_vector, reflect, refract, unit_vector, Color
+from vec3 import dot, reflect, refract, sphere_from_square, unit_vector, Color
 
 
 class Material:
-    def scatter(self, r_in, rec):
-        """Returns (scatter_happened, attenuation, scattered_ray)"""
+    def scatter(self, r_in, rec, sampler):
+        """Returns (scatter_happened, attenuation, scattered_ray), drawing
+        random numbers from the sampler's current pixel sample"""
         pass
 
+    @classmethod
+    def scatter_batch(cls, mats, rays, recs, states, sampler, dim):
+        """scatter for a batch of hits on materials of this class: the k-th
+        hit is recs[k] on mats[k] by rays[k], and draws its random numbers
+        from the sample saved as states[k] (Sampler.state), from dimension
+        dim on. Returns the lists (scatter_happened, attenuation, scattered)."""
+        happened, attenuations, scattered = [], [], []
+        for mat, r_in, rec, state in zip(mats, rays, recs, states):
+            sampler.resume(state, dim)
+            ok, attenuation, r = mat.scatter(r_in, rec, sampler)
+            happened.append(ok)
+            attenuations.append(attenuation)
+            scattered.append(r)
+        return happened, attenuations, scattered
+
+    def key(self):
+        """Tuple of the material's values; materials with equal keys are
+        interchangeable"""
+        pass
+
+    def __eq__(self, other):
+        return isinstance(other, Material) and self.key() == other.key()
+
+    def __hash__(self):
+        return hash(self.key())
+
+
+class MaterialPalette:
+    """The distinct materials of a scene. Objects refer to a material by
+    its index here (and hits report it in HitRecord.mat_index), so equal
+    materials are stored, pickled and set up once."""
+
+    def __init__(self):
+        self.materials = []
+        self.indices = {}
+
+    def __getstate__(self):
+        return self.materials
+
+    def __setstate__(self, materials):
+        self.materials = materials
+        self.indices = {mat: k for k, mat in enumerate(materials)}
+
+    def add(self, mat):
+        """Index of mat, or of the equal material already in the palette"""
+        k = self.indices.get(mat)
+        if k is None:
+            k = self.indices[mat] = len(self.materials)
+            self.materials.append(mat)
+        return k
+
+    def __getitem__(self, k):
+        return self.materials[k]
+
+    def __len__(self):
+        return len(self.materials)
+
 
 class Lambertian(Material):
     def __init__(self, albedo):
         self.albedo = albedo
 
-    def scatter(self, r_in, rec):
-        scatter_direction = rec.normal + random_unit_vector()
+    def key(self):
+        return ("Lambertian", self.albedo.x(), self.albedo.y(), self.albedo.z())
+
+    def scatter(self, r_in, rec, sampler):
+        scatter_direction = sphere_from_square(*sampler.next_2d())
+        scatter_direction += rec.normal
 
         # Catch degenerate scatter direction
         if scatter_direction.near_zero():
@@ -24,39 +85,87 @@ class Lambertian(Material):
         scattered = Ray(rec.p, scatter_direction)
         return True, self.albedo, scattered
 
+    @classmethod
+    def scatter_batch(cls, mats, rays, recs, states, sampler, dim):
+        resume = sampler.resume
+        next_2d = sampler.next_2d
+        scattered = []
+        for rec, state in zip(recs, states):
+            resume(state, dim)
+            direction = sphere_from_square(*next_2d())
+            direction += rec.normal
+            if direction.near_zero():
+                direction = rec.normal
+            scattered.append(Ray(rec.p, direction))
+        return [True] * len(scattered), [mat.albedo for mat in mats], scattered
+
 
 class Metal(Material):
     def __init__(self, albedo, fuzz=0.0):
         self.albedo = albedo
         self.fuzz = min(fuzz, 1.0)
 
-    def scatter(self, r_in: Ray, rec):
+    def key(self):
+        return ("Metal", self.albedo.x(), self.albedo.y(), self.albedo.z(), self.fuzz)
+
+    def scatter(self, r_in: Ray, rec, sampler):
         reflected = reflect(r_in.direction, rec.normal)
-        scattered = Ray(rec.p, unit_vector(reflected) + random_unit_vector() * self.fuzz)
+        direction = unit_vector(reflected).add_scaled(
+            sphere_from_square(*sampler.next_2d()), self.fuzz
+        )
+        scattered = Ray(rec.p, direction)
         scatter_happened = dot(scattered.direction, rec.normal) > 0
         return scatter_happened, self.albedo, scattered
 
+    @classmethod
+    def scatter_batch(cls, mats, rays, recs, states, sampler, dim):
+        resume = sampler.resume
+        next_2d = sampler.next_2d
+        happened, scattered = [], []
+        for mat, r_in, rec, state in zip(mats, rays, recs, states):
+            resume(state, dim)
+            direction = unit_vector(reflect(r_in.direction, rec.normal)).add_scaled(
+                sphere_from_square(*next_2d()), mat.fuzz
+            )
+            happened.append(dot(direction, rec.normal) > 0)
+            scattered.append(Ray(rec.p, direction))
+        return happened, [mat.albedo for mat in mats], scattered
+
 
 class Dielectric(Material):
     def __init__(self, index_of_refraction):
         self.ir = index_of_refraction
+        # Per-side constants: entering the surface and leaving it
+        self.front_ratio = 1.0 / index_of_refraction
+        self.front_r0 = self.schlick_r0(self.front_ratio)
+        self.back_r0 = self.schlick_r0(index_of_refraction)
 
-    def reflectance(self, cosine, ref_idx):
-        """Use Schlick's approximation for reflectance"""
+    def key(self):
+        return ("Dielectric", self.ir)
+
+    @staticmethod
+    def schlick_r0(ref_idx):
+        """Reflectance at normal incidence"""
         r0 = (1.0 - ref_idx) / (1.0 + ref_idx)
-        r0 = r0 * r0
+        return r0 * r0
+
+    def reflectance(self, cosine, r0):
+        """Use Schlick's approximation for reflectance"""
         return r0 + (1.0 - r0) * ((1.0 - cosine) ** 5)
 
-    def scatter(self, r_in, rec):
+    def scatter(self, r_in, rec, sampler):
         attenuation = Color(1.0, 1.0, 1.0)
-        refraction_ratio = 1.0 / self.ir if rec.front_face else self.ir
+        if rec.front_face:
+            refraction_ratio, r0 = self.front_ratio, self.front_r0
+        else:
+            refraction_ratio, r0 = self.ir, self.back_r0
 
         unit_direction = unit_vector(r_in.direction)
         cos_theta = min(dot(-unit_direction, rec.normal), 1.0)
         sin_theta = math.sqrt(1.0 - cos_theta * cos_theta)
 
         cannot_refract = refraction_ratio * sin_theta > 1.0
-        will_reflect = self.reflectance(cos_theta, refraction_ratio) > random.random()
+        will_reflect = self.reflectance(cos_theta, r0) > sampler.next_1d()
 
         if cannot_refract or will_reflect:
             direction = reflect(unit_direction, rec.normal)
@@ -65,3 +174,27 @@ class Dielectric(Material):
 
         scattered = Ray(rec.p, direction)
         return True, attenuation, scattered
+
+    @classmethod
+    def scatter_batch(cls, mats, rays, recs, states, sampler, dim):
+        resume = sampler.resume
+        next_1d = sampler.next_1d
+        sqrt = math.sqrt
+        attenuations, scattered = [], []
+        for mat, r_in, rec, state in zip(mats, rays, recs, states):
+            resume(state, dim)
+            if rec.front_face:
+                refraction_ratio, r0 = mat.front_ratio, mat.front_r0
+            else:
+                refraction_ratio, r0 = mat.ir, mat.back_r0
+            unit_direction = unit_vector(r_in.direction)
+            cos_theta = min(dot(-unit_direction, rec.normal), 1.0)
+            sin_theta = sqrt(1.0 - cos_theta * cos_theta)
+            will_reflect = r0 + (1.0 - r0) * ((1.0 - cos_theta) ** 5) > next_1d()
+            if refraction_ratio * sin_theta > 1.0 or will_reflect:
+                direction = reflect(unit_direction, rec.normal)
+            else:
+                direction = refract(unit_direction, rec.normal, refraction_ratio)
+            attenuations.append(Color(1.0, 1.0, 1.0))
+            scattered.append(Ray(rec.p, direction))
+        return [True] * len(scattered), attenuations, scattered
@@ -0,0 +1,142 @@
+"""Profiles of the tile work of every render process.
+
+Profiling main.py with cProfile only shows the parent process waiting on
+futures, since the tiles are rendered in pool workers. With
+Camera.profile set, every tile task runs under a TileProfiler in the
+process that renders it:
+
+    cProfile    deterministic per-function counts and times
+    SIGPROF     a sampler that records the Python stack every millisecond
+                of CPU time (Unix, main thread only), giving real call
+                stacks that cProfile's caller/callee pairs cannot rebuild
+
+The results travel back with the tile and RenderProfile merges them in the
+parent into one pstats file (for pstats, snakeviz, gprof2dot, ...) and one
+file of collapsed stacks, "frame;frame;frame count" per line, for
+flamegraph.pl, speedscope or inferno.
+"""
+import cProfile
+import os
+import pstats
+import signal
+import sys
+import threading
+from collections import Counter
+
+# Seconds of CPU time between stack samples
+SAMPLE_INTERVAL = 0.001
+
+
+def _frame_name(code):
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class TileProfiler:
+    """Profile the work done inside a with block; see result()"""
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.profile = cProfile.Profile()
+        self.stacks = Counter()
+        self.root = None
+        # Signals can only be handled in the main thread
+        self.sampling = (
+            hasattr(signal, "setitimer") and threading.current_thread() is threading.main_thread()
+        )
+
+    def _sample(self, signum, frame):
+        names = []
+        while frame is not None:
+            names.append(_frame_name(frame.f_code))
+            if frame is self.root:
+                break
+            frame = frame.f_back
+        names.reverse()
+        self.stacks[";".join(names)] += 1
+
+    def __enter__(self):
+        # Stacks are cut at the frame that entered the profiler
+        self.root = sys._getframe(1)
+        if self.sampling:
+            self.previous_handler = signal.signal(signal.SIGPROF, self._sample)
+            signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+        self.profile.enable()
+        return self
+
+    def __exit__(self, *exc):
+        self.profile.disable()
+        if self.sampling:
+            signal.setitimer(signal.ITIMER_PROF, 0.0)
+            signal.signal(signal.SIGPROF, self.previous_handler)
+        self.root = None
+        return False
+
+    def result(self):
+        """(pstats table, stack sample counts) of the profiled work"""
+        self.profile.create_stats()
+        return self.profile.stats, dict(self.stacks)
+
+
+class _Table:
+    """A raw pstats table in the shape pstats.Stats loads from"""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+class RenderProfile:
+    """Profiles of all tiles of a render, merged"""
+
+    def __init__(self):
+        self.stats = None
+        self.stacks = Counter()
+        self.tiles = 0
+
+    def add(self, table, stacks):
+        if self.stats is None:
+            self.stats = pstats.Stats(_Table(table))
+        else:
+            self.stats.add(_Table(table))
+        self.stacks.update(stacks)
+        self.tiles += 1
+
+    def write(self, path):
+        """Write the pstats file to path and the collapsed stacks next to it
+        with a .folded extension; returns the second path"""
+        folded = os.path.splitext(path)[0] + ".folded"
+        if self.stats is not None:
+            self.stats.dump_stats(path)
+        with open(folded, "w", encoding="utf-8") as f:
+            for stack, count in sorted(self.stacks.items()):
+                f.write(f"{stack} {count}\n")
+        return folded
+
+    def summary(self, limit=15):
+        """The functions with the most own time, as text"""
+        if self.stats is None:
+            return "Profile: no tiles were profiled"
+        width = 0
+        rows = []
+        for (filename, line, name), (_, calls, own, cumulative, _) in sorted(
+            self.stats.stats.items(), key=lambda item: item[1][2], reverse=True
+        )[:limit]:
+            label = f"{name} ({os.path.basename(filename)}:{line})"
+            width = max(width, len(label))
+            rows.append((label, calls, own, cumulative))
+
+        total = max(1e-12, self.stats.total_tt)
+        lines = [
+            f"Profile of {self.tiles} tiles, {total:.2f}s in profiled functions, "
+            f"{sum(self.stacks.values())} stack samples:"
+        ]
+        lines.append(f"  {'function':<{width}} {'calls':>10} {'own':>9} {'own%':>6} {'cumulative':>10}")
+        for label, calls, own, cumulative in rows:
+            lines.append(
+                f"  {label:<{width}} {calls:>10,} {own:>8.3f}s {100.0 * own / total:>5.1f}% "
+                f"{cumulative:>9.3f}s"
+            )
+        return "\n".join(lines)
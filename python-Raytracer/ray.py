@@ -1,5 +1,5 @@
 
-from vec3 import Vec3
+from vec3 import Vec3, fma
 
 class Ray:
     def __init__(self, origin: Vec3, direction: Vec3):
@@ -7,4 +7,4 @@ class Ray:
         self.direction = direction
 
     def at(self, t):
-        return self.origin + self.direction * t
+        return fma(self.origin, self.direction, t)
@@ -0,0 +1,62 @@
+"""Counter-based random numbers.
+
+Every camera sample owns a random stream whose key is a hash of the render
+seed, the pixel index and the sample index; the n-th number of the stream
+is a hash of the key and n. Nothing is carried from one draw to the next,
+so a pixel's samples come out the same whichever process renders them, in
+whatever order and inside whatever tile, and renders with the same seed are
+bit-identical across core counts, scheduling and tile sizes.
+
+The hash is the SplitMix64 finalizer, which passes BigCrush as a counter
+based generator. uniform() is the scalar form for the per-ray path;
+uniform_array() computes the same numbers for NumPy arrays of keys.
+"""
+try:
+    import numpy as np
+except ImportError:  # only the batched draws need NumPy
+    np = None
+
+MASK64 = 0xFFFFFFFFFFFFFFFF
+GOLDEN = 0x9E3779B97F4A7C15
+MIX1 = 0xBF58476D1CE4E5B9
+MIX2 = 0x94D049BB133111EB
+INV_2_53 = 1.0 / 9007199254740992.0
+
+
+def mix64(z):
+    """SplitMix64 finalizer: a bijective 64-bit integer hash"""
+    z = ((z ^ (z >> 30)) * MIX1) & MASK64
+    z = ((z ^ (z >> 27)) * MIX2) & MASK64
+    return z ^ (z >> 31)
+
+
+def stream_key(seed, pixel, index):
+    """Key of the random stream of sample index of a pixel"""
+    key = mix64((seed * GOLDEN + pixel) & MASK64)
+    return mix64((key + index * GOLDEN) & MASK64)
+
+
+def uniform(key, counter):
+    """The counter-th double in [0, 1) of the stream with the given key"""
+    return (mix64((key + (counter + 1) * GOLDEN) & MASK64) >> 11) * INV_2_53
+
+
+def _mix64_array(z):
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(MIX1)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(MIX2)
+    return z ^ (z >> np.uint64(31))
+
+
+def stream_key_array(seed, pixel, index):
+    """stream_key for arrays of pixel and sample indices, as uint64"""
+    pixel = np.asarray(pixel).astype(np.uint64)
+    index = np.asarray(index).astype(np.uint64)
+    base = np.uint64((seed * GOLDEN) & MASK64)
+    key = _mix64_array(base + pixel)
+    return _mix64_array(key + index * np.uint64(GOLDEN))
+
+
+def uniform_array(keys, counter):
+    """uniform(key, counter) for a uint64 array of keys"""
+    offset = np.uint64(((counter + 1) * GOLDEN) & MASK64)
+    return (_mix64_array(keys + offset) >> np.uint64(11)).astype(np.float64) * INV_2_53
@@ -0,0 +1,274 @@
+"""Sample generators for camera, lens and scatter sampling.
+
+A sampler hands out the random numbers of one camera sample as a stream of
+dimensions: the pixel offset, the lens position and then the scatter
+decisions of every bounce. Camera.render_tile calls start(pixel, index)
+before every camera sample, so each sampler can place the index-th sample
+of a pixel where it fits best with the others:
+
+    independent  uniform draws, independent of each other
+    stratified   jittered strata, n x n for 2D draws and one per sample
+                 for 1D draws, visited in a per-pixel random order
+    halton       radical inverses in successive prime bases, rotated by a
+                 per-pixel random offset (Cranley-Patterson)
+    sobol        the first two Sobol dimensions with hash-based Owen
+                 scrambling and index shuffling (Burley 2020), a fresh
+                 scramble for every pair of dimensions
+
+Sample indices keep counting across progressive passes and adaptive rounds,
+so later samples fill the gaps left by the earlier ones instead of
+repeating them. All draws, including the jitter and the independent ones,
+come from the counter-based streams of rng.py keyed by seed, pixel, sample
+index and dimension, so they do not depend on which process renders the
+pixel.
+"""
+from rng import stream_key, uniform
+
+MASK = 0xFFFFFFFF
+INV_2_32 = 1.0 / 4294967296.0
+ONE_MINUS_EPSILON = 1.0 - 2.0**-53
+
+SAMPLERS = ("independent", "stratified", "halton", "sobol")
+
+# Dimension layout of a camera sample: pixel offset (2D) and lens (2D), then
+# per bounce the scatter direction (2D, or 1D for dielectrics) and roulette
+CAMERA_DIMS = 4
+BOUNCE_DIMS = 3
+
+
+def _mix32(x):
+    """Integer hash of a 32-bit value (lowbias32)"""
+    x ^= x >> 16
+    x = (x * 0x7FEB352D) & MASK
+    x ^= x >> 15
+    x = (x * 0x846CA68B) & MASK
+    x ^= x >> 16
+    return x
+
+
+def hash_values(*values):
+    """32-bit hash of a few non-negative integers"""
+    h = 0x9E3779B9
+    for v in values:
+        h = _mix32(h ^ _mix32(v & MASK))
+    return h
+
+
+def _primes(count):
+    primes = []
+    n = 2
+    while len(primes) < count:
+        if all(n % p for p in primes if p * p <= n):
+            primes.append(n)
+        n += 1
+    return primes
+
+
+# Halton bases; dimensions past the table are padded with independent draws
+PRIMES = _primes(64)
+
+_BYTE_REVERSE = bytes(int(f"{b:08b}"[::-1], 2) for b in range(256))
+
+
+def _reverse_bits(x):
+    return (
+        (_BYTE_REVERSE[x & 0xFF] << 24)
+        | (_BYTE_REVERSE[(x >> 8) & 0xFF] << 16)
+        | (_BYTE_REVERSE[(x >> 16) & 0xFF] << 8)
+        | _BYTE_REVERSE[x >> 24]
+    )
+
+
+# Direction numbers of the second Sobol dimension (the first one is the
+# bit-reversed index): row k of Pascal's triangle mod 2, MSB first
+_SOBOL_1 = [1 << 31]
+for _ in range(31):
+    _SOBOL_1.append(_SOBOL_1[-1] ^ (_SOBOL_1[-1] >> 1))
+
+
+def _sobol_1(index):
+    x = 0
+    bit = 0
+    while index:
+        if index & 1:
+            x ^= _SOBOL_1[bit]
+        index >>= 1
+        bit += 1
+    return x
+
+
+def _laine_karras(x, seed):
+    """Scramble that only mixes bits into higher ones (Laine-Karras)"""
+    x = (x + seed) & MASK
+    x ^= (x * 0x6C50B47C) & MASK
+    x ^= (x * 0xB82F1E52) & MASK
+    x ^= (x * 0xC7AFE638) & MASK
+    x ^= (x * 0x8D22F6E6) & MASK
+    return x
+
+
+def _owen_scramble(x, seed):
+    """Nested uniform (Owen) scramble of a 32-bit fixed-point value"""
+    return _reverse_bits(_laine_karras(_reverse_bits(x), seed))
+
+
+def _permutation_element(i, n, seed):
+    """Element i of a random permutation of range(n) chosen by seed (Kensler)"""
+    w = n - 1
+    w |= w >> 1
+    w |= w >> 2
+    w |= w >> 4
+    w |= w >> 8
+    w |= w >> 16
+    while True:
+        i ^= seed
+        i = (i * 0xE170893D) & MASK
+        i ^= seed >> 16
+        i ^= (i & w) >> 4
+        i ^= seed >> 8
+        i = (i * 0x0929EB3F) & MASK
+        i ^= seed >> 23
+        i ^= (i & w) >> 1
+        i = (i * (1 | seed >> 27)) & MASK
+        i = (i * 0x6935FA69) & MASK
+        i ^= (i & w) >> 11
+        i = (i * 0x74DCB303) & MASK
+        i ^= (i & w) >> 2
+        i = (i * 0x9E501CC3) & MASK
+        i ^= (i & w) >> 2
+        i = (i * 0xC860A3DF) & MASK
+        i &= w
+        i ^= i >> 5
+        if i < n:
+            return (i + seed) % n
+
+
+def _radical_inverse(base, index):
+    inv_base = 1.0 / base
+    inv = inv_base
+    value = 0.0
+    while index:
+        index, digit = divmod(index, base)
+        value += digit * inv
+        inv *= inv_base
+    return min(value, ONE_MINUS_EPSILON)
+
+
+class Sampler:
+    """Independent uniform samples; base class of the other samplers"""
+
+    name = "independent"
+
+    def __init__(self, samples_per_pixel, seed=0):
+        self.samples_per_pixel = samples_per_pixel
+        self.seed = seed
+        self.start(0, 0)
+
+    def start(self, pixel, index):
+        """Begin sample number index of the given pixel (j * width + i)"""
+        self.pixel = pixel
+        self.index = index
+        self.key = stream_key(self.seed, pixel, index)
+        self.dim = 0
+
+    def state(self):
+        """The current pixel sample, to come back to with resume"""
+        return self.pixel, self.index, self.key
+
+    def resume(self, state, dim):
+        """Continue a pixel sample saved by state() at dimension dim; the
+        same as start(pixel, index) without hashing the stream key again"""
+        self.pixel, self.index, self.key = state
+        self.dim = dim
+
+    def next_1d(self):
+        u = uniform(self.key, self.dim)
+        self.dim += 1
+        return u
+
+    def next_2d(self):
+        dim = self.dim
+        self.dim += 2
+        return uniform(self.key, dim), uniform(self.key, dim + 1)
+
+
+class StratifiedSampler(Sampler):
+    name = "stratified"
+
+    def __init__(self, samples_per_pixel, seed=0):
+        super().__init__(samples_per_pixel, seed)
+        self.grid = max(1, int(samples_per_pixel**0.5))
+        self.cells = self.grid * self.grid
+
+    def next_1d(self):
+        strata = max(1, self.samples_per_pixel)
+        round_, k = divmod(self.index, strata)
+        stratum = _permutation_element(
+            k, strata, hash_values(self.pixel, self.dim, round_, self.seed)
+        )
+        jitter = uniform(self.key, self.dim)
+        self.dim += 1
+        return (stratum + jitter) / strata
+
+    def next_2d(self):
+        round_, k = divmod(self.index, self.cells)
+        dim = self.dim
+        cell = _permutation_element(
+            k, self.cells, hash_values(self.pixel, dim, round_, self.seed)
+        )
+        self.dim += 2
+        y, x = divmod(cell, self.grid)
+        return (
+            (x + uniform(self.key, dim)) / self.grid,
+            (y + uniform(self.key, dim + 1)) / self.grid,
+        )
+
+
+class HaltonSampler(Sampler):
+    name = "halton"
+
+    def next_1d(self):
+        dim = self.dim
+        self.dim += 1
+        if dim >= len(PRIMES):
+            return uniform(self.key, dim)
+        offset = hash_values(self.pixel, dim, self.seed) * INV_2_32
+        value = _radical_inverse(PRIMES[dim], self.index) + offset
+        return value - 1.0 if value >= 1.0 else value
+
+    def next_2d(self):
+        return self.next_1d(), self.next_1d()
+
+
+class SobolSampler(Sampler):
+    name = "sobol"
+
+    def _pair(self):
+        seed = hash_values(self.pixel, self.dim, self.seed)
+        index = _owen_scramble(self.index & MASK, seed)
+        x = _owen_scramble(_reverse_bits(index), hash_values(seed, 0))
+        y = _owen_scramble(_sobol_1(index), hash_values(seed, 1))
+        return x * INV_2_32, y * INV_2_32
+
+    def next_1d(self):
+        x, _ = self._pair()
+        self.dim += 1
+        return x
+
+    def next_2d(self):
+        point = self._pair()
+        self.dim += 2
+        return point
+
+
+def make_sampler(name, samples_per_pixel, seed=0):
+    """Build a sampler by name (one of SAMPLERS)"""
+    if name == "independent":
+        return Sampler(samples_per_pixel, seed)
+    if name == "stratified":
+        return StratifiedSampler(samples_per_pixel, seed)
+    if name == "halton":
+        return HaltonSampler(samples_per_pixel, seed)
+    if name == "sobol":
+        return SobolSampler(samples_per_pixel, seed)
+    raise ValueError(f"Unknown sampler: {name}")
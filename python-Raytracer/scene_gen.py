@@ -0,0 +1,261 @@
+"""Seeded procedural sphere scenes of any size, for stress tests.
+
+The scenes follow the book cover scene that main.random_scene renders:
+small spheres of radius 0.2 with a mix of diffuse, metal and glass
+materials around three large spheres, on the ground sphere. The small
+spheres are placed
+
+    grid        one per unit cell of a square grid, jittered
+    uniform     uniformly over a square
+    clustered   in gaussian clusters of about CLUSTER_SIZE spheres
+
+over an area that grows with the count, so the density stays that of the
+book scene and 22 x 22 grid spheres reproduce it. The camera backs off as
+the scene grows. Random numbers are drawn a batch of BATCH spheres at a
+time, one field after another, from a random.Random(seed); the scene is
+held as the packed arrays of the compiled scene format, so the world, the
+text file and the compiled file all come from the same numbers.
+
+    python3 scene_gen.py --count 100000 [--seed n] [--distribution grid|uniform|clustered]
+                         [--mix diffuse,metal,glass] --output scene.txt|scene.rtscene
+
+A .txt output also gets its compiled form next to it; a .rtscene output
+is written on its own and can be passed to main.py --path directly.
+"""
+import math
+import random
+import sys
+from array import array
+
+import compiled_scene
+from compiled_scene import LAMBERTIAN, METAL, DIELECTRIC, MATERIAL_FIELDS
+from hittable import HittableList
+
+DISTRIBUTIONS = ("grid", "uniform", "clustered")
+DEFAULT_MIX = (0.8, 0.15, 0.05)
+BOOK_SPHERES = 22 * 22
+CLUSTER_SIZE = 256
+BATCH = 1 << 16
+RADIUS = 0.2
+
+GROUND = (LAMBERTIAN, 0.5, 0.5, 0.5, 0.0, 1.0)
+GLASS = (DIELECTRIC, 1.0, 1.0, 1.0, 0.0, 1.5)
+LARGE_SPHERES = (
+    ((0.0, 1.0, 0.0), GLASS),
+    ((-4.0, 1.0, 0.0), (LAMBERTIAN, 0.4, 0.2, 0.1, 0.0, 1.0)),
+    ((4.0, 1.0, 0.0), (METAL, 0.7, 0.6, 0.5, 0.0, 1.0)),
+)
+
+
+class GeneratedScene:
+    """A sphere scene as packed arrays, ground sphere first"""
+
+    def __init__(self, camera_lines):
+        self.camera_lines = camera_lines
+        self.materials = array("d")
+        self.centers = array("d")
+        self.radii = array("d")
+        self.mat_index = array("I")
+        self.shared = {}
+
+    def __len__(self):
+        return len(self.radii)
+
+    def material(self, record, share=True):
+        """Row index of a material record; shared records get one row"""
+        k = self.shared.get(record) if share else None
+        if k is None:
+            k = len(self.materials) // MATERIAL_FIELDS
+            self.materials.extend(record)
+            if share:
+                self.shared[record] = k
+        return k
+
+    def add(self, center, radius, mat):
+        self.centers.extend(center)
+        self.radii.append(radius)
+        self.mat_index.append(mat)
+
+    def world(self):
+        """The scene as a HittableList, the same world loading its files gives"""
+        packed = compiled_scene.pack(
+            self.camera_lines, self.materials, self.centers, self.radii, self.mat_index
+        )
+        world = HittableList(packed.materials)
+        world.objects = packed
+        return world
+
+    def write_text(self, path):
+        """Write the scene file; the ground sphere is left out, since
+        main.create_world_from_file adds it"""
+        with open(path, "w", encoding="utf-8") as f:
+            for parts in self.camera_lines:
+                f.write(" ".join(parts) + "\n")
+            c = self.centers
+            table = self.materials
+            for start in range(1, len(self), BATCH):
+                lines = []
+                for k in range(start, min(start + BATCH, len(self))):
+                    m = self.mat_index[k] * MATERIAL_FIELDS
+                    kind, r, g, b, fuzz, ir = table[m:m + MATERIAL_FIELDS]
+                    sphere = f"{c[3 * k]} {c[3 * k + 1]} {c[3 * k + 2]} {self.radii[k]}"
+                    if kind == LAMBERTIAN:
+                        lines.append(f"{sphere} lambertian {r} {g} {b}\n")
+                    elif kind == METAL:
+                        lines.append(f"{sphere} metal {r} {g} {b} {fuzz}\n")
+                    else:
+                        lines.append(f"{sphere} dielectric {ir}\n")
+                f.writelines(lines)
+
+    def write_compiled(self, target, signature=compiled_scene.NO_SOURCE):
+        compiled_scene.write(target, signature, self.camera_lines, self.materials,
+                             self.centers, self.radii, self.mat_index)
+
+    def save(self, path):
+        """Write the scene to a .rtscene file, or to a text file and its
+        compiled form"""
+        if path.endswith(compiled_scene.SUFFIX):
+            self.write_compiled(path)
+            return
+        self.write_text(path)
+        self.write_compiled(compiled_scene.compiled_path(path),
+                            compiled_scene.source_signature(path))
+
+
+def _camera_lines(count):
+    # The book camera, moved back along its view direction so a larger
+    # scene stays in view
+    s = max(1.0, math.sqrt(count / BOOK_SPHERES))
+    return [line.split() for line in (
+        "c ratio 16 9",
+        "c width 800",
+        "c samplesPerPixel 50",
+        "c maxDepth 50",
+        "c vfov 20",
+        f"c lookFrom {13 * s:g} {2 * s:g} {3 * s:g}",
+        "c lookAt 0 0 0",
+        "c vup 0 1 0",
+        "c defocusAngle 0.6",
+        f"c focusDist {10 * s:g}",
+    )]
+
+
+def _positions(rng, distribution, start, n, count, clusters):
+    """(x, z) lists of the small spheres start .. start + n"""
+    uniform = rng.random
+    if distribution == "grid":
+        side = math.isqrt(count - 1) + 1
+        jx = [uniform() for _ in range(n)]
+        jz = [uniform() for _ in range(n)]
+        cells = range(start, start + n)
+        xs = [k // side - side // 2 + 0.9 * u for k, u in zip(cells, jx)]
+        zs = [k % side - side // 2 + 0.9 * u for k, u in zip(cells, jz)]
+    elif distribution == "uniform":
+        half = math.sqrt(count) / 2
+        xs = [(2.0 * uniform() - 1.0) * half for _ in range(n)]
+        zs = [(2.0 * uniform() - 1.0) * half for _ in range(n)]
+    else:
+        sigma = math.sqrt(CLUSTER_SIZE) / 4
+        which = [clusters[int(uniform() * len(clusters))] for _ in range(n)]
+        xs = [cx + rng.gauss(0.0, sigma) for cx, _ in which]
+        zs = [cz + rng.gauss(0.0, sigma) for _, cz in which]
+    return xs, zs
+
+
+def generate_scene(count, seed=0, distribution="grid", mix=DEFAULT_MIX):
+    """Scene of about count small spheres (those overlapping the large
+    metal sphere are dropped, as in the book scene)"""
+    if distribution not in DISTRIBUTIONS:
+        raise ValueError(f"Unknown distribution: {distribution}")
+    if len(mix) != 3 or min(mix) < 0.0 or sum(mix) <= 0.0:
+        raise ValueError(f"Material mix needs three non-negative weights: {mix}")
+    diffuse = mix[0] / sum(mix)
+    metal = diffuse + mix[1] / sum(mix)
+
+    rng = random.Random(seed)
+    uniform = rng.random
+    scene = GeneratedScene(_camera_lines(count))
+    scene.add((0.0, -1000.0, 0.0), 1000.0, scene.material(GROUND))
+
+    clusters = []
+    if distribution == "clustered":
+        half = math.sqrt(count) / 2
+        clusters = [((2.0 * uniform() - 1.0) * half, (2.0 * uniform() - 1.0) * half)
+                    for _ in range(max(1, count // CLUSTER_SIZE))]
+
+    glass = scene.material(GLASS)
+    for start in range(0, count, BATCH):
+        n = min(BATCH, count - start)
+        choose = [uniform() for _ in range(n)]
+        xs, zs = _positions(rng, distribution, start, n, count, clusters)
+        params = [uniform() for _ in range(6 * n)]
+        for k in range(n):
+            x, z = xs[k], zs[k]
+            if (x - 4.0) ** 2 + z * z <= 0.81:
+                continue
+            p = params[6 * k:6 * k + 6]
+            if choose[k] < diffuse:
+                record = (LAMBERTIAN, p[0] * p[1], p[2] * p[3], p[4] * p[5], 0.0, 1.0)
+                mat = scene.material(record, share=False)
+            elif choose[k] < metal:
+                record = (METAL, 0.5 * (1.0 + p[0]), 0.5 * (1.0 + p[1]),
+                          0.5 * (1.0 + p[2]), 0.5 * p[3], 1.0)
+                mat = scene.material(record, share=False)
+            else:
+                mat = glass
+            scene.add((x, RADIUS, z), RADIUS, mat)
+
+    for center, record in LARGE_SPHERES:
+        scene.add(center, 1.0, scene.material(record))
+    return scene
+
+
+def main():
+    count = BOOK_SPHERES
+    seed = 0
+    distribution = "grid"
+    mix = DEFAULT_MIX
+    output_path = None
+    args = sys.argv[1:]
+    i = 0
+    while i < len(args):
+        if args[i] in ("--help", "-h"):
+            print(__doc__)
+            return
+        if i + 1 >= len(args):
+            print(f"Error: {args[i]} needs a value")
+            sys.exit(1)
+        value = args[i + 1]
+        try:
+            if args[i] == "--count":
+                count = int(value)
+            elif args[i] == "--seed":
+                seed = int(value)
+            elif args[i] == "--distribution":
+                distribution = value
+            elif args[i] == "--mix":
+                mix = tuple(float(w) for w in value.split(","))
+            elif args[i] == "--output":
+                output_path = value
+            else:
+                print(f"Error: Unknown argument: {args[i]}")
+                sys.exit(1)
+        except ValueError as e:
+            print(f"Error: Invalid value for {args[i]}: {e}")
+            sys.exit(1)
+        i += 2
+
+    if output_path is None:
+        print("Error: --output is required")
+        sys.exit(1)
+    try:
+        scene = generate_scene(count, seed, distribution, mix)
+        scene.save(output_path)
+    except (ValueError, OSError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    print(f"Wrote {len(scene) - 1} spheres ({distribution}, seed {seed}) to {output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""Tile scheduling for multi-core renders.
+
+The image is cut into square tiles which are handed to the pool most
+expensive first, so that the slow tiles (glass, ground, many bounces) start
+early and the cheap sky tiles fill the gaps at the end instead of a few
+heavy tiles trailing alone. Tile costs come from a cheap pre-pass that
+traces one sample on a sparse grid of pixels in every tile, and are replaced
+by the measured render time of each tile once it has been rendered.
+"""
+
+
+def make_tiles(width, height, tile_size):
+    """Split a width x height image into (x0, y0, x1, y1) tiles of at most tile_size"""
+    return [
+        (x0, y0, min(x0 + tile_size, width), min(y0 + tile_size, height))
+        for y0 in range(0, height, tile_size)
+        for x0 in range(0, width, tile_size)
+    ]
+
+
+class TileScheduler:
+    def __init__(self, width, height, tile_size=16, probe_stride=4):
+        self.tile_size = tile_size
+        self.probe_stride = probe_stride
+        self.tiles = make_tiles(width, height, tile_size)
+        self.costs = {}
+
+    def record(self, tile, seconds):
+        """Remember how long a tile took; later passes are ordered by it"""
+        self.costs[tile] = seconds
+
+    def ordered(self):
+        """Tiles sorted most expensive first; unknown tiles go first"""
+        return sorted(self.tiles, key=lambda tile: -self.costs.get(tile, float("inf")))
+
+    def estimate(self, executor, probe_fn):
+        """Fill the cost table with a pre-pass.
+
+        probe_fn(tile, stride) -> (tile, seconds) must return the probe time
+        already scaled to a full render of the tile.
+        """
+        futures = [
+            executor.submit(probe_fn, tile, self.probe_stride) for tile in self.tiles
+        ]
+        for future in futures:
+            self.record(*future.result())
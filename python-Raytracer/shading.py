@@ -0,0 +1,193 @@
+"""Material-sorted batched shading for the scalar tracer (engine "batched").
+
+Camera.ray_color follows one path at a time and calls scatter on the
+material of every hit, switching between the material classes from one
+ray to the next. The batched engine traces all camera samples of a tile
+together, a bounce at a time:
+
+    intersect   the ray of every live path against the world; misses end
+                with the sky color
+    sort        the hits into one group per material class
+    shade       one Material.scatter_batch call per group, which returns
+                the scattered rays of the whole group
+    update      throughput, Russian roulette and the ends of paths
+
+Every path draws its random numbers from the sampler dimensions ray_color
+uses (Sampler.state/resume), and the samples of a pixel are summed in
+sample order, so the image is the same as the scalar engine's. Adaptive
+sampling is not supported; it decides per pixel between samples. With a
+frustum.TileCuller the camera rays are intersected with the tile's
+candidates, as in Camera.render_tile.
+"""
+import time
+from array import array
+
+from hittable import HitRecord
+from sampler import BOUNCE_DIMS, CAMERA_DIMS
+from utils import INFINITY, Interval
+from vec3 import Color, unit_vector
+
+BLACK = Color(0.0, 0.0, 0.0)
+
+
+class PathBatch:
+    """Paths traced together: per-path lists, indexed by path number"""
+
+    def __init__(self):
+        self.rays = []
+        self.states = []  # Sampler.state() of the path's camera sample
+        self.throughput = []
+        self.colors = []  # final color of each path, BLACK until it ends
+        self.recs = []
+        self.active = []  # numbers of the paths still being traced
+
+    def add(self, ray, state):
+        self.active.append(len(self.rays))
+        self.rays.append(ray)
+        self.states.append(state)
+        self.throughput.append(Color(1.0, 1.0, 1.0))
+        self.colors.append(BLACK)
+        self.recs.append(HitRecord())
+
+
+class BatchedRenderer:
+    def __init__(self, cam, world, culler=None):
+        self.cam = cam
+        self.world = world
+        self.culler = culler
+        self.ray_t = Interval(0.001, INFINITY)
+
+    def camera_paths(self, x0, y0, x1, y1, samples, first_sample=0):
+        """PathBatch of the camera samples of the tile, pixel by pixel in
+        row-major order and by sample number within a pixel"""
+        cam = self.cam
+        sampler = cam.sampler
+        batch = PathBatch()
+        for j in range(y0, y1):
+            for i in range(x0, x1):
+                pixel = j * cam.image_width + i
+                for index in range(first_sample, first_sample + samples):
+                    sampler.start(pixel, index)
+                    batch.add(cam.get_ray(i, j), sampler.state())
+        return batch
+
+    def intersect(self, batch, stats=None, target=None):
+        """Intersect the live paths with target (default the world); ends the
+        ones that miss and returns the others grouped by material class,
+        {class: [path numbers]}, and the number of misses"""
+        world = self.world if target is None else target
+        palette = self.world.palette
+        ray_t = self.ray_t
+        rays = batch.rays
+        recs = batch.recs
+        groups = {}
+        misses = 0
+        for p in batch.active:
+            rec = recs[p]
+            if not world.hit(rays[p], ray_t, rec):
+                # Background - a simple gradient, (1 - a) * white + a * (0.5, 0.7, 1.0)
+                unit_direction = unit_vector(rays[p].direction)
+                a = 0.5 * (unit_direction.y() + 1.0)
+                throughput = batch.throughput[p]
+                throughput *= Color(1.0 - 0.5 * a, 1.0 - 0.3 * a, 1.0)
+                batch.colors[p] = throughput
+                misses += 1
+                continue
+            kind = type(palette[rec.mat_index])
+            group = groups.get(kind)
+            if group is None:
+                group = groups[kind] = []
+            group.append(p)
+        if stats is not None:
+            stats.rays += len(batch.active)
+        return groups, misses
+
+    def shade(self, batch, groups, bounce, stats=None):
+        """Scatter every group with its material's batch kernel and update
+        the paths; sets batch.active to the paths that go on"""
+        cam = self.cam
+        sampler = cam.sampler
+        palette = self.world.palette
+        dim = CAMERA_DIMS + BOUNCE_DIMS * bounce
+        roulette = 0 < cam.roulette_depth <= bounce + 1
+        min_survival = cam.roulette_min_survival
+        ends = dict.fromkeys(("absorbed", "black", "roulette"), 0)
+        active = []
+        for kind, paths in groups.items():
+            recs = [batch.recs[p] for p in paths]
+            happened, attenuations, scattered = kind.scatter_batch(
+                [palette[rec.mat_index] for rec in recs],
+                [batch.rays[p] for p in paths],
+                recs,
+                [batch.states[p] for p in paths],
+                sampler,
+                dim,
+            )
+            if stats is not None:
+                stats.bounce(kind.__name__, len(paths))
+            for p, ok, attenuation, r in zip(paths, happened, attenuations, scattered):
+                if not ok:
+                    ends["absorbed"] += 1
+                    continue
+                throughput = batch.throughput[p]
+                throughput *= attenuation
+                survival = max(throughput.x(), throughput.y(), throughput.z())
+                if survival <= 0.0:
+                    ends["black"] += 1
+                    continue
+                if roulette:
+                    survival = min(1.0, max(survival, min_survival))
+                    sampler.resume(batch.states[p], dim + 2)
+                    if sampler.next_1d() >= survival:
+                        ends["roulette"] += 1
+                        continue
+                    throughput /= survival
+                batch.rays[p] = r
+                active.append(p)
+        if stats is not None:
+            for reason, count in ends.items():
+                stats.end_path(bounce + 1, reason, count)
+        batch.active = active
+
+    def render_tile(self, x0, y0, x1, y1, samples=None, first_sample=0, stats=None):
+        """Render pixels [x0, x1) x [y0, y1); returns the per-pixel sums of
+        samples (default samples_per_pixel) samples, numbered from
+        first_sample, as flat RGB triples in row-major order, like
+        Camera.render_tile. Counters go into stats when one is given."""
+        cam = self.cam
+        if samples is None:
+            samples = cam.samples_per_pixel
+        clock = time.perf_counter
+
+        start = clock()
+        batch = self.camera_paths(x0, y0, x1, y1, samples, first_sample)
+        primary = cam.primary_structure(self.culler, x0, y0, x1, y1, stats)
+        if stats is not None:
+            stats.camera_rays += len(batch.rays)
+            stats.phase_times["camera"] += clock() - start
+
+        for bounce in range(cam.max_depth):
+            if not batch.active:
+                break
+            start = clock()
+            groups, misses = self.intersect(batch, stats, primary if bounce == 0 else None)
+            shading = clock()
+            self.shade(batch, groups, bounce, stats)
+            if stats is not None:
+                stats.end_path(bounce + 1, "miss", misses)
+                stats.phase_times["intersect"] += shading - start
+                stats.phase_times["shade"] += clock() - shading
+        if stats is not None:
+            # Ray bounce limit reached
+            stats.end_path(cam.max_depth, "depth", len(batch.active))
+            if primary is not None:
+                stats.collect_world(primary)
+
+        out = array("d")
+        colors = iter(batch.colors)
+        for _ in range((x1 - x0) * (y1 - y0)):
+            pixel_color = Color(0.0, 0.0, 0.0)
+            for _ in range(samples):
+                pixel_color += next(colors)
+            out.extend((pixel_color.x(), pixel_color.y(), pixel_color.z()))
+        return out
@@ -0,0 +1,105 @@
+"""Structure-of-arrays sphere store intersected with NumPy.
+
+SphereSet keeps the centers, radii and material indices of all spheres in
+contiguous arrays and solves the ray/sphere quadratic for every sphere in
+one vectorized pass. Only the closest root is turned into a HitRecord, so
+a ray costs a handful of NumPy calls instead of one Python call (and one
+Interval) per sphere.
+"""
+import numpy as np
+
+from compiled_scene import PackedSpheres
+from hittable import Hittable, Sphere
+from vec3 import Point3
+from aabb import AABB
+
+
+class SphereSet(Hittable):
+    def __init__(self, hittable_list):
+        if isinstance(hittable_list.objects, PackedSpheres):
+            self._init_packed(hittable_list.objects)
+            return
+        self.objects = list(hittable_list.objects)
+        if not all(isinstance(obj, Sphere) for obj in self.objects):
+            raise ValueError("SphereSet only holds spheres")
+
+        self.palette = hittable_list.palette
+        self.centers = np.array(
+            [(s.center.x(), s.center.y(), s.center.z()) for s in self.objects],
+            dtype=np.float64,
+        ).reshape(-1, 3)
+        self.radii = np.array([s.radius for s in self.objects], dtype=np.float64)
+        self.radii_sq = self.radii * self.radii
+        self.mat_index = np.array([s.mat_index for s in self.objects], dtype=np.int32)
+        self.collect_stats = False
+        self.rays = 0
+        self.prims_tested = 0
+
+    def _init_packed(self, packed):
+        # A compiled scene already holds these arrays: map them, no copies
+        self.objects = packed
+        self.palette = packed.materials
+        self.centers = np.frombuffer(packed.centers, dtype=np.float64).reshape(-1, 3)
+        self.radii = np.frombuffer(packed.radii, dtype=np.float64)
+        self.radii_sq = self.radii * self.radii
+        self.mat_index = np.frombuffer(packed.mat_index, dtype=np.uint32)
+        self.collect_stats = False
+        self.rays = 0
+        self.prims_tested = 0
+
+    def hit(self, r, ray_t, rec):
+        if self.collect_stats:
+            self.rays += 1
+            self.prims_tested += len(self.objects)
+        if not self.objects:
+            return False
+
+        o = r.origin
+        d = r.direction
+        direction = np.array((d.x(), d.y(), d.z()))
+
+        oc = np.array((o.x(), o.y(), o.z())) - self.centers
+        a = d.length_squared()
+        half_b = oc @ direction
+        c = np.einsum("ij,ij->i", oc, oc) - self.radii_sq
+
+        disc = half_b * half_b - a * c
+        candidates = np.flatnonzero(disc >= 0.0)
+        if candidates.size == 0:
+            return False
+
+        sqrtd = np.sqrt(disc[candidates])
+        half_b = half_b[candidates]
+        near = (-half_b - sqrtd) / a
+        far = (-half_b + sqrtd) / a
+        roots = np.where(
+            (near >= ray_t.min) & (near <= ray_t.max),
+            near,
+            np.where((far >= ray_t.min) & (far <= ray_t.max), far, np.inf),
+        )
+
+        # Ties go to the last sphere, as in HittableList.hit
+        best = roots.size - 1 - int(np.argmin(roots[::-1]))
+        root = float(roots[best])
+        if root == np.inf:
+            return False
+
+        k = int(candidates[best])
+        cx, cy, cz = self.centers[k].tolist()
+        radius = float(self.radii[k])
+
+        rec.t = root
+        rec.p = r.at(root)
+        outward_normal = (rec.p - Point3(cx, cy, cz)) / radius
+        rec.set_face_normal(r, outward_normal)
+        rec.mat_index = int(self.mat_index[k])
+
+        return True
+
+    def bounding_box(self):
+        if not self.objects:
+            return AABB()
+        r = np.abs(self.radii)[:, None]
+        lo = (self.centers - r).min(axis=0).tolist()
+        hi = (self.centers + r).max(axis=0).tolist()
+        return AABB(*lo, *hi)
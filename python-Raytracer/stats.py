@@ -0,0 +1,183 @@
+"""Opt-in render statistics.
+
+With Camera.collect_stats set, every tile task renders with the
+instrumented integrator (Camera.ray_color_stats, or the counters of the
+wavefront engine) into a fresh RenderStats, which travels back to the
+parent with the tile result and is merged there. Without it the normal
+integrator runs and nothing is counted, so a render that does not ask for
+statistics pays one extra function call per camera sample.
+
+Counted per render: camera rays and ray segments traced, BVH nodes visited
+and primitives tested per ray, how many bounces every path took and why it
+ended, the scatter events of every material type, the time spent in
+camera ray generation, intersection and shading, and the time every tile
+took, which heatmap() turns into an image.
+"""
+import json
+import os
+
+from image import Image
+
+# Why a path ended: it left the scene, the material absorbed it, its
+# throughput went black, Russian roulette killed it or max_depth was reached
+TERMINATIONS = ("miss", "absorbed", "black", "roulette", "depth")
+PHASES = ("camera", "intersect", "shade")
+
+
+class RenderStats:
+    def __init__(self):
+        self.camera_rays = 0
+        self.rays = 0
+        self.nodes_visited = 0
+        self.primitive_tests = 0
+        self.path_lengths = {}
+        self.terminations = dict.fromkeys(TERMINATIONS, 0)
+        self.material_bounces = {}
+        self.phase_times = dict.fromkeys(PHASES, 0.0)
+        self.tile_times = {}
+        self.workers = set()
+        self.render_time = 0.0
+        self.output_time = 0.0
+
+    def end_path(self, bounces, reason, count=1):
+        """Record count paths that ended after bounces segments for reason"""
+        if not count:
+            return
+        self.path_lengths[bounces] = self.path_lengths.get(bounces, 0) + count
+        self.terminations[reason] += count
+
+    def record_tile(self, tile, seconds):
+        """Record the render time of a tile by the current process"""
+        self.tile_times[tile] = self.tile_times.get(tile, 0.0) + seconds
+        self.workers.add(os.getpid())
+
+    def bounce(self, material, count=1):
+        self.material_bounces[material] = self.material_bounces.get(material, 0) + count
+
+    @staticmethod
+    def reset_world(world):
+        """Zero the intersection counters of a world with collect_stats"""
+        if getattr(world, "collect_stats", False):
+            world.rays = world.prims_tested = 0
+            if hasattr(world, "nodes_visited"):
+                world.nodes_visited = 0
+
+    def collect_world(self, world):
+        """Move the intersection counters of the world into the statistics"""
+        if getattr(world, "collect_stats", False):
+            self.primitive_tests += world.prims_tested
+            self.nodes_visited += getattr(world, "nodes_visited", 0)
+            self.reset_world(world)
+
+    def merge(self, other):
+        """Add the counters of another RenderStats, e.g. one tile's"""
+        self.camera_rays += other.camera_rays
+        self.rays += other.rays
+        self.nodes_visited += other.nodes_visited
+        self.primitive_tests += other.primitive_tests
+        for length, count in other.path_lengths.items():
+            self.path_lengths[length] = self.path_lengths.get(length, 0) + count
+        for reason, count in other.terminations.items():
+            self.terminations[reason] += count
+        for material, count in other.material_bounces.items():
+            self.bounce(material, count)
+        for phase, seconds in other.phase_times.items():
+            self.phase_times[phase] += seconds
+        for tile, seconds in other.tile_times.items():
+            self.tile_times[tile] = self.tile_times.get(tile, 0.0) + seconds
+        self.workers |= other.workers
+
+    def worker_time(self):
+        """Seconds the workers spent rendering tiles, summed over workers"""
+        return sum(self.tile_times.values())
+
+    def to_dict(self):
+        paths = max(1, sum(self.path_lengths.values()))
+        return {
+            "camera_rays": self.camera_rays,
+            "rays": self.rays,
+            "rays_per_second": self.rays / self.render_time if self.render_time > 0.0 else 0.0,
+            "nodes_visited": self.nodes_visited,
+            "primitive_tests": self.primitive_tests,
+            "primitive_tests_per_ray": self.primitive_tests / max(1, self.rays),
+            "mean_path_length": sum(k * n for k, n in self.path_lengths.items()) / paths,
+            "path_lengths": {str(k): n for k, n in sorted(self.path_lengths.items())},
+            "terminations": self.terminations,
+            "material_bounces": self.material_bounces,
+            "phase_seconds": self.phase_times,
+            "worker_seconds": self.worker_time(),
+            "render_seconds": self.render_time,
+            "output_seconds": self.output_time,
+            "workers": len(self.workers),
+            "tiles": [list(tile) + [seconds] for tile, seconds in sorted(self.tile_times.items())],
+        }
+
+    def write_json(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def summary(self):
+        data = self.to_dict()
+        rays = max(1, self.rays)
+        paths = max(1, sum(self.path_lengths.values()))
+        bounces = max(1, sum(self.material_bounces.values()))
+        worker = max(1e-12, self.worker_time())
+
+        lengths = "  ".join(
+            f"{k}:{100.0 * n / paths:.1f}%" for k, n in sorted(self.path_lengths.items())
+        )
+        ends = ", ".join(
+            f"{reason} {100.0 * n / paths:.1f}%" for reason, n in self.terminations.items() if n
+        )
+        materials = ", ".join(
+            f"{name} {100.0 * n / bounces:.1f}%"
+            for name, n in sorted(self.material_bounces.items())
+        )
+        phases = ", ".join(
+            f"{phase} {100.0 * s / worker:.1f}%" for phase, s in self.phase_times.items()
+        )
+        other = max(0.0, worker - sum(self.phase_times.values()))
+
+        lines = [
+            f"Render statistics ({len(self.workers)} worker processes):",
+            f"  Camera rays     {self.camera_rays:,}",
+            f"  Rays traced     {self.rays:,} ({data['rays_per_second']:,.0f}/s wall, "
+            f"{self.rays / max(1, self.camera_rays):.2f} per camera ray)",
+        ]
+        if self.primitive_tests:
+            tests = f"  Per ray         {self.primitive_tests / rays:.1f} primitive tests"
+            if self.nodes_visited:
+                tests += f", {self.nodes_visited / rays:.1f} BVH nodes visited"
+            lines.append(tests)
+        lines += [
+            f"  Path length     mean {data['mean_path_length']:.2f}: {lengths}",
+            f"  Paths ended     {ends}",
+            f"  Bounces         {materials or 'none'}",
+            f"  Worker time     {worker:.2f}s: {phases}, other {100.0 * other / worker:.1f}%",
+            f"  Output          {self.output_time:.3f}s",
+        ]
+        return "\n".join(lines)
+
+    def heatmap(self, width, height):
+        """Image of the render time per pixel of every tile, black (cheap)
+        through red and yellow to white (the most expensive tile)"""
+        img = Image(width, height)
+        costs = {
+            tile: seconds / max(1, (tile[2] - tile[0]) * (tile[3] - tile[1]))
+            for tile, seconds in self.tile_times.items()
+        }
+        peak = max(costs.values(), default=0.0)
+        for (x0, y0, x1, y1), cost in costs.items():
+            t = cost / peak if peak > 0.0 else 0.0
+            r = min(1.0, 3.0 * t)
+            g = min(1.0, max(0.0, 3.0 * t - 1.0))
+            b = min(1.0, max(0.0, 3.0 * t - 2.0))
+            # Squared so the gamma 2 encoding of the writers shows the ramp as is
+            for j in range(y0, y1):
+                k = 3 * (j * width + x0)
+                for _ in range(x0, x1):
+                    img.pixels[k] = r * r
+                    img.pixels[k + 1] = g * g
+                    img.pixels[k + 2] = b * b
+                    k += 3
+        return img
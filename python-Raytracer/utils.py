@@ -1,5 +1,7 @@
 import math
+import os
 import random
+import time
 
 INFINITY = float("inf")
 PI = math.pi
@@ -9,6 +11,22 @@ def degrees_to_radians(degrees):
     return degrees * PI / 180.0
 
 
+_IMPORT_TIME = time.time()
+
+
+def process_start_time():
+    """Wall-clock time at which this process started (Linux); elsewhere the
+    time this module was imported"""
+    try:
+        with open("/proc/self/stat", "r", encoding="ascii") as f:
+            # Field 22, counted after the parenthesized command name
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        age = time.clock_gettime(time.CLOCK_BOOTTIME) - start_ticks / os.sysconf("SC_CLK_TCK")
+        return time.time() - age
+    except (OSError, ValueError, IndexError, AttributeError):
+        return _IMPORT_TIME
+
+
 def random_double():
     return random.random()
 
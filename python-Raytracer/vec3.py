@@ -1,61 +1,98 @@
 import math
-import random
 
 
 class Vec3:
+    __slots__ = ("e0", "e1", "e2")
+
     def __init__(self, e0=0.0, e1=0.0, e2=0.0):
-        self.e = [e0, e1, e2]
+        self.e0 = e0
+        self.e1 = e1
+        self.e2 = e2
 
     def x(self):
-        return self.e[0]
+        return self.e0
 
     def y(self):
-        return self.e[1]
+        return self.e1
 
     def z(self):
-        return self.e[2]
+        return self.e2
 
     def __getitem__(self, idx):
-        return self.e[idx]
+        return (self.e0, self.e1, self.e2)[idx]
 
     def __neg__(self):
-        return Vec3(-self.e[0], -self.e[1], -self.e[2])
+        return Vec3(-self.e0, -self.e1, -self.e2)
 
     def __add__(self, other):
-        return Vec3(
-            self.e[0] + other.e[0], self.e[1] + other.e[1], self.e[2] + other.e[2]
-        )
+        return Vec3(self.e0 + other.e0, self.e1 + other.e1, self.e2 + other.e2)
 
     def __sub__(self, other):
-        return Vec3(
-            self.e[0] - other.e[0], self.e[1] - other.e[1], self.e[2] - other.e[2]
-        )
+        return Vec3(self.e0 - other.e0, self.e1 - other.e1, self.e2 - other.e2)
 
     def __mul__(self, other):
-        if isinstance(other, (int, float)):
-            return Vec3(self.e[0] * other, self.e[1] * other, self.e[2] * other)
-        return Vec3(
-            self.e[0] * other.e[0], self.e[1] * other.e[1], self.e[2] * other.e[2]
-        )
+        if other.__class__ is Vec3:
+            return Vec3(self.e0 * other.e0, self.e1 * other.e1, self.e2 * other.e2)
+        return Vec3(self.e0 * other, self.e1 * other, self.e2 * other)
 
     def __rmul__(self, other):
-        return self * other
+        return Vec3(self.e0 * other, self.e1 * other, self.e2 * other)
 
     def __truediv__(self, other):
-        return Vec3(self.e[0] / other, self.e[1] / other, self.e[2] / other)
+        inv = 1.0 / other
+        return Vec3(self.e0 * inv, self.e1 * inv, self.e2 * inv)
+
+    # In-place operators. Only use them on vectors the caller owns: Point3
+    # and Color instances are freely shared between cameras, rays and materials.
+    def __iadd__(self, other):
+        self.e0 += other.e0
+        self.e1 += other.e1
+        self.e2 += other.e2
+        return self
+
+    def __isub__(self, other):
+        self.e0 -= other.e0
+        self.e1 -= other.e1
+        self.e2 -= other.e2
+        return self
+
+    def __imul__(self, other):
+        if other.__class__ is Vec3:
+            self.e0 *= other.e0
+            self.e1 *= other.e1
+            self.e2 *= other.e2
+        else:
+            self.e0 *= other
+            self.e1 *= other
+            self.e2 *= other
+        return self
+
+    def __itruediv__(self, other):
+        inv = 1.0 / other
+        self.e0 *= inv
+        self.e1 *= inv
+        self.e2 *= inv
+        return self
 
     def __str__(self):
-        return f"{self.e[0]} {self.e[1]} {self.e[2]}"
+        return f"{self.e0} {self.e1} {self.e2}"
+
+    def add_scaled(self, v, s):
+        """In place self += v * s; returns self so calls can be chained"""
+        self.e0 += v.e0 * s
+        self.e1 += v.e1 * s
+        self.e2 += v.e2 * s
+        return self
 
     def length(self):
-        return math.sqrt(self.length_squared())
+        return math.sqrt(self.e0 * self.e0 + self.e1 * self.e1 + self.e2 * self.e2)
 
     def length_squared(self):
-        return self.e[0] * self.e[0] + self.e[1] * self.e[1] + self.e[2] * self.e[2]
+        return self.e0 * self.e0 + self.e1 * self.e1 + self.e2 * self.e2
 
     def near_zero(self):
         s = 1e-8
-        return (abs(self.e[0]) < s) and (abs(self.e[1]) < s) and (abs(self.e[2]) < s)
+        return (abs(self.e0) < s) and (abs(self.e1) < s) and (abs(self.e2) < s)
 
 
 # Type aliases
@@ -65,50 +102,61 @@ Color = Vec3
 
 # Utility functions
 def dot(u, v):
-    return u.e[0] * v.e[0] + u.e[1] * v.e[1] + u.e[2] * v.e[2]
+    return u.e0 * v.e0 + u.e1 * v.e1 + u.e2 * v.e2
 
 
 def cross(u, v):
     return Vec3(
-        u.e[1] * v.e[2] - u.e[2] * v.e[1],
-        u.e[2] * v.e[0] - u.e[0] * v.e[2],
-        u.e[0] * v.e[1] - u.e[1] * v.e[0],
+        u.e1 * v.e2 - u.e2 * v.e1,
+        u.e2 * v.e0 - u.e0 * v.e2,
+        u.e0 * v.e1 - u.e1 * v.e0,
     )
 
 
-def unit_vector(v):
-    return v / v.length()
+def fma(a, b, s):
+    """Returns a + b * s with a single allocation"""
+    return Vec3(a.e0 + b.e0 * s, a.e1 + b.e1 * s, a.e2 + b.e2 * s)
 
 
-def random_vec3_range(min_val, max_val):
-    return Vec3(
-        min_val + random.random() * (max_val - min_val),
-        min_val + random.random() * (max_val - min_val),
-        min_val + random.random() * (max_val - min_val),
-    )
+def unit_vector(v):
+    inv = 1.0 / math.sqrt(v.e0 * v.e0 + v.e1 * v.e1 + v.e2 * v.e2)
+    return Vec3(v.e0 * inv, v.e1 * inv, v.e2 * inv)
+
 
+def disk_from_square(u, v):
+    """Concentric (Shirley-Chiu) map of a point in [0,1)^2 onto the unit disk.
 
-def random_in_unit_disk():
-    while True:
-        p = Vec3(random.random() * 2.0 - 1.0, random.random() * 2.0 - 1.0, 0.0)
-        if p.length_squared() < 1.0:
-            return p
+    Direct, so stratified and low-discrepancy points keep their structure
+    and no draws are thrown away as with rejection sampling.
+    """
+    a = 2.0 * u - 1.0
+    b = 2.0 * v - 1.0
+    if a == 0.0 and b == 0.0:
+        return Vec3(0.0, 0.0, 0.0)
+    if abs(a) > abs(b):
+        r = a
+        phi = 0.25 * math.pi * (b / a)
+    else:
+        r = b
+        phi = 0.5 * math.pi - 0.25 * math.pi * (a / b)
+    return Vec3(r * math.cos(phi), r * math.sin(phi), 0.0)
 
 
-def random_unit_vector():
-    while True:
-        p = random_vec3_range(-1.0, 1.0)
-        len_sq = p.length_squared()
-        if 1e-160 < len_sq <= 1.0:
-            return p / math.sqrt(len_sq)
+def sphere_from_square(u, v):
+    """Area-preserving map of a point in [0,1)^2 onto the unit sphere"""
+    z = 1.0 - 2.0 * u
+    r = math.sqrt(max(0.0, 1.0 - z * z))
+    phi = 2.0 * math.pi * v
+    return Vec3(r * math.cos(phi), r * math.sin(phi), z)
 
 
 def reflect(v, n):
-    return v - n * (2.0 * dot(v, n))
+    return fma(v, n, -2.0 * dot(v, n))
 
 
 def refract(uv, n, etai_over_etat):
-    cos_theta = min(dot(-uv, n), 1.0)
-    r_out_perp = (uv + n * cos_theta) * etai_over_etat
-    r_out_parallel = n * (-math.sqrt(abs(1.0 - r_out_perp.length_squared())))
-    return r_out_perp + r_out_parallel
+    cos_theta = min(-dot(uv, n), 1.0)
+    r_out_perp = fma(uv, n, cos_theta)
+    r_out_perp *= etai_over_etat
+    r_out_perp.add_scaled(n, -math.sqrt(abs(1.0 - r_out_perp.length_squared())))
+    return r_out_perp
@@ -0,0 +1,317 @@
+"""Wavefront (packet) rendering engine built on NumPy.
+
+Instead of tracing one ray at a time through Vec3 objects, the wavefront
+engine generates every camera sample of a block of scanlines as arrays,
+intersects the whole batch against all spheres at once and runs the
+material scatter functions on the surviving rays. After every bounce the
+terminated rays are compacted away, so the batch only shrinks.
+"""
+import time
+from array import array
+
+import numpy as np
+
+from compiled_scene import PackedSpheres, material_record
+from hittable import Sphere
+from rng import stream_key_array, uniform_array
+from sampler import CAMERA_DIMS, BOUNCE_DIMS
+
+LAMBERTIAN = 0
+METAL = 1
+DIELECTRIC = 2
+MATERIAL_NAMES = ("Lambertian", "Metal", "Dielectric")
+
+# Upper bound on rays * spheres entries held in memory during intersection
+MAX_BATCH_ENTRIES = 1 << 21
+
+
+class SceneArrays:
+    """Structure-of-arrays copy of a sphere-only world"""
+
+    def __init__(self, world):
+        if isinstance(world.objects, PackedSpheres):
+            self._init_packed(world.objects)
+            return
+        spheres = [obj for obj in world.objects if isinstance(obj, Sphere)]
+        if len(spheres) != len(world.objects):
+            raise ValueError("The wavefront engine only supports sphere scenes")
+
+        # One row per palette material, in the compiled scene layout
+        table = []
+        for k in range(len(world.palette)):
+            record = material_record(world.palette[k])
+            if record is None:
+                raise ValueError(f"Unsupported material: {type(world.palette[k]).__name__}")
+            table.append(record)
+        self.centers = np.array(
+            [(s.center.x(), s.center.y(), s.center.z()) for s in spheres], dtype=np.float64
+        ).reshape(-1, 3)
+        self.radii = np.array([s.radius for s in spheres], dtype=np.float64)
+        mat_index = np.array([s.mat_index for s in spheres], dtype=np.intp)
+        self._init_materials(np.array(table, dtype=np.float64).reshape(-1, 6), mat_index)
+
+    def _init_packed(self, packed):
+        # A compiled scene already holds these arrays: map them, no copies
+        self.centers = np.frombuffer(packed.centers, dtype=np.float64).reshape(-1, 3)
+        self.radii = np.frombuffer(packed.radii, dtype=np.float64)
+        self._init_materials(
+            np.frombuffer(packed.material_table, dtype=np.float64).reshape(-1, 6),
+            np.frombuffer(packed.mat_index, dtype=np.uint32),
+        )
+
+    def _init_materials(self, table, mat_index):
+        # Per-sphere material fields from the palette table, then the terms
+        # of the ray/sphere quadratic that do not depend on the ray
+        rows = table[mat_index]
+        self.mat_type = rows[:, 0].astype(np.int8)
+        self.albedo = rows[:, 1:4]
+        self.fuzz = rows[:, 4]
+        self.ir = rows[:, 5]
+        self.centers_t = np.ascontiguousarray(self.centers.T)
+        self.c_term = np.einsum("ij,ij->i", self.centers, self.centers) - self.radii**2
+
+
+def _dot(a, b):
+    # Written out rather than einsum so the rounding of every ray is the same
+    # whatever the batch size
+    return a[:, 0] * b[:, 0] + a[:, 1] * b[:, 1] + a[:, 2] * b[:, 2]
+
+
+def _outer_dot(v, centers_t):
+    """Dot product of every ray vector with every sphere center (rays x spheres)"""
+    return (
+        v[:, 0:1] * centers_t[0] + v[:, 1:2] * centers_t[1] + v[:, 2:3] * centers_t[2]
+    )
+
+
+def _unit(v):
+    return v / np.sqrt(_dot(v, v))[:, None]
+
+
+class WavefrontRenderer:
+    def __init__(self, cam, world):
+        self.cam = cam
+        self.scene = SceneArrays(world)
+        self.rays_traced = 0
+
+    def _random_unit_vectors(self, keys, dim):
+        """Uniform directions on the unit sphere, as vec3.sphere_from_square"""
+        z = 1.0 - 2.0 * uniform_array(keys, dim)
+        phi = uniform_array(keys, dim + 1) * (2.0 * np.pi)
+        r = np.sqrt(np.maximum(0.0, 1.0 - z * z))
+        return np.stack((r * np.cos(phi), r * np.sin(phi), z), axis=1)
+
+    def _random_in_unit_disk(self, keys, dim):
+        """Points on the unit disk, as the concentric map of vec3.disk_from_square"""
+        a = 2.0 * uniform_array(keys, dim) - 1.0
+        b = 2.0 * uniform_array(keys, dim + 1) - 1.0
+        wide = np.abs(a) > np.abs(b)
+        r = np.where(wide, a, b)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            phi = np.where(wide, 0.25 * np.pi * (b / a), 0.5 * np.pi - 0.25 * np.pi * (a / b))
+        phi = np.where(r == 0.0, 0.0, phi)
+        return r * np.cos(phi), r * np.sin(phi)
+
+    def primary_rays(self, x0, y0, x1, y1, spp, first_sample=0):
+        """All camera samples of the tile as (tile pixel index, random stream
+        key, origin, direction)"""
+        cam = self.cam
+        tile_width = x1 - x0
+
+        pixel = np.repeat(np.arange(tile_width * (y1 - y0)), spp)
+        n = pixel.size
+        px = x0 + pixel % tile_width
+        py = y0 + pixel // tile_width
+        sample = first_sample + np.tile(np.arange(spp), n // spp if spp else 0)
+        keys = stream_key_array(cam.seed, py * cam.image_width + px, sample)
+
+        i = px + (uniform_array(keys, 0) - 0.5)
+        j = py + (uniform_array(keys, 1) - 0.5)
+
+        p00 = np.array((cam.pixel00_loc.x(), cam.pixel00_loc.y(), cam.pixel00_loc.z()))
+        du = np.array((cam.pixel_delta_u.x(), cam.pixel_delta_u.y(), cam.pixel_delta_u.z()))
+        dv = np.array((cam.pixel_delta_v.x(), cam.pixel_delta_v.y(), cam.pixel_delta_v.z()))
+        center = np.array((cam.center.x(), cam.center.y(), cam.center.z()))
+
+        pixel_sample = p00 + i[:, None] * du + j[:, None] * dv
+
+        if cam.defocus_angle <= 0.0:
+            origin = np.broadcast_to(center, (n, 3)).copy()
+        else:
+            ddu = cam.defocus_disk_u
+            ddv = cam.defocus_disk_v
+            ddu = np.array((ddu.x(), ddu.y(), ddu.z()))
+            ddv = np.array((ddv.x(), ddv.y(), ddv.z()))
+            lx, ly = self._random_in_unit_disk(keys, 2)
+            origin = center + lx[:, None] * ddu + ly[:, None] * ddv
+
+        return pixel, keys, origin, pixel_sample - origin
+
+    def intersect(self, origin, direction, t_min=0.001):
+        """Closest hit of every ray; returns (t, sphere index), t=inf on miss"""
+        scene = self.scene
+        n = origin.shape[0]
+        t_hit = np.full(n, np.inf)
+        idx_hit = np.zeros(n, dtype=np.intp)
+
+        step = max(1, MAX_BATCH_ENTRIES // max(1, scene.radii.size))
+        for s in range(0, n, step):
+            o = origin[s:s + step]
+            d = direction[s:s + step]
+
+            a = _dot(d, d)[:, None]
+            half_b = _dot(d, o)[:, None] - _outer_dot(d, scene.centers_t)
+            c = _dot(o, o)[:, None] - 2.0 * _outer_dot(o, scene.centers_t) + scene.c_term
+
+            disc = half_b * half_b - a * c
+            hit = disc >= 0.0
+            sqrtd = np.sqrt(np.where(hit, disc, 0.0))
+
+            root = (-half_b - sqrtd) / a
+            far = (-half_b + sqrtd) / a
+            root = np.where(root >= t_min, root, far)
+            root = np.where(hit & (root >= t_min), root, np.inf)
+
+            k = np.argmin(root, axis=1)
+            t_hit[s:s + step] = root[np.arange(k.size), k]
+            idx_hit[s:s + step] = k
+
+        return t_hit, idx_hit
+
+    def render_tile(self, x0, y0, x1, y1, samples=None, first_sample=0, stats=None):
+        """Render pixels [x0, x1) x [y0, y1); returns the per-pixel sums of
+        samples (default samples_per_pixel) samples as flat RGB triples in
+        row-major order. Sample numbers start at first_sample; the random
+        streams and their dimensions are those of the scalar engine's
+        independent sampler. Counters go into stats when one is given."""
+        if samples is None:
+            samples = self.cam.samples_per_pixel
+
+        cam = self.cam
+        scene = self.scene
+        accum = np.zeros(((x1 - x0) * (y1 - y0), 3))
+        clock = time.perf_counter
+
+        start = clock()
+        pixel, keys, origin, direction = self.primary_rays(x0, y0, x1, y1, samples, first_sample)
+        throughput = np.ones_like(origin)
+        if stats is not None:
+            stats.camera_rays += pixel.size
+            stats.phase_times["camera"] += clock() - start
+
+        for bounce in range(cam.max_depth):
+            if pixel.size == 0:
+                break
+            self.rays_traced += pixel.size
+            dim = CAMERA_DIMS + BOUNCE_DIMS * bounce
+
+            start = clock()
+            t, k = self.intersect(origin, direction)
+            missed = np.isinf(t)
+            if stats is not None:
+                shading = clock()
+                stats.phase_times["intersect"] += shading - start
+                stats.rays += pixel.size
+                stats.primitive_tests += pixel.size * scene.radii.size
+                stats.end_path(bounce + 1, "miss", int(np.count_nonzero(missed)))
+
+            # Rays escaping the scene pick up the background gradient
+            if missed.any():
+                d = _unit(direction[missed])
+                a = (0.5 * (d[:, 1] + 1.0))[:, None]
+                sky = (1.0 - a) + a * np.array((0.5, 0.7, 1.0))
+                contrib = throughput[missed] * sky
+                for ch in range(3):
+                    accum[:, ch] += np.bincount(
+                        pixel[missed], weights=contrib[:, ch], minlength=accum.shape[0]
+                    )
+
+            # Compact to the rays that hit something
+            hit = ~missed
+            pixel = pixel[hit]
+            keys = keys[hit]
+            origin = origin[hit]
+            direction = direction[hit]
+            throughput = throughput[hit]
+            t = t[hit]
+            k = k[hit]
+
+            p = origin + t[:, None] * direction
+            normal = (p - scene.centers[k]) / scene.radii[k][:, None]
+            front_face = _dot(direction, normal) < 0.0
+            normal = np.where(front_face[:, None], normal, -normal)
+
+            new_dir = np.empty_like(direction)
+            alive = np.ones(pixel.size, dtype=bool)
+            mat = scene.mat_type[k]
+
+            sel = np.nonzero(mat == LAMBERTIAN)[0]
+            if sel.size:
+                n = normal[sel]
+                scatter = n + self._random_unit_vectors(keys[sel], dim)
+                degenerate = np.all(np.abs(scatter) < 1e-8, axis=1)
+                new_dir[sel] = np.where(degenerate[:, None], n, scatter)
+
+            sel = np.nonzero(mat == METAL)[0]
+            if sel.size:
+                n = normal[sel]
+                d = direction[sel]
+                reflected = d - n * (2.0 * _dot(d, n))[:, None]
+                scatter = _unit(reflected) + (
+                    self._random_unit_vectors(keys[sel], dim) * scene.fuzz[k[sel]][:, None]
+                )
+                new_dir[sel] = scatter
+                alive[sel] = _dot(scatter, n) > 0.0
+
+            sel = np.nonzero(mat == DIELECTRIC)[0]
+            if sel.size:
+                n = normal[sel]
+                ud = _unit(direction[sel])
+                ir = scene.ir[k[sel]]
+                ratio = np.where(front_face[sel], 1.0 / ir, ir)
+                cos_theta = np.minimum(-_dot(ud, n), 1.0)
+                sin_theta = np.sqrt(1.0 - cos_theta * cos_theta)
+
+                r0 = ((1.0 - ratio) / (1.0 + ratio)) ** 2
+                reflectance = r0 + (1.0 - r0) * (1.0 - cos_theta) ** 5
+                reflect = (ratio * sin_theta > 1.0) | (reflectance > uniform_array(keys[sel], dim))
+
+                reflected = ud - n * (2.0 * _dot(ud, n))[:, None]
+                perp = (ud + n * cos_theta[:, None]) * ratio[:, None]
+                parallel = n * -np.sqrt(np.abs(1.0 - _dot(perp, perp)))[:, None]
+                new_dir[sel] = np.where(reflect[:, None], reflected, perp + parallel)
+
+            throughput = throughput * scene.albedo[k]
+            survival = throughput.max(axis=1)
+            if stats is not None:
+                for m, count in enumerate(np.bincount(mat, minlength=len(MATERIAL_NAMES))):
+                    if count:
+                        stats.bounce(MATERIAL_NAMES[m], int(count))
+                absorbed = int(alive.size - np.count_nonzero(alive))
+                stats.end_path(bounce + 1, "absorbed", absorbed)
+            alive &= survival > 0.0
+            if stats is not None:
+                black = int(alive.size - np.count_nonzero(alive)) - absorbed
+                stats.end_path(bounce + 1, "black", black)
+
+            # Russian roulette, unbiased by dividing survivors by their probability
+            if 0 < cam.roulette_depth <= bounce + 1:
+                survival = np.clip(survival, cam.roulette_min_survival, 1.0)
+                alive &= uniform_array(keys, dim + 2) < survival
+                throughput /= survival[:, None]
+            if stats is not None:
+                killed = int(alive.size - np.count_nonzero(alive)) - absorbed - black
+                stats.end_path(bounce + 1, "roulette", killed)
+
+            # Absorbed rays contribute nothing and are dropped
+            pixel = pixel[alive]
+            keys = keys[alive]
+            origin = p[alive]
+            direction = new_dir[alive]
+            throughput = throughput[alive]
+            if stats is not None:
+                stats.phase_times["shade"] += clock() - shading
+
+        if stats is not None and pixel.size:
+            stats.end_path(cam.max_depth, "depth", pixel.size)
+        return array("d", accum.tobytes())